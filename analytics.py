@@ -0,0 +1,94 @@
+"""Векторная аналитика оценок на pandas/NumPy по колоночному снимку.
+
+Разрезы по студентам, предметам и преподавателям с распределением 1-5 за
+один проход. Счетчики одного студента без чтения оценок - в stats.py.
+"""
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from models import Grade
+
+GRADE_VALUES = np.arange(1, 6)
+DISTRIBUTION_COLUMNS = [f"grade_{value}" for value in GRADE_VALUES]
+
+class GradeAnalytics:
+    """Агрегаты по оценкам, вычисляемые векторно по колонкам (pandas/NumPy)"""
+
+    def __init__(self, frame: pd.DataFrame):
+        # Оценки вне шкалы 1-5 в статистику не попадают
+        self.frame = frame[frame['grade'].between(1, 5)]
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list]) -> 'GradeAnalytics':
+        """Создание из колонок student_id, subject, teacher_id, grade"""
+        frame = pd.DataFrame({
+            'student_id': pd.Categorical(columns['student_id']),
+            'subject': pd.Categorical(columns['subject']),
+            'teacher_id': pd.Categorical(columns['teacher_id']),
+            'grade': np.asarray(columns['grade'], dtype=np.int8)
+        })
+        return cls(frame)
+
+    @classmethod
+    def from_grades(cls, grades: List[Grade]) -> 'GradeAnalytics':
+        """Создание из списка объектов Grade"""
+        return cls.from_columns({
+            'student_id': [g.student_id for g in grades],
+            'subject': [g.subject for g in grades],
+            'teacher_id': [g.teacher_id for g in grades],
+            'grade': [g.grade for g in grades]
+        })
+
+    @classmethod
+    def from_grade_columns(cls, columns) -> 'GradeAnalytics':
+        """Создание из колоночного снимка (columnar.GradeColumns): коды уже посчитаны"""
+        frame = pd.DataFrame({
+            key: pd.Categorical.from_codes(*columns.codes(name))
+            for key, name in (('student_id', 'student'), ('subject', 'subject'), ('teacher_id', 'teacher'))
+        })
+        frame['grade'] = columns.column('grade').astype(np.int8)
+        return cls(frame)
+
+    @classmethod
+    def from_database(cls, db) -> 'GradeAnalytics':
+        """Создание по всем оценкам из базы"""
+        return cls.from_grade_columns(db.get_grade_snapshot())
+
+    def _aggregate(self, key: str) -> pd.DataFrame:
+        """Распределение 1-5, количество, средний балл и доля пятерок по ключу за один проход"""
+        codes, uniques = pd.factorize(self.frame[key], sort=False)
+        grades = self.frame['grade'].to_numpy()
+        # Матрица (группа x оценка) одним bincount вместо цикла по группам
+        flat = np.bincount(codes * 5 + (grades - 1), minlength=len(uniques) * 5)
+        distribution = flat.reshape(len(uniques), 5)
+        counts = distribution.sum(axis=1)
+        result = pd.DataFrame(distribution, columns=DISTRIBUTION_COLUMNS, index=pd.Index(uniques, name=key))
+        result.insert(0, 'count', counts)
+        result.insert(1, 'mean', distribution @ GRADE_VALUES / counts)
+        result['excellent_share'] = distribution[:, 4] / counts
+        return result
+
+    def by_student(self) -> pd.DataFrame:
+        """Агрегаты по студентам"""
+        return self._aggregate('student_id')
+
+    def by_subject(self) -> pd.DataFrame:
+        """Агрегаты по предметам"""
+        return self._aggregate('subject')
+
+    def by_teacher(self) -> pd.DataFrame:
+        """Агрегаты по преподавателям"""
+        return self._aggregate('teacher_id')
+
+    def summary(self) -> dict:
+        """Общая статистика по всем оценкам"""
+        grades = self.frame['grade'].to_numpy()
+        distribution = np.bincount(grades - 1, minlength=5) if len(grades) else np.zeros(5, dtype=int)
+        count = int(len(grades))
+        return {
+            'count': count,
+            'mean': float(grades.mean()) if count else 0.0,
+            'excellent': int(distribution[4]),
+            'excellent_share': float(distribution[4] / count) if count else 0.0,
+            'distribution': dict(zip(GRADE_VALUES.tolist(), distribution.tolist()))
+        }
@@ -1,12 +1,15 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import json
 import os
-from datetime import datetime
-import pandas as pd
 
 # Импорт модулей
 from database import Database
-from models import User, Grade, Schedule
+from timetable import DAYS
+from periods import period_title
+import metrics
+from write_queue import WriteQueue, PENDING, DONE, FAILED
+from models import User
 
 # Настройка страницы
 st.set_page_config(
@@ -16,8 +19,103 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_database() -> Database:
+    """Единый экземпляр базы данных для всех сессий и перезапусков"""
+    return Database()
+
+@st.cache_resource
+def get_write_queue() -> WriteQueue:
+    """Фоновая очередь записи, общая для всех сессий"""
+    return WriteQueue(get_database())
+
 # Инициализация базы данных
-db = Database()
+db = get_database()
+writer = get_write_queue()
+
+# Сколько студентов показывать в подсказках поиска
+STUDENT_SEARCH_LIMIT = 20
+
+# Cookie с токеном сессии: вход восстанавливается после перезагрузки страницы
+SESSION_COOKIE = "aristotel_session"
+
+# Кэш запросов на чтение. Первый аргумент - версия данных (db.version):
+# после записи она меняется, и следующий вызов читает данные заново.
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_students(version: int):
+    """Список студентов"""
+    return db.get_students()
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def cached_grades_with_names(version: int, student_id: str = None):
+    """Оценки с именами (все или одного студента)"""
+    return db.get_grades_with_names(student_id)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_teachers(version: int):
+    """Список преподавателей"""
+    return db.get_teachers()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_grades_page(version: int, student_id, subject, teacher_id, date_from, date_to, sort_by,
+                       limit: int, offset: int):
+    """Страница оценок с именами и общее число оценок по фильтрам"""
+    return db.query_grades(student_id, subject, teacher_id, date_from, date_to,
+                           sort_by, sort_by != "subject", limit, offset)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_semesters(version: int):
+    """Семестры, за которые есть оценки"""
+    return db.get_semesters()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_grade_periods(version: int, period: str, date_from, date_to, student_id, subject, teacher_id):
+    """Статистика оценок по периодам"""
+    return db.get_grade_periods(period, date_from, date_to, student_id, subject, teacher_id)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_schedule_with_names(version: int):
+    """Расписание с именами преподавателей"""
+    return db.get_schedule_with_names()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_week_schedule(version: int):
+    """Расписание на неделю по дням с именами преподавателей"""
+    return db.get_week_schedule_with_names()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_has_demo_accounts(version: int):
+    """Созданы ли демо аккаунты (python bulk.py demo)"""
+    return db.has_demo_accounts()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_student_stats(version: int):
+    """Количество оценок и средний балл по всем студентам"""
+    return db.get_student_stats()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_grade_breakdown(version: int):
+    """Агрегаты с распределением 1-5 по предметам и по преподавателям"""
+    # pandas нужен только здесь: модуль загружается при первом открытии вкладки
+    from analytics import GradeAnalytics
+    analytics = GradeAnalytics.from_database(db)
+    return ([dict(row, key=key) for key, row in analytics.by_subject().to_dict('index').items()],
+            [dict(row, key=key) for key, row in analytics.by_teacher().to_dict('index').items()])
+
+def breakdown_table(rows: list, title: str, names: dict = None) -> list:
+    """Строки таблицы агрегатов: количество, средний балл, распределение 1-5, доля пятерок"""
+    return [{
+        title: names.get(row['key'], row['key']) if names else row['key'],
+        "Оценок": row['count'],
+        "Средний балл": f"{row['mean']:.2f}",
+        **{str(value): row[f"grade_{value}"] for value in range(1, 6)},
+        "Доля пятерок": f"{row['excellent_share']:.0%}"
+    } for row in rows]
+
+def search_students(query: str) -> list:
+    """Студенты по началу имени или email (пустой запрос - пустой список)"""
+    query = query.strip()
+    return db.search_students(query, STUDENT_SEARCH_LIMIT) if query else []
 
 def init_session_state():
     """Инициализация состояния сессии"""
@@ -27,7 +125,91 @@ def init_session_state():
         st.session_state.user = None
     if 'page' not in st.session_state:
         st.session_state.page = 'login'
+    if 'write_tickets' not in st.session_state:
+        st.session_state.write_tickets = []
+    if 'session_checked' not in st.session_state:
+        # Восстановление входа по токену из cookie (после перезагрузки страницы) без пароля.
+        # Cookie читаются при открытии страницы, поэтому проверка одна на сессию
+        st.session_state.session_checked = True
+        token = read_session_cookie()
+        if token and not st.session_state.authenticated:
+            user = db.resume_session(token)
+            if user:
+                st.session_state.authenticated = True
+                st.session_state.user = user
+                st.session_state.page = f"{user.role}_dashboard"
+                st.session_state.session_token = token
+            else:
+                st.session_state.session_cookie = ""
+
+def read_session_cookie():
+    """Токен из cookie браузера. В старых версиях Streamlit без st.context.cookies
+    cookie не читаются: вход держится в session_state до перезагрузки страницы"""
+    cookies = getattr(getattr(st, 'context', None), 'cookies', None)
+    return cookies.get(SESSION_COOKIE) if cookies is not None else None
+
+def sign_in(user: User):
+    """Вход: состояние сессии и подписанный токен в cookie"""
+    st.session_state.authenticated = True
+    st.session_state.user = user
+    st.session_state.page = f"{user.role}_dashboard"
+    st.session_state.session_token = db.create_session(user)
+    st.session_state.session_cookie = st.session_state.session_token
+
+def sign_out():
+    """Выход и отзыв токена"""
+    token = st.session_state.pop('session_token', None)
+    if token:
+        db.end_session(token)
+        st.session_state.session_cookie = ""
+    st.session_state.authenticated = False
+    st.session_state.user = None
+    st.session_state.page = 'login'
+
+def write_session_cookie():
+    """Запись токена в cookie браузера или удаление cookie (пустой токен) после входа и выхода.
 
+    Токен не попадает в адрес страницы, историю браузера и журналы прокси.
+    Скрипт выполняется во фрейме с тем же origin, что у страницы.
+    """
+    token = st.session_state.pop('session_cookie', None)
+    if token is None:
+        return
+    max_age = db.sessions.ttl if token else 0
+    script = ("<script>window.parent.document.cookie = "
+              f"{json.dumps(f'{SESSION_COOKIE}={token}; path=/; max-age={max_age}; samesite=strict')}"
+              " + (window.parent.location.protocol === 'https:' ? '; secure' : '');</script>")
+    # st.iframe есть только в новых версиях, где components.html объявлен устаревшим
+    if hasattr(st, 'iframe'):
+        st.iframe(script, height=1)
+    else:
+        components.html(script, height=1)
+
+def report_write(ticket: str, queued_message: str):
+    """Подтверждение записи: ждем не дольше 50 мс, иначе показываем, что операция в очереди"""
+    status, error = writer.wait(ticket, timeout=0.05)
+    if status == DONE:
+        st.rerun()
+    elif status == FAILED:
+        st.error(error)
+    else:
+        st.session_state.write_tickets.append(ticket)
+        st.success(queued_message)
+
+def show_pending_writes():
+    """Статус операций, еще не записанных фоновой очередью"""
+    pending = []
+    for ticket in st.session_state.write_tickets:
+        status, error = writer.status(ticket)
+        if status == PENDING:
+            pending.append(ticket)
+        elif status == FAILED:
+            st.error(error)
+    st.session_state.write_tickets = pending
+    if pending:
+        st.info(f"Сохраняется операций: {len(pending)}")
+
+@metrics.timed('page')
 def login_page():
     """Страница авторизации"""
     st.title("🎓 Aristotel")
@@ -47,9 +229,7 @@ def login_page():
             if login_button:
                 user = db.authenticate_user(email, password)
                 if user:
-                    st.session_state.authenticated = True
-                    st.session_state.user = user
-                    st.session_state.page = f"{user.role}_dashboard"
+                    sign_in(user)
                     st.rerun()
                 else:
                     st.error("Неверный email или пароль")
@@ -75,20 +255,28 @@ def login_page():
                 else:
                     st.error("Заполните все поля")
         
-        # Демо данные
-        st.markdown("---")
-        st.info("""
-        **Демо аккаунты для тестирования:**
-        
-        **Студент:**
-        - Email: student@university.edu
-        - Пароль: password
-        
-        **Преподаватель:**
-        - Email: teacher@university.edu  
-        - Пароль: password
-        """)
+        # Демо данные: подсказка, только если аккаунты созданы (python bulk.py demo)
+        if cached_has_demo_accounts(db.version):
+            st.markdown("---")
+            st.info(f"""
+            **Демо аккаунты для тестирования:**
+            
+            **Студент:**
+            - Email: {db.DEMO_STUDENT_EMAIL}
+            - Пароль: {db.DEMO_PASSWORD}
+            
+            **Преподаватель:**
+            - Email: {db.DEMO_TEACHER_EMAIL}  
+            - Пароль: {db.DEMO_PASSWORD}
+            """)
+
+def show_table(rows: list):
+    """Таблица из списка словарей. pandas загружается здесь, при первой
+    отрисовке таблицы, а не при старте: страница входа без него быстрее"""
+    import pandas as pd
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
 
+@metrics.timed('page')
 def student_dashboard():
     """Панель студента"""
     st.title(f"👨‍🎓 Панель студента: {st.session_state.user.name}")
@@ -100,66 +288,55 @@ def student_dashboard():
         st.write(f"**Email:** {st.session_state.user.email}")
         
         if st.button("Выйти", use_container_width=True):
-            st.session_state.authenticated = False
-            st.session_state.user = None
-            st.session_state.page = 'login'
+            sign_out()
             st.rerun()
     
     # Вкладки
     tab1, tab2 = st.tabs(["📊 Мои оценки", "📅 Расписание"])
     
-    with tab1:
+    with tab1, metrics.track('page', 'student_dashboard/grades'):
         st.subheader("Мои оценки")
-        grades = db.get_student_grades(st.session_state.user.id)
+        grades = cached_grades_with_names(db.version, st.session_state.user.id)
         
         if grades:
             # Создаем DataFrame для отображения
-            grades_data = []
-            for grade in grades:
-                teacher = db.get_user_by_id(grade.teacher_id)
-                grades_data.append({
-                    "Предмет": grade.subject,
-                    "Оценка": grade.grade,
-                    "Преподаватель": teacher.name if teacher else "Неизвестно",
-                    "Дата": grade.created_at.strftime("%d.%m.%Y")
-                })
+            grades_data = [{
+                "Предмет": row['subject'],
+                "Оценка": row['grade'],
+                "Преподаватель": row['teacher_name'],
+                "Дата": row['created_at'].strftime("%d.%m.%Y")
+            } for row in grades]
             
-            df = pd.DataFrame(grades_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
+            show_table(grades_data)
             
             # Статистика
+            # Агрегаты поддерживаются при записи, чтение не зависит от числа оценок
+            summary = db.get_student_summary(st.session_state.user.id)
             col1, col2, col3 = st.columns(3)
             with col1:
-                avg_grade = sum(g.grade for g in grades) / len(grades)
-                st.metric("Средний балл", f"{avg_grade:.2f}")
+                st.metric("Средний балл", f"{summary['mean']:.2f}")
             with col2:
-                st.metric("Всего оценок", len(grades))
+                st.metric("Всего оценок", summary['count'])
             with col3:
-                excellent_grades = len([g for g in grades if g.grade == 5])
-                st.metric("Отличных оценок", excellent_grades)
+                st.metric("Отличных оценок", summary['excellent'])
         else:
             st.info("У вас пока нет оценок")
     
-    with tab2:
+    with tab2, metrics.track('page', 'student_dashboard/schedule'):
         st.subheader("Расписание занятий")
-        schedule = db.get_all_schedule()
+        week = cached_week_schedule(db.version)
         
-        if schedule:
-            # Группируем по дням недели
-            days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-            
-            for day in days:
-                day_schedule = [s for s in schedule if s.day_of_week == day]
-                if day_schedule:
-                    st.write(f"**{day}**")
-                    for item in sorted(day_schedule, key=lambda x: x.time_slot):
-                        teacher = db.get_user_by_id(item.teacher_id)
-                        teacher_name = teacher.name if teacher else "Неизвестно"
-                        st.write(f"- {item.time_slot}: {item.subject} (ауд. {item.room}) - {teacher_name}")
-                    st.write("")
+        if week:
+            # Занятия уже сгруппированы по дням и упорядочены по времени начала
+            for day, day_schedule in week.items():
+                st.write(f"**{day}**")
+                for item in day_schedule:
+                    st.write(f"- {item['time_slot']}: {item['subject']} (ауд. {item['room']}) - {item['teacher_name']}")
+                st.write("")
         else:
             st.info("Расписание пока не составлено")
 
+@metrics.timed('page')
 def teacher_dashboard():
     """Панель преподавателя"""
     st.title(f"👩‍🏫 Панель преподавателя: {st.session_state.user.name}")
@@ -171,15 +348,15 @@ def teacher_dashboard():
         st.write(f"**Email:** {st.session_state.user.email}")
         
         if st.button("Выйти", use_container_width=True):
-            st.session_state.authenticated = False
-            st.session_state.user = None
-            st.session_state.page = 'login'
+            sign_out()
             st.rerun()
     
+    show_pending_writes()
+    
     # Вкладки
     tab1, tab2, tab3 = st.tabs(["📊 Управление оценками", "📅 Управление расписанием", "👥 Студенты"])
     
-    with tab1:
+    with tab1, metrics.track('page', 'teacher_dashboard/grades'):
         st.subheader("Управление оценками")
         
         # Добавление новой оценки
@@ -187,22 +364,19 @@ def teacher_dashboard():
         col1, col2 = st.columns(2)
         
         with col1:
-            students = db.get_students()
-            student_options = {f"{s.name} ({s.email})": s.id for s in students}
-            selected_student = st.selectbox("Выберите студента", list(student_options.keys()))
+            # В список попадают только найденные студенты, а не все: поиск по индексу
+            # занимает миллисекунды и выполняется при каждом изменении запроса
+            student_query = st.text_input("Найти студента", placeholder="Имя или email")
+            selected_student = st.selectbox("Выберите студента", search_students(student_query),
+                                            format_func=lambda s: f"{s.name} ({s.email})")
             subject = st.text_input("Предмет", placeholder="Математика")
         
         with col2:
             grade = st.selectbox("Оценка", [1, 2, 3, 4, 5])
             if st.button("Выставить оценку", use_container_width=True):
                 if selected_student and subject:
-                    student_id = student_options[selected_student]
-                    success = db.add_grade(student_id, subject, grade, st.session_state.user.id)
-                    if success:
-                        st.success("Оценка успешно выставлена!")
-                        st.rerun()
-                    else:
-                        st.error("Ошибка при выставлении оценки")
+                    ticket = writer.submit_grade(selected_student.id, subject, grade, st.session_state.user.id)
+                    report_write(ticket, "Оценка принята и сохраняется")
                 else:
                     st.error("Заполните все поля")
         
@@ -210,27 +384,73 @@ def teacher_dashboard():
         
         # Список всех оценок
         st.write("**Все оценки:**")
-        all_grades = db.get_all_grades()
         
-        if all_grades:
-            grades_data = []
-            for grade in all_grades:
-                student = db.get_user_by_id(grade.student_id)
-                teacher = db.get_user_by_id(grade.teacher_id)
-                grades_data.append({
-                    "Студент": student.name if student else "Неизвестно",
-                    "Предмет": grade.subject,
-                    "Оценка": grade.grade,
-                    "Преподаватель": teacher.name if teacher else "Неизвестно",
-                    "Дата": grade.created_at.strftime("%d.%m.%Y")
-                })
+        # Фильтры и постраничный вывод: с сервера приходит только текущая страница
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            filter_query = st.text_input("Фильтр по студенту", placeholder="Имя или email")
+            student_filter = st.selectbox("Студент", [None] + search_students(filter_query),
+                                          format_func=lambda s: "Все студенты" if s is None else f"{s.name} ({s.email})")
+        with col2:
+            subject_filter = st.text_input("Фильтр по предмету", placeholder="Все предметы")
+        with col3:
+            teacher_filter = st.selectbox("Фильтр по преподавателю", [None] + cached_teachers(db.version),
+                                          format_func=lambda t: "Все преподаватели" if t is None else t.name)
+        with col4:
+            semester = st.selectbox("Семестр", [None] + cached_semesters(db.version),
+                                    format_func=lambda s: "Все семестры" if s is None else period_title(s[0], 'semester'))
+            date_from = st.date_input("С даты", value=None, format="DD.MM.YYYY")
+            date_to = st.date_input("По дату", value=None, format="DD.MM.YYYY")
+        if semester:
+            # Даты сужают выбранный семестр
+            date_from = max(date_from, semester[0]) if date_from else semester[0]
+            date_to = min(date_to, semester[1]) if date_to else semester[1]
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sort_by = st.selectbox("Сортировка", ["created_at", "grade", "subject"],
+                                   format_func=lambda x: {"created_at": "По дате", "grade": "По оценке", "subject": "По предмету"}[x])
+        with col2:
+            page_size = st.selectbox("Строк на странице", [25, 50, 100, 200], index=1)
+        
+        filters = (student_filter.id if student_filter else None, subject_filter.strip() or None,
+                   teacher_filter.id if teacher_filter else None, date_from, date_to, sort_by)
+        total = cached_grades_page(db.version, *filters, limit=0, offset=0)[1]
+        page_count = max(1, (total + page_size - 1) // page_size)
+        with col3:
+            page = st.number_input("Страница", min_value=1, max_value=page_count, value=1, step=1)
+        page_grades, total = cached_grades_page(db.version, *filters, limit=page_size, offset=(page - 1) * page_size)
+        
+        if page_grades:
+            grades_data = [{
+                "Студент": row['student_name'],
+                "Предмет": row['subject'],
+                "Оценка": row['grade'],
+                "Преподаватель": row['teacher_name'],
+                "Дата": row['created_at'].strftime("%d.%m.%Y")
+            } for row in page_grades]
             
-            df = pd.DataFrame(grades_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
+            show_table(grades_data)
+            first = (page - 1) * page_size + 1
+            st.caption(f"Показаны оценки {first}–{first + len(page_grades) - 1} из {total}")
         else:
             st.info("Оценок пока нет")
+        
+        if semester:
+            # Помесячная статистика по тем же фильтрам: выборка за семестр по индексу времени
+            st.write("**По месяцам:**")
+            periods = cached_grade_periods(db.version, 'month', date_from, date_to, filters[0], filters[1], filters[2])
+            if periods:
+                show_table([{
+                    "Месяц": item['title'],
+                    "Оценок": item['count'],
+                    "Средний балл": f"{item['mean']:.2f}",
+                    "Отличных": item['excellent']
+                } for item in periods])
+            else:
+                st.info("За выбранный период оценок нет")
     
-    with tab2:
+    with tab2, metrics.track('page', 'teacher_dashboard/schedule'):
         st.subheader("Управление расписанием")
         
         # Добавление нового занятия
@@ -239,7 +459,7 @@ def teacher_dashboard():
         
         with col1:
             subject = st.text_input("Предмет для расписания", placeholder="Физика")
-            day = st.selectbox("День недели", ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"])
+            day = st.selectbox("День недели", DAYS)
         
         with col2:
             time_slot = st.text_input("Время", placeholder="09:00-10:30")
@@ -247,12 +467,20 @@ def teacher_dashboard():
         
         if st.button("Добавить в расписание", use_container_width=True):
             if subject and day and time_slot and room:
-                success = db.add_schedule(subject, day, time_slot, room, st.session_state.user.id)
-                if success:
-                    st.success("Занятие добавлено в расписание!")
-                    st.rerun()
+                try:
+                    conflicts = db.find_schedule_conflicts(day, time_slot, room, st.session_state.user.id)
+                except ValueError as e:
+                    st.error(str(e))
                 else:
-                    st.error("Ошибка при добавлении занятия")
+                    if 'room' in conflicts:
+                        busy = conflicts['room'][0]
+                        st.error(f"Аудитория {room} занята: {busy.time_slot}, {busy.subject}")
+                    elif 'teacher' in conflicts:
+                        busy = conflicts['teacher'][0]
+                        st.error(f"У вас уже есть занятие в это время: {busy.time_slot}, {busy.subject} (ауд. {busy.room})")
+                    else:
+                        ticket = writer.submit_schedule(subject, day, time_slot, room, st.session_state.user.id)
+                        report_write(ticket, "Занятие принято и добавляется в расписание")
             else:
                 st.error("Заполните все поля")
         
@@ -260,58 +488,96 @@ def teacher_dashboard():
         
         # Текущее расписание
         st.write("**Текущее расписание:**")
-        schedule = db.get_all_schedule()
+        schedule = cached_schedule_with_names(db.version)
         
         if schedule:
-            schedule_data = []
-            for item in schedule:
-                teacher = db.get_user_by_id(item.teacher_id)
-                schedule_data.append({
-                    "День": item.day_of_week,
-                    "Время": item.time_slot,
-                    "Предмет": item.subject,
-                    "Аудитория": item.room,
-                    "Преподаватель": teacher.name if teacher else "Неизвестно"
-                })
+            schedule_data = [{
+                "День": item['day_of_week'],
+                "Время": item['time_slot'],
+                "Предмет": item['subject'],
+                "Аудитория": item['room'],
+                "Преподаватель": item['teacher_name']
+            } for item in schedule]
             
-            df = pd.DataFrame(schedule_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
+            show_table(schedule_data)
         else:
             st.info("Расписание пока не составлено")
     
-    with tab3:
+    with tab3, metrics.track('page', 'teacher_dashboard/students'):
         st.subheader("Список студентов")
-        students = db.get_students()
+        students = cached_students(db.version)
         
         if students:
+            # Агрегаты по всем студентам за один проход по оценкам
+            stats = cached_student_stats(db.version)
             students_data = []
             for student in students:
-                grades = db.get_student_grades(student.id)
-                avg_grade = sum(g.grade for g in grades) / len(grades) if grades else 0
+                count, mean = stats.get(student.id, (0, 0.0))
                 students_data.append({
                     "Имя": student.name,
                     "Email": student.email,
-                    "Количество оценок": len(grades),
-                    "Средний балл": f"{avg_grade:.2f}" if avg_grade > 0 else "Нет оценок"
+                    "Количество оценок": count,
+                    "Средний балл": f"{mean:.2f}" if count else "Нет оценок"
                 })
             
-            df = pd.DataFrame(students_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
+            show_table(students_data)
         else:
             st.info("Студентов пока нет")
+        
+        subjects, teachers = cached_grade_breakdown(db.version)
+        if subjects:
+            st.write("**Успеваемость по предметам:**")
+            show_table(breakdown_table(subjects, "Предмет"))
+            st.write("**По преподавателям:**")
+            names = {teacher.id: teacher.name for teacher in cached_teachers(db.version)}
+            show_table(breakdown_table(teachers, "Преподаватель", names))
+
+def metrics_panel():
+    """Панель с метриками процесса для преподавателей (ARISTOTEL_METRICS_PANEL=1)"""
+    with st.sidebar.expander("📈 Метрики"):
+        rows = [{
+            "Вид": item['kind'],
+            "Имя": item['name'],
+            "Вызовов": item['calls'],
+            "Ошибок": item['errors'],
+            "Среднее, мс": round(item['seconds'] / item['calls'] * 1000, 2) if item['calls'] else 0.0,
+            "Всего, с": round(item['seconds'], 3),
+            "Прочитано, КБ": round(item['bytes_read'] / 1024, 1),
+            "Строк": item['rows_parsed']
+        } for item in metrics.snapshot()]
+        if rows:
+            rows.sort(key=lambda row: row["Всего, с"], reverse=True)
+            show_table(rows)
+        st.download_button("Скачать (Prometheus)", metrics.render_prometheus(),
+                           file_name="aristotel.prom", mime="text/plain", use_container_width=True)
+        if st.button("Сбросить метрики", use_container_width=True):
+            metrics.reset()
+            st.rerun()
 
 def main():
     """Главная функция приложения"""
     init_session_state()
     
-    # Маршрутизация
-    if not st.session_state.authenticated:
-        login_page()
-    else:
-        if st.session_state.user.role == 'student':
-            student_dashboard()
-        elif st.session_state.user.role == 'teacher':
-            teacher_dashboard()
+    try:
+        # Маршрутизация
+        if not st.session_state.authenticated:
+            login_page()
+        else:
+            if st.session_state.user.role == 'student':
+                student_dashboard()
+            elif st.session_state.user.role == 'teacher':
+                teacher_dashboard()
+        # Метрики и их сброс - только для вошедшего преподавателя
+        if (os.environ.get("ARISTOTEL_METRICS_PANEL") == "1" and st.session_state.authenticated
+                and st.session_state.user.role == 'teacher'):
+            metrics_panel()
+        # В конце прогона: st.rerun() на странице не должен отбросить скрипт
+        write_session_cookie()
+    finally:
+        # Текстовый дамп для Prometheus (node_exporter textfile collector)
+        metrics_file = os.environ.get("ARISTOTEL_METRICS_FILE")
+        if metrics_file:
+            metrics.write_prometheus(metrics_file)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
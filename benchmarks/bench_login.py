@@ -0,0 +1,74 @@
+"""Пропускная способность входа при одновременных входах.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_login.py [число пользователей] [число потоков]
+
+Сценарии:
+    legacy  - первый вход со старым SHA-256 хешем (проверка + пересчет в KDF)
+    kdf     - повторный вход, хеш уже scrypt/PBKDF2
+    session - восстановление входа по токену сессии
+Параметры KDF задаются переменными ARISTOTEL_PASSWORD_ALGORITHM,
+ARISTOTEL_SCRYPT_N, ARISTOTEL_PBKDF2_ITERATIONS, ARISTOTEL_HASH_WORKERS.
+"""
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from models import User
+
+def run_concurrently(operation, items: list, threads: int) -> dict:
+    """Выполнение operation(item) для всех элементов в threads потоках"""
+    latencies = []
+
+    def timed(item):
+        start = time.perf_counter()
+        assert operation(item)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, items))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'per_second': len(items) / elapsed,
+        'median_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(tmp)
+        legacy_hash = hashlib.sha256(b"password").hexdigest()
+        db.storage.add_users([User(f"login{i}@university.edu", f"Студент {i}", 'student', legacy_hash)
+                              for i in range(count)])
+        emails = [f"login{i}@university.edu" for i in range(count)]
+        hasher = db.hasher
+        print(f"пользователей: {count}, потоков: {threads}, алгоритм: {hasher.algorithm}, "
+              f"N={hasher.scrypt_n}, итераций PBKDF2={hasher.pbkdf2_iterations}, пул: {hasher.workers}")
+
+        results = {'legacy': run_concurrently(lambda email: db.authenticate_user(email, "password"), emails, threads)}
+        db.flush_password_upgrades()
+        upgraded = sum(1 for email in emails if not hasher.needs_rehash(db.get_user_by_email(email).password_hash))
+        results['kdf'] = run_concurrently(lambda email: db.authenticate_user(email, "password"), emails, threads)
+        tokens = [db.create_session(db.get_user_by_email(email)) for email in emails]
+        # Повторная проверка токенов, выданных в другом процессе, без кэша
+        db.sessions._cache.clear()
+        results['session'] = run_concurrently(db.resume_session, tokens * 50, threads)
+
+    print(f"хешей обновлено при первом входе: {upgraded}/{count}")
+    for name, stats in results.items():
+        print(f"{name:8} {stats['per_second']:10.1f} входов/с  медиана {stats['median_ms']:8.2f} мс  "
+              f"p95 {stats['p95_ms']:8.2f} мс")
+
+if __name__ == "__main__":
+    main()
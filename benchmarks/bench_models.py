@@ -0,0 +1,58 @@
+"""Бенчмарк моделей: память на 1M оценок и время загрузки grades.json.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_models.py [количество оценок]
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import User
+from storage import JsonStorage, grade_record
+
+def make_grades_file(path: str, count: int):
+    """Синтетический grades.json в текущем формате (с users.json и subjects.json)"""
+    storage = JsonStorage(os.path.dirname(path))
+    students = [User(f"student{i}@university.edu", f"Студент {i}", 'student', "-") for i in range(1000)]
+    teachers = [User(f"teacher{i}@university.edu", f"Преподаватель {i}", 'teacher', "-") for i in range(50)]
+    storage.add_users(students + teachers)
+    student_keys = [storage._user_key(user.id) for user in students]
+    teacher_keys = [storage._user_key(user.id) for user in teachers]
+    subject_ids = [storage._subject_id(name) for name in ["Математика", "Физика", "Химия", "История", "Информатика"]]
+    grades = [grade_record(str(uuid.uuid4()), student_keys[i % len(student_keys)], teacher_keys[i % len(teacher_keys)],
+                           subject_ids[i % len(subject_ids)], i % 5 + 1, "2025-11-11T09:28:47.065408")
+              for i in range(count)]
+    storage._save_json(path, grades)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grades.json")
+        make_grades_file(path, count)
+
+        gc.collect()
+        start = time.perf_counter()
+        grades = JsonStorage(tmp).get_all_grades()
+        load_time = time.perf_counter() - start
+        del grades
+
+        gc.collect()
+        tracemalloc.start()
+        storage = JsonStorage(tmp)
+        grades = storage.get_all_grades()
+        gc.collect()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"оценок: {count}")
+    print(f"загрузка: {load_time:.2f} с")
+    print(f"память: {memory / 2**20:.0f} МБ ({memory / len(grades):.0f} байт на оценку)")
+
+if __name__ == "__main__":
+    main()
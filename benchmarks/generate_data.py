@@ -0,0 +1,153 @@
+"""Генератор синтетических данных в формате data/*.json.
+
+Оценки и расписание ссылаются на ключи пользователей (поле key в users.json)
+и ID предметов (subjects.json), как их записывает JsonStorage.
+
+Запуск из корня репозитория:
+    python benchmarks/generate_data.py bench_data --preset university
+    python benchmarks/generate_data.py bench_data --students 1000 --grades 100000
+
+Данные воспроизводимы: одинаковые параметры и --seed дают одинаковые файлы.
+Пароль всех пользователей - "password", адреса studentN@university.edu
+и teacherN@university.edu (N с единицы).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec
+from models import Subject
+from passwords import PasswordHasher
+from storage import grade_record, schedule_record
+from timetable import DAYS, format_time_slot
+
+PRESETS = {
+    'tiny': dict(students=200, teachers=20, grades=5_000, lessons=200),
+    'small': dict(students=5_000, teachers=200, grades=200_000, lessons=2_000),
+    'medium': dict(students=20_000, teachers=1_000, grades=1_000_000, lessons=10_000),
+    'university': dict(students=50_000, teachers=2_000, grades=5_000_000, lessons=20_000),
+}
+
+SUBJECTS = ["Математика", "Физика", "Химия", "История", "Информатика", "Биология", "Литература",
+            "Английский язык", "Философия", "Экономика", "Статистика", "Программирование",
+            "Линейная алгебра", "Дискретная математика", "Базы данных", "Социология"]
+FIRST_NAMES = ["Иван", "Анна", "Мария", "Петр", "Елена", "Алексей", "Ольга", "Дмитрий",
+               "Наталья", "Сергей", "Татьяна", "Андрей", "Юлия", "Михаил", "Ксения", "Артем"]
+LAST_NAMES = ["Петров", "Иванов", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев",
+              "Соколов", "Михайлов", "Новиков", "Федоров", "Морозов", "Волков", "Алексеев"]
+# Распределение оценок ближе к реальному, чем равномерное
+GRADE_WEIGHTS = {5: 30, 4: 35, 3: 25, 2: 8, 1: 2}
+# Учебный год, за который выставляются оценки
+PERIOD_START = datetime(2024, 9, 1, 8, 0)
+PERIOD_SECONDS = int(timedelta(days=300).total_seconds())
+# Пары по 90 минут с 08:00, восемь в день
+LESSON_SLOTS = [format_time_slot(480 + 100 * i, 570 + 100 * i) for i in range(8)]
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def _timestamp(rng: random.Random) -> str:
+    return (PERIOD_START + timedelta(seconds=rng.randrange(PERIOD_SECONDS))).isoformat()
+
+def _write_array(path: str, records) -> int:
+    """Потоковая запись JSON массива: одна запись на строку, без сборки списка в памяти"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        count = jsoncodec.write_array(f, records)
+    os.replace(tmp_file, path)
+    return count
+
+def _users(rng: random.Random, role: str, count: int, password_hash: str):
+    for number in range(1, count + 1):
+        yield {
+            'id': _uuid(rng),
+            'email': f"{role}{number}@university.edu",
+            'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'role': role,
+            'password_hash': password_hash,
+            'created_at': _timestamp(rng)
+        }
+
+def _grades(rng: random.Random, count: int, student_keys: list, teacher_keys: list):
+    values = list(GRADE_WEIGHTS)
+    weights = list(GRADE_WEIGHTS.values())
+    for _ in range(count):
+        # Порядок вызовов rng как у прежнего формата: при том же seed те же данные
+        grade_id = _uuid(rng)
+        student_key = rng.choice(student_keys)
+        subject_id = rng.randrange(len(SUBJECTS)) + 1
+        value = rng.choices(values, weights)[0]
+        teacher_key = rng.choice(teacher_keys)
+        yield grade_record(grade_id, student_key, teacher_key, subject_id, value, _timestamp(rng))
+
+def _lessons(rng: random.Random, count: int, teacher_keys: list):
+    """Расписание без пересечений: у каждого слота свои аудитории,
+    преподаватель в одном слоте ведет не больше одного занятия"""
+    slots = [(day, time_slot) for day in DAYS for time_slot in LESSON_SLOTS]
+    if count > len(slots) * len(teacher_keys):
+        raise ValueError(f"Слишком много занятий: не больше {len(slots) * len(teacher_keys)} "
+                         f"для {len(teacher_keys)} преподавателей")
+    rooms_used = [0] * len(slots)
+    for number in range(count):
+        # Преподаватель number % T получает слоты по порядку, пока не займет все
+        slot = (number // len(teacher_keys)) % len(slots)
+        rooms_used[slot] += 1
+        day, time_slot = slots[slot]
+        # Порядок вызовов rng как у прежнего формата: при том же seed те же данные
+        schedule_id = _uuid(rng)
+        subject_id = rng.randrange(len(SUBJECTS)) + 1
+        yield schedule_record(schedule_id, subject_id, day, time_slot, str(100 + rooms_used[slot]),
+                              teacher_keys[number % len(teacher_keys)], _timestamp(rng))
+
+def generate(data_dir: str, students: int, teachers: int, grades: int, lessons: int, seed: int = 0) -> dict:
+    """Запись users.json, subjects.json, grades.json и schedule.json в каталог data_dir.
+
+    Существующие журналы (*.log.jsonl), агрегаты, колоночный снимок и база
+    SQLite удаляются, чтобы хранилище видело только сгенерированные данные.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    for name in ("grades.log.jsonl", "schedule.log.jsonl", "grade_stats.json", "grades.columns",
+                 "aristotel.db", "aristotel.db-wal", "aristotel.db-shm"):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    rng = random.Random(seed)
+    # Один хеш на всех: KDF для каждого из тысяч пользователей занял бы часы
+    password_hash = PasswordHasher.from_env().hash("password")
+    users = list(_users(rng, 'student', students, password_hash)) + list(_users(rng, 'teacher', teachers, password_hash))
+    users = [{'key': key, **user} for key, user in enumerate(users, 1)]
+    student_keys = [user['key'] for user in users if user['role'] == 'student']
+    teacher_keys = [user['key'] for user in users if user['role'] == 'teacher']
+    _write_array(os.path.join(data_dir, "users.json"), users)
+    _write_array(os.path.join(data_dir, "subjects.json"),
+                 (Subject(name, subject_id).to_dict() for subject_id, name in enumerate(SUBJECTS, 1)))
+    _write_array(os.path.join(data_dir, "grades.json"), _grades(rng, grades, student_keys, teacher_keys))
+    _write_array(os.path.join(data_dir, "schedule.json"), _lessons(rng, lessons, teacher_keys))
+    return dict(students=students, teachers=teachers, grades=grades, lessons=lessons, seed=seed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных Aristotel")
+    parser.add_argument('data_dir', help="каталог для users.json, subjects.json, grades.json и schedule.json")
+    parser.add_argument('--preset', choices=PRESETS, default='small', help="размер набора данных")
+    for name in ('students', 'teachers', 'grades', 'lessons'):
+        parser.add_argument(f'--{name}', type=int, help="переопределение значения из пресета")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    params = dict(PRESETS[args.preset])
+    for name in params:
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    start = time.perf_counter()
+    generate(args.data_dir, seed=args.seed, **params)
+    print(f"{args.data_dir}: {params} за {time.perf_counter() - start:.1f} с")
+
+if __name__ == "__main__":
+    main()
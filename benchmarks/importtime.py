@@ -0,0 +1,79 @@
+"""Время старта приложения до отрисовки страницы входа (python -X importtime).
+
+Запуск из корня репозитория:
+    python benchmarks/importtime.py [каталог с данными] [--top 20]
+
+Скрипт app.py выполняется в отдельном процессе в "голом" режиме Streamlit
+(без сервера), как при первом открытии страницы входа. Выводятся общее
+время, время импортов и самые тяжелые модули. Код возврата 1, если при
+старте загружены модули, которые должны загружаться только при отрисовке
+таблиц и аналитики (HEAVY_MODULES).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(ROOT, "app.py")
+
+# Модули, которых не должно быть при старте страницы входа
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow')
+
+STARTUP_SCRIPT = "import runpy, sys; sys.path.insert(0, {root!r}); runpy.run_path({app!r}, run_name='__main__')"
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int, int]]:
+    """Строки -X importtime -> модуль: (собственное время, накопленное время в мкс, глубина)"""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            # Строка заголовка "self [us] | cumulative | imported package"
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(parts[0]), int(parts[1]), depth)
+    return modules
+
+def measure_startup(data_dir: str, backend: str = 'json') -> dict:
+    """Запуск app.py в отдельном процессе: время процесса и импорты"""
+    env = dict(os.environ, ARISTOTEL_DATA_DIR=data_dir, ARISTOTEL_STORAGE=backend)
+    script = STARTUP_SCRIPT.format(root=ROOT, app=APP_FILE)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"app.py завершился с ошибкой:\n{result.stderr[-2000:]}")
+    modules = parse_importtime(result.stderr)
+    return {
+        'wall': wall,
+        'imports': sum(cumulative for _, cumulative, depth in modules.values() if depth == 0) / 1e6,
+        'modules': modules,
+        'heavy': [name for name in HEAVY_MODULES if name in modules],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время старта страницы входа Aristotel")
+    parser.add_argument('data_dir', nargs='?', default=os.path.join(ROOT, "data"))
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--top', type=int, default=15, help="сколько самых тяжелых модулей показать")
+    args = parser.parse_args(argv)
+
+    startup = measure_startup(os.path.abspath(args.data_dir), args.backend)
+    print(f"процесс: {startup['wall'] * 1000:.0f} мс, импорты: {startup['imports'] * 1000:.0f} мс, "
+          f"модулей: {len(startup['modules'])}")
+    top_level = [(name, cumulative) for name, (_, cumulative, depth) in startup['modules'].items() if depth == 0]
+    for name, cumulative in sorted(top_level, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} мс  {name}")
+    if startup['heavy']:
+        print(f"При старте загружены тяжелые модули: {', '.join(startup['heavy'])}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""Нагрузочный тест: одновременные сессии Streamlit без браузера и сервера.
+
+Запуск из корня репозитория:
+    python benchmarks/generate_data.py bench_data --preset small
+    python benchmarks/loadtest.py bench_data --users 200 --processes 4 --actions 20
+
+Каждый пользователь - отдельная сессия AppTest со своим session_state:
+открывает страницу входа, входит по email и паролю (у generate_data.py
+пароль всех пользователей "password"), выполняет --actions действий
+с паузами на "раздумье" и выходит. Студенты обновляют свою панель,
+преподаватели просматривают панель, ищут студента и выставляют оценки,
+добавляют занятия и фильтруют таблицу оценок через те же виджеты, что и
+в браузере.
+
+Рабочие процессы (--processes) моделируют процессы сервера: у каждого свои
+Database и очередь записи, каталог данных общий. Сессии процесса работают
+в потоках, но AppTest подменяет глобальный Runtime Streamlit на время
+прогона, поэтому прогоны скрипта внутри процесса идут по одному (как
+выполнение Python кода под GIL). Ожидание своей очереди входит в задержку,
+поэтому задержки показывают и очередь на процесс при росте нагрузки.
+
+Данные копируются во временный каталог, исходный набор не меняется.
+Выводятся p50/p95/p99 задержки по каждому действию и пропускная способность,
+а также время выполнения страниц по метрикам самих процессов (metrics.py):
+разница между ними - очередь на процесс и накладные расходы AppTest.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jsoncodec
+import metrics
+from database import Database
+from generate_data import FIRST_NAMES, SUBJECTS
+from run import APP_FILE, RESULTS_DIR, _dataset, _git_commit
+from timetable import DAYS, format_time_slot
+
+# Действия преподавателя и их веса; студент только обновляет панель
+TEACHER_ACTIONS = {'teacher_view': 50, 'add_grade': 30, 'filter_grades': 10, 'add_schedule': 10}
+# Новые занятия - минутные интервалы до 08:00, где нет сгенерированных пар
+SCHEDULE_MINUTES = 8 * 60
+
+# Один прогон скрипта на процесс: AppTest держит глобальный Runtime на время прогона
+_run_lock = threading.Lock()
+
+def _widget(elements, label: str):
+    """Виджет по подписи (в приложении у виджетов нет ключей)"""
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"Нет виджета {label!r}")
+
+class Session:
+    """Сессия одного пользователя: AppTest и учет задержек действий"""
+
+    def __init__(self, email: str, role: str, number: int, rng: random.Random, timings: list):
+        from streamlit.testing.v1 import AppTest
+
+        self.email = email
+        self.role = role
+        # Номер сессии, единый для всех процессов: из него составляются номера аудиторий
+        self.number = number
+        self.rng = rng
+        self.timings = timings
+        self.schedule_count = 0
+        self.app = AppTest.from_file(APP_FILE, default_timeout=600)
+
+    def run(self, action: str):
+        """Прогон скрипта как одно действие пользователя: (действие, секунды, ошибка)"""
+        from streamlit.logger import set_log_level
+
+        start = time.perf_counter()
+        with _run_lock:
+            # AppTest восстанавливает уровень логирования из конфигурации на каждом прогоне
+            set_log_level("error")
+            self.app.run()
+        elapsed = time.perf_counter() - start
+        if self.app.exception:
+            error = self.app.exception[0].message
+        elif self.app.error:
+            error = self.app.error[0].value
+        else:
+            error = None
+        self.timings.append((action, elapsed, error))
+        return error
+
+    def login(self) -> bool:
+        if self.run('open_page'):
+            return False
+        _widget(self.app.text_input, "Email").input(self.email)
+        _widget(self.app.text_input, "Пароль").input("password")
+        _widget(self.app.button, "Войти").click()
+        return self.run('login') is None and self.app.session_state['authenticated']
+
+    def logout(self):
+        _widget(self.app.button, "Выйти").click()
+        self.run('logout')
+
+    def act(self):
+        if self.role == 'student':
+            self.run('student_view')
+            return
+        action = self.rng.choices(list(TEACHER_ACTIONS), list(TEACHER_ACTIONS.values()))[0]
+        app = self.app
+        if action == 'add_grade':
+            # Студент выбирается через поиск: запрос - отдельный перезапуск страницы
+            _widget(app.text_input, "Найти студента").input(self.rng.choice(FIRST_NAMES)[:3])
+            if self.run('search_student'):
+                return
+            student = _widget(app.selectbox, "Выберите студента")
+            if not student.options:
+                return
+            student.select_index(self.rng.randrange(len(student.options)))
+            _widget(app.text_input, "Предмет").input(self.rng.choice(SUBJECTS))
+            _widget(app.selectbox, "Оценка").select(self.rng.randint(1, 5))
+            _widget(app.button, "Выставить оценку").click()
+        elif action == 'add_schedule':
+            # Своя аудитория и свой минутный интервал: у преподавателя нет пересечений,
+            # пока не кончатся интервалы
+            slot = self.schedule_count
+            self.schedule_count += 1
+            minute = (slot // len(DAYS)) % SCHEDULE_MINUTES
+            _widget(app.text_input, "Предмет для расписания").input(self.rng.choice(SUBJECTS))
+            _widget(app.selectbox, "День недели").select(DAYS[slot % len(DAYS)])
+            _widget(app.text_input, "Время").input(format_time_slot(minute, minute + 1))
+            _widget(app.text_input, "Аудитория").input(f"load-{self.number}-{slot}")
+            _widget(app.button, "Добавить в расписание").click()
+        elif action == 'filter_grades':
+            _widget(app.text_input, "Фильтр по предмету").input(self.rng.choice(SUBJECTS + [""]))
+        self.run(action)
+
+def run_session(session: Session, actions: int, think: float, delay: float):
+    """Сценарий пользователя: вход, действия с паузами, выход"""
+    time.sleep(delay)
+    if not session.login():
+        return
+    for _ in range(actions):
+        if think > 0:
+            time.sleep(session.rng.expovariate(1 / think))
+        session.act()
+    session.logout()
+
+def run_worker(users: List[Tuple[int, str, str]], actions: int, think: float, ramp: float,
+               seed: int) -> Tuple[List[Tuple[str, float, str]], List[dict]]:
+    """Рабочий процесс: все его сессии одновременно, каждая в своем потоке.
+
+    Возвращает задержки действий и метрики страниц процесса.
+    """
+    from streamlit.logger import set_log_level
+
+    set_log_level("error")
+    timings: list = []
+    sessions = [Session(email, role, number, random.Random(seed * 1_000_003 + number), timings)
+                for number, email, role in users]
+    with ThreadPoolExecutor(max_workers=max(1, len(sessions))) as pool:
+        futures = [pool.submit(run_session, session, actions, think, ramp * number / max(1, len(users)))
+                   for number, session in enumerate(sessions)]
+        for future in futures:
+            future.result()
+    return timings, [item for item in metrics.snapshot() if item['kind'] == 'page']
+
+def percentile(times: List[float], q: float) -> float:
+    return times[min(len(times) - 1, int(len(times) * q))]
+
+def summarize(timings: List[Tuple[str, float, str]], pages: List[dict], elapsed: float) -> dict:
+    """Задержки по действиям: число, ошибки, p50/p95/p99/max; общая пропускная способность.
+
+    pages - метрики страниц всех процессов, они складываются по имени.
+    """
+    by_action: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, List[str]] = defaultdict(list)
+    for action, seconds, error in timings:
+        by_action[action].append(seconds)
+        if error:
+            errors[action].append(error)
+    actions = {}
+    for action, times in by_action.items():
+        times.sort()
+        actions[action] = {
+            'count': len(times),
+            'errors': len(errors.get(action, ())),
+            'p50': percentile(times, 0.50),
+            'p95': percentile(times, 0.95),
+            'p99': percentile(times, 0.99),
+            'max': times[-1],
+            'per_second': len(times) / elapsed,
+        }
+    page_totals: Dict[str, list] = defaultdict(lambda: [0, 0.0])
+    for item in pages:
+        page_totals[item['name']][0] += item['calls']
+        page_totals[item['name']][1] += item['seconds']
+    return {
+        'elapsed': elapsed,
+        'actions_total': len(timings),
+        'per_second': len(timings) / elapsed,
+        'actions': actions,
+        'pages': {name: {'calls': calls, 'mean': seconds / calls}
+                  for name, (calls, seconds) in page_totals.items() if calls},
+        'error_samples': {action: sorted(set(messages))[:5] for action, messages in errors.items()},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест Aristotel через AppTest")
+    parser.add_argument('data_dir', help="каталог с данными (см. generate_data.py)")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--users', type=int, default=100, help="число одновременных сессий")
+    parser.add_argument('--teachers', type=float, default=0.2, help="доля преподавателей среди сессий")
+    parser.add_argument('--processes', type=int, default=1, help="число рабочих процессов")
+    parser.add_argument('--actions', type=int, default=10, help="действий на сессию после входа")
+    parser.add_argument('--think', type=float, default=1.0, help="средняя пауза между действиями, с")
+    parser.add_argument('--ramp', type=float, default=5.0, help="за сколько секунд стартуют все сессии процесса")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='NAME', help="сохранить результаты в benchmarks/results/NAME.json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        shutil.copytree(args.data_dir, data_dir)
+        # Рабочие процессы наследуют окружение: app.py открывает Database по нему
+        os.environ["ARISTOTEL_DATA_DIR"] = data_dir
+        os.environ["ARISTOTEL_STORAGE"] = args.backend
+        db = Database(data_dir, args.backend)
+        students, teachers = db.get_students(), db.get_teachers()
+        if not students or not teachers:
+            raise SystemExit(f"В {args.data_dir} нет студентов или преподавателей, сначала запустите generate_data.py")
+        rng = random.Random(args.seed)
+        teacher_count = round(args.users * args.teachers)
+        users = ([(user.email, 'teacher') for user in rng.sample(teachers, min(teacher_count, len(teachers)))]
+                 + [(user.email, 'student') for user in rng.sample(students, min(args.users - teacher_count,
+                                                                                  len(students)))])
+        rng.shuffle(users)
+        numbered = [(number, email, role) for number, (email, role) in enumerate(users)]
+        print(f"сессий: {len(users)} (преподавателей {sum(role == 'teacher' for _, role in users)}), "
+              f"процессов: {args.processes}, действий на сессию: {args.actions}, пауза: {args.think} с")
+
+        # spawn: рабочие процессы стартуют как отдельные серверы, без состояния родителя
+        with ProcessPoolExecutor(args.processes, mp_context=get_context('spawn')) as pool:
+            start = time.perf_counter()
+            futures = [pool.submit(run_worker, numbered[index::args.processes], args.actions, args.think,
+                                   args.ramp, args.seed) for index in range(args.processes)]
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+        timings = [item for worker_timings, _ in results for item in worker_timings]
+        pages = [item for _, worker_pages in results for item in worker_pages]
+        # Новый экземпляр видит и записи рабочих процессов
+        dataset = _dataset(Database(data_dir, args.backend))
+
+    summary = summarize(timings, pages, elapsed)
+    print(f"за {elapsed:.1f} с: {summary['actions_total']} действий, {summary['per_second']:.1f} действий/с; "
+          f"данные после теста: {dataset}")
+    print(f"{'действие':16} {'число':>7} {'ошибок':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} "
+          f"{'max, мс':>9} {'в секунду':>10}")
+    for action, stats in sorted(summary['actions'].items()):
+        print(f"{action:16} {stats['count']:7} {stats['errors']:7} {stats['p50'] * 1000:9.1f} "
+              f"{stats['p95'] * 1000:9.1f} {stats['p99'] * 1000:9.1f} {stats['max'] * 1000:9.1f} "
+              f"{stats['per_second']:10.2f}")
+    print("\nВремя страниц в процессах (без очереди и AppTest):")
+    for name, stats in sorted(summary['pages'].items()):
+        print(f"  {name:32} {stats['calls']:7} вызовов  среднее {stats['mean'] * 1000:9.1f} мс")
+    for action, messages in summary['error_samples'].items():
+        print(f"Ошибки {action}: {'; '.join(messages)}", file=sys.stderr)
+
+    if args.save:
+        results = {
+            'meta': {
+                'commit': _git_commit(),
+                'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'backend': args.backend,
+                'dataset': dataset,
+                'params': {name: getattr(args, name) for name in
+                           ('users', 'teachers', 'processes', 'actions', 'think', 'ramp', 'seed')},
+            },
+            'results': summary,
+        }
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{args.save}.json")
+        with open(path, 'wb') as f:
+            f.write(jsoncodec.dumps(results, indent=True))
+        print(f"Результаты сохранены: {path}")
+    return 1 if summary['error_samples'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
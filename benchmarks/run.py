@@ -0,0 +1,281 @@
+"""Набор бенчмарков Database и страниц приложения.
+
+Запуск из корня репозитория:
+    python benchmarks/generate_data.py bench_data --preset small
+    python benchmarks/run.py bench_data --save small-json
+    python benchmarks/run.py bench_data --compare benchmarks/results/small-json.json
+
+Данные копируются во временный каталог, поэтому запись (add_grade,
+add_schedule) не меняет исходный набор и запуски воспроизводимы.
+Результаты сохраняются в benchmarks/results/<имя>.json; при --compare
+процесс завершается с кодом 1, если медиана какого-либо замера выросла
+больше допустимого.
+"""
+import argparse
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jsoncodec
+from database import Database
+from importtime import HEAVY_MODULES, measure_startup
+from timetable import format_time_slot
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+APP_FILE = os.path.join(ROOT, "app.py")
+
+CASES = {}
+
+def case(name: str, rounds: int = 50):
+    """Регистрация замера: функция получает контекст и возвращает операцию без аргументов"""
+    def decorator(setup):
+        CASES[name] = (setup, rounds)
+        return setup
+    return decorator
+
+class Context:
+    """Общие для замеров данные: база и случайные, но воспроизводимые выборки"""
+
+    def __init__(self, data_dir: str, backend: str, seed: int):
+        self.data_dir = data_dir
+        self.backend = backend
+        self.rng = random.Random(seed)
+        self.db = Database(data_dir, backend)
+        self.students = self.db.get_students()
+        self.teachers = self.db.get_teachers()
+        if not self.students or not self.teachers:
+            raise SystemExit(f"В {data_dir} нет студентов или преподавателей, сначала запустите generate_data.py")
+        self.counter = 0
+
+    def next_number(self) -> int:
+        self.counter += 1
+        return self.counter
+
+@case('cold_load', rounds=3)
+def cold_load(ctx: Context):
+    # Новый экземпляр: полное чтение и разбор файлов
+    return lambda: Database(ctx.data_dir, ctx.backend).get_all_grades()
+
+@case('authenticate_user')
+def authenticate_user(ctx: Context):
+    def run():
+        user = ctx.rng.choice(ctx.students)
+        assert ctx.db.authenticate_user(user.email, "password")
+    return run
+
+@case('get_student_grades')
+def get_student_grades(ctx: Context):
+    return lambda: ctx.db.get_student_grades(ctx.rng.choice(ctx.students).id)
+
+@case('iter_student_grades_cold', rounds=10)
+def iter_student_grades_cold(ctx: Context):
+    # Новый экземпляр: оценки одного студента потоком с диска, без загрузки всех
+    return lambda: list(Database(ctx.data_dir, ctx.backend).iter_grades(student_id=ctx.rng.choice(ctx.students).id))
+
+@case('cold_grade_snapshot', rounds=10)
+def cold_grade_snapshot(ctx: Context):
+    # Снимок пишется один раз заранее, замеряется подключение к нему нового экземпляра
+    ctx.db.write_grade_snapshot()
+    return lambda: Database(ctx.data_dir, ctx.backend).get_grade_snapshot()
+
+@case('get_all_grades')
+def get_all_grades(ctx: Context):
+    return ctx.db.get_all_grades
+
+@case('search_students')
+def search_students(ctx: Context):
+    # Поиск по началу имени или email, как в форме выставления оценки
+    ctx.db.search_students("индекс")
+    def run():
+        student = ctx.rng.choice(ctx.students)
+        query = ctx.rng.choice([student.name, student.email])[:ctx.rng.randint(1, 8)]
+        ctx.db.search_students(query)
+    return run
+
+@case('query_grades_semester')
+def query_grades_semester(ctx: Context):
+    # Первая страница таблицы преподавателя за семестр (фильтр по датам, сортировка по дате)
+    semesters = ctx.db.get_semesters()
+    return lambda: ctx.db.query_grades(date_from=semesters[-1][0], date_to=semesters[-1][1])
+
+@case('grade_periods_semester')
+def grade_periods_semester(ctx: Context):
+    # Помесячная статистика за семестр по колоночному снимку
+    semesters = ctx.db.get_semesters()
+    return lambda: ctx.db.get_grade_periods('month', semesters[-1][0], semesters[-1][1])
+
+@case('add_grade')
+def add_grade(ctx: Context):
+    def run():
+        student = ctx.rng.choice(ctx.students)
+        teacher = ctx.rng.choice(ctx.teachers)
+        assert ctx.db.add_grade(student.id, "Бенчмарк", ctx.rng.randint(1, 5), teacher.id)
+    return run
+
+@case('add_schedule')
+def add_schedule(ctx: Context):
+    def run():
+        # Своя аудитория и минутный интервал до 08:00, где нет сгенерированных пар
+        number = ctx.next_number()
+        minute = number % (8 * 60)
+        teacher = ctx.teachers[number % len(ctx.teachers)]
+        assert ctx.db.add_schedule("Бенчмарк", "Суббота", format_time_slot(minute, minute + 1), f"bench-{number}",
+                                   teacher.id)
+    return run
+
+@case('startup_login_page', rounds=5)
+def startup_login_page(ctx: Context):
+    # Новый процесс до отрисовки страницы входа (см. importtime.py)
+    heavy = measure_startup(ctx.data_dir, ctx.backend)['heavy']
+    if heavy:
+        raise SystemExit(f"Страница входа загружает {', '.join(heavy)} (допустимо только для таблиц: {HEAVY_MODULES})")
+    return lambda: measure_startup(ctx.data_dir, ctx.backend)
+
+def _render(ctx: Context, user):
+    """Полный перезапуск страницы в AppTest со сброшенным st.cache_data"""
+    import streamlit as st
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["ARISTOTEL_DATA_DIR"] = ctx.data_dir
+    os.environ["ARISTOTEL_STORAGE"] = ctx.backend
+    app = AppTest.from_file(APP_FILE, default_timeout=600)
+    if user is not None:
+        app.session_state['authenticated'] = True
+        app.session_state['user'] = user
+        app.session_state['page'] = user.role
+
+    def run():
+        # AppTest восстанавливает уровень логирования из конфигурации, а предупреждения
+        # на каждом перезапуске мешают читать вывод
+        set_log_level("error")
+        st.cache_data.clear()
+        app.run()
+        assert not app.exception, app.exception
+    return run
+
+@case('render_login_page', rounds=10)
+def render_login_page(ctx: Context):
+    return _render(ctx, None)
+
+@case('render_student_dashboard', rounds=10)
+def render_student_dashboard(ctx: Context):
+    return _render(ctx, ctx.rng.choice(ctx.students))
+
+@case('render_teacher_dashboard', rounds=10)
+def render_teacher_dashboard(ctx: Context):
+    return _render(ctx, ctx.rng.choice(ctx.teachers))
+
+def measure(operation, rounds: int) -> dict:
+    """Один прогрев и rounds замеров"""
+    operation()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        'rounds': rounds,
+        'min': times[0],
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'p95': times[min(len(times) - 1, int(len(times) * 0.95))],
+        'max': times[-1],
+    }
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _dataset(db: Database) -> dict:
+    return {
+        'students': len(db.get_students()),
+        'teachers': len(db.get_teachers()),
+        'grades': len(db.get_all_grades()),
+        'lessons': len(db.get_all_schedule()),
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float) -> list:
+    """Замеры, медиана которых выросла больше чем в (1 + tolerance) раз и больше чем на min_delta секунд"""
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        ratio = current['median'] / previous['median'] if previous['median'] else float('inf')
+        status = ""
+        if ratio > 1 + tolerance and current['median'] - previous['median'] > min_delta:
+            regressions.append(name)
+            status = "  РЕГРЕССИЯ"
+        print(f"{name:28} {previous['median'] * 1000:10.3f} мс -> {current['median'] * 1000:10.3f} мс  x{ratio:.2f}{status}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки Aristotel")
+    parser.add_argument('data_dir', help="каталог с данными (см. generate_data.py)")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--only', nargs='+', choices=CASES, help="запустить только эти замеры")
+    parser.add_argument('--rounds', type=float, default=1.0, help="множитель числа повторов")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='NAME', help="сохранить результаты в benchmarks/results/NAME.json")
+    parser.add_argument('--compare', metavar='PATH', help="сравнить с сохраненными результатами")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="допустимый рост медианы (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=0.001, help="рост медианы в секундах, меньше которого - шум")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        shutil.copytree(args.data_dir, data_dir)
+        ctx = Context(data_dir, args.backend, args.seed)
+        results = {
+            'meta': {
+                'commit': _git_commit(),
+                'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'backend': args.backend,
+                'json': 'orjson' if jsoncodec.orjson is not None else 'json',
+                'dataset': _dataset(ctx.db),
+            },
+            'results': {},
+        }
+        for name, (setup, rounds) in CASES.items():
+            if args.only and name not in args.only:
+                continue
+            stats = measure(setup(ctx), max(1, int(rounds * args.rounds)))
+            results['results'][name] = stats
+            print(f"{name:28} медиана {stats['median'] * 1000:10.3f} мс  min {stats['min'] * 1000:10.3f} мс  "
+                  f"p95 {stats['p95'] * 1000:10.3f} мс  ({stats['rounds']} повторов)")
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{args.save}.json")
+        with open(path, 'wb') as f:
+            f.write(jsoncodec.dumps(results, indent=True))
+        print(f"Результаты сохранены: {path}")
+
+    if args.compare:
+        with open(args.compare, 'rb') as f:
+            baseline = jsoncodec.loads(f.read())
+        print(f"\nСравнение с {args.compare} ({baseline['meta']['commit']}, {baseline['meta']['date']}):")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"Регрессии: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Массовый импорт и экспорт данных (CSV, JSON Lines, Parquet) и демо данные.
+
+Примеры:
+    python bulk.py import grades grades.csv
+    python bulk.py import users users.jsonl --chunk-size 50000
+    python bulk.py export grades report.parquet
+    python bulk.py demo
+    python bulk.py compact
+
+Parquet требует установленного pyarrow.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List
+from database import BulkImportError, Database
+import jsoncodec
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+def detect_format(path: str) -> str:
+    """Формат файла по расширению"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('json', 'ndjson'):
+        extension = 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f"Неизвестный формат файла: {path} (поддерживаются {', '.join(FORMATS)})")
+    return extension
+
+def _batched(records: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def read_records(path: str, fmt: str = None, batch_size: int = 10000) -> Iterator[dict]:
+    """Потоковое чтение записей из файла без загрузки его целиком"""
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    elif fmt == 'jsonl':
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield jsoncodec.loads(line)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+def write_records(path: str, records: Iterable[dict], fieldnames: list, fmt: str = None,
+                  batch_size: int = 10000) -> int:
+    """Потоковая запись записей в файл; возвращает число строк"""
+    fmt = fmt or detect_format(path)
+    count = 0
+    if fmt == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                count += 1
+    elif fmt == 'jsonl':
+        with open(path, 'wb') as f:
+            for record in records:
+                f.write(jsoncodec.dumps(record) + b'\n')
+                count += 1
+    elif fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for batch in _batched(records, batch_size):
+                table = pa.Table.from_pylist(batch)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                count += len(batch)
+            if writer is None:
+                # Пустой отчет: файл только со схемой
+                pq.write_table(pa.table({name: pa.array([], pa.string()) for name in fieldnames}), path)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    return count
+
+GRADE_REPORT_FIELDS = ['id', 'student_name', 'student_email', 'subject', 'grade',
+                       'teacher_name', 'teacher_email', 'created_at']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Массовый импорт и экспорт данных Aristotel")
+    parser.add_argument('--data-dir', help="каталог с данными (по умолчанию ARISTOTEL_DATA_DIR или data)")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], help="тип хранилища")
+    parser.add_argument('--format', choices=FORMATS, help="формат файла (по умолчанию по расширению)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="размер пачки при проверке")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="импорт из файла")
+    import_parser.add_argument('kind', choices=['users', 'grades', 'schedule'])
+    import_parser.add_argument('path')
+    export_parser = subparsers.add_parser('export', help="экспорт отчета по оценкам")
+    export_parser.add_argument('kind', choices=['grades'])
+    export_parser.add_argument('path')
+    subparsers.add_parser('demo', help="демо пользователи, оценки и расписание в пустом хранилище")
+    subparsers.add_parser('compact', help="перезапись хранилища в текущем формате (ключи вместо UUID и названий)")
+    args = parser.parse_args(argv)
+
+    db = Database(args.data_dir, args.backend)
+    start = time.perf_counter()
+    if args.command == 'import':
+        records = read_records(args.path, args.format, args.chunk_size)
+        importer = {'users': db.import_users, 'grades': db.import_grades, 'schedule': db.import_schedule}[args.kind]
+        try:
+            count = importer(records, args.chunk_size)
+        except BulkImportError as e:
+            print("Импорт отменен, ошибки в данных:", file=sys.stderr)
+            for error in e.errors[:50]:
+                print(f"  {error}", file=sys.stderr)
+            return 1
+        except ValueError as e:
+            # Запись, появившаяся в хранилище во время импорта, или ошибка хранилища
+            print(f"Импорт отменен: {e}", file=sys.stderr)
+            return 1
+        print(f"Импортировано записей: {count} за {time.perf_counter() - start:.1f} с")
+    elif args.command == 'demo':
+        if not db.seed_demo_data():
+            print("Хранилище не пустое, демо данные не добавлены", file=sys.stderr)
+            return 1
+        print(f"Демо данные добавлены: {db.DEMO_STUDENT_EMAIL}, {db.DEMO_TEACHER_EMAIL}, пароль {db.DEMO_PASSWORD}")
+    elif args.command == 'compact':
+        db.storage.compact()
+        print(f"Хранилище перезаписано за {time.perf_counter() - start:.1f} с")
+    else:
+        count = write_records(args.path, db.iter_grade_report(), GRADE_REPORT_FIELDS, args.format, args.chunk_size)
+        print(f"Экспортировано записей: {count} за {time.perf_counter() - start:.1f} с")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
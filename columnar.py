@@ -0,0 +1,268 @@
+"""Двоичный колоночный снимок оценок для аналитики и отчетов по периодам.
+
+Формат файла (grades.columns):
+    MAGIC, длина заголовка (uint64 little-endian), заголовок в JSON,
+    затем колонки с выравниванием по 64 байта:
+        student, teacher, subject - int32 коды в словарях заголовка
+        grade                     - uint8 (значения вне 0-255 хранятся как 0)
+        created_at                - int64, микросекунды от 1970-01-01
+        time_order                - int32 номера оценок в порядке created_at
+                                    (при равном времени - в порядке добавления)
+
+Колонки открываются через mmap без копирования: разбор при старте
+процесса сводится к чтению заголовка, а страницы файла в кэше ОС общие
+для всех рабочих процессов. Оценки, добавленные после снимка, хранятся
+в памяти как дельта и попадают в файл при следующей перезаписи.
+
+По time_order выборка за период находится двоичным поиском без обхода
+всей колонки created_at.
+"""
+import mmap
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import jsoncodec
+from models import Grade
+
+MAGIC = b'ARISTOTEL-COLUMNS\x00'
+COLUMNS_FORMAT = 2
+ALIGNMENT = 64
+# Колонка -> тип значений в файле
+COLUMN_TYPES = {
+    'student': np.int32,
+    'teacher': np.int32,
+    'subject': np.int32,
+    'grade': np.uint8,
+    'created_at': np.int64,
+}
+# Колонка с кодами -> имя словаря в заголовке
+DICTIONARIES = {'student': 'students', 'teacher': 'teachers', 'subject': 'subjects'}
+EPOCH = date(1970, 1, 1)
+DAY_MICROSECONDS = 86_400_000_000
+
+def _timestamps(values: List[str]) -> np.ndarray:
+    """ISO строки -> микросекунды от начала эпохи"""
+    return np.array(values, dtype='datetime64[us]').astype(np.int64)
+
+def day_timestamp(day: date) -> int:
+    """Начало дня в микросекундах от начала эпохи, как в колонке created_at"""
+    return (day - EPOCH).days * DAY_MICROSECONDS
+
+def timestamp_day(value: int) -> date:
+    """День, на который приходится время в микросекундах от начала эпохи"""
+    return EPOCH + timedelta(days=value // DAY_MICROSECONDS)
+
+def _time_order(created_at: np.ndarray) -> np.ndarray:
+    return np.argsort(created_at, kind='stable').astype(np.int32)
+
+class GradeColumns:
+    """Оценки по колонкам: снимок из файла (или пустой) плюс дельта в памяти"""
+
+    def __init__(self, dictionaries: Optional[Dict[str, List[str]]] = None,
+                 base: Optional[Dict[str, np.ndarray]] = None,
+                 revision: int = 0, last_id: Optional[str] = None, position: Optional[list] = None,
+                 order: Optional[np.ndarray] = None):
+        self.dictionaries = {name: list((dictionaries or {}).get(name, ())) for name in DICTIONARIES.values()}
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self.dictionaries.items()}
+        self._base = base or {column: np.empty(0, dtype=dtype) for column, dtype in COLUMN_TYPES.items()}
+        # Номера оценок снимка в порядке времени
+        self._order = order if order is not None else _time_order(self._base['created_at'])
+        self._delta: Dict[str, list] = {column: [] for column in COLUMN_TYPES}
+        self._merged: Optional[Dict[str, np.ndarray]] = None
+        # Ревизия хранилища, ID последней учтенной оценки и опорная точка хранилища
+        self.revision = revision
+        self.last_id = last_id
+        self.position = position
+        self._mmap: Optional[mmap.mmap] = None
+
+    def __len__(self) -> int:
+        return len(self._base['grade']) + len(self._delta['grade'])
+
+    @property
+    def base_count(self) -> int:
+        """Число оценок в файле снимка"""
+        return len(self._base['grade'])
+
+    @property
+    def delta_count(self) -> int:
+        """Число оценок, добавленных после снимка"""
+        return len(self._delta['grade'])
+
+    def _code(self, name: str, value: str) -> int:
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+        return code
+
+    def add(self, grade: Grade, revision: int):
+        """Добавление оценки в дельту"""
+        self.extend([(revision, grade)])
+
+    def extend(self, grades: Iterable[Tuple[int, Grade]]):
+        """Добавление пар (ревизия, оценка) в дельту, как их отдает iter_grades_since"""
+        delta = self._delta
+        students, teachers, subjects = self._codes['students'], self._codes['teachers'], self._codes['subjects']
+        student_column, teacher_column, subject_column = delta['student'], delta['teacher'], delta['subject']
+        grade_column, created_column = delta['grade'], delta['created_at']
+        revision, grade = self.revision, None
+        for revision, grade in grades:
+            code = students.get(grade.student_id)
+            student_column.append(code if code is not None else self._code('students', grade.student_id))
+            code = teachers.get(grade.teacher_id)
+            teacher_column.append(code if code is not None else self._code('teachers', grade.teacher_id))
+            code = subjects.get(grade.subject)
+            subject_column.append(code if code is not None else self._code('subjects', grade.subject))
+            value = grade.grade
+            grade_column.append(value if 0 <= value <= 255 else 0)
+            created_column.append(grade.created_at_iso())
+        if grade is not None:
+            self._merged = None
+            self.revision = revision
+            self.last_id = grade.id
+
+    def column(self, name: str) -> np.ndarray:
+        """Колонка целиком: без копирования, пока дельта пуста"""
+        if not self.delta_count:
+            return self._base[name]
+        if self._merged is None:
+            self._merged = {}
+        merged = self._merged.get(name)
+        if merged is None:
+            values = self._delta[name]
+            delta = _timestamps(values) if name == 'created_at' else np.array(values, dtype=COLUMN_TYPES[name])
+            merged = self._merged[name] = np.concatenate([self._base[name], delta])
+        return merged
+
+    def codes(self, name: str) -> Tuple[np.ndarray, List[str]]:
+        """Коды колонки student, teacher или subject и словарь значений"""
+        return self.column(name), self.dictionaries[DICTIONARIES[name]]
+
+    def lookup(self, name: str, value: str) -> Optional[int]:
+        """Код значения в колонке student, teacher или subject (None, если его нет)"""
+        return self._codes[DICTIONARIES[name]].get(value)
+
+    def time_range(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Номера оценок с start <= created_at < end (микросекунды) в порядке времени.
+
+        Снимок - двоичный поиск по time_order, дельта (оценки после снимка)
+        просматривается целиком и вставляется в результат по времени.
+        """
+        base_created = self._base['created_at']
+        low = int(np.searchsorted(base_created, start, sorter=self._order)) if start is not None else 0
+        high = int(np.searchsorted(base_created, end, sorter=self._order)) if end is not None else self.base_count
+        rows = self._order[low:high]
+        if not self.delta_count:
+            return rows
+        created = self.column('created_at')
+        delta_created = created[self.base_count:]
+        mask = np.ones(len(delta_created), dtype=bool)
+        if start is not None:
+            mask &= delta_created >= start
+        if end is not None:
+            mask &= delta_created < end
+        extra = np.flatnonzero(mask)
+        if not len(extra):
+            return rows
+        extra = extra[np.argsort(delta_created[extra], kind='stable')] + self.base_count
+        # После оценок снимка с тем же временем: порядок добавления сохраняется
+        positions = np.searchsorted(base_created, created[extra], side='right', sorter=self._order) - low
+        return np.insert(rows, positions, extra.astype(rows.dtype))
+
+    def time_bounds(self) -> Optional[Tuple[int, int]]:
+        """Время первой и последней оценки в микросекундах (None, если оценок нет)"""
+        values = []
+        if self.base_count:
+            base_created = self._base['created_at']
+            values += [int(base_created[self._order[0]]), int(base_created[self._order[-1]])]
+        if self.delta_count:
+            delta_created = self.column('created_at')[self.base_count:]
+            values += [int(delta_created.min()), int(delta_created.max())]
+        return (min(values), max(values)) if values else None
+
+    def daily_counts(self, rows: np.ndarray) -> List[Tuple[date, List[int]]]:
+        """Число оценок 1, 2, 3, 4, 5 по дням среди строк rows (дни без оценок пропускаются)"""
+        grades = self.column('grade')[rows].astype(np.int64)
+        days = self.column('created_at')[rows] // DAY_MICROSECONDS
+        # Оценки вне шкалы 1-5 в статистику не попадают
+        valid = (grades >= 1) & (grades <= 5)
+        grades, days = grades[valid], days[valid]
+        if not len(days):
+            return []
+        first = int(days.min())
+        days -= first
+        # Матрица (день x оценка) одним bincount
+        flat = np.bincount(days * 5 + grades - 1, minlength=(int(days.max()) + 1) * 5)
+        distribution = flat.reshape(-1, 5)
+        return [(EPOCH + timedelta(days=first + offset), distribution[offset].tolist())
+                for offset in np.flatnonzero(distribution.sum(axis=1)).tolist()]
+
+    def save(self, path: str):
+        """Атомарная запись снимка вместе с дельтой"""
+        header = {
+            'format': COLUMNS_FORMAT,
+            'count': len(self),
+            'revision': self.revision,
+            'last_id': self.last_id,
+            'position': self.position,
+            'dictionaries': self.dictionaries,
+        }
+        header_bytes = jsoncodec.dumps(header)
+        offset = len(MAGIC) + 8 + len(header_bytes)
+        # Имя временного файла с PID: снимок могут писать несколько процессов
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(8, 'little'))
+            f.write(header_bytes)
+            order = self._order if not self.delta_count else _time_order(self.column('created_at'))
+            for data in [self.column(name) for name in COLUMN_TYPES] + [order]:
+                padding = -offset % ALIGNMENT
+                f.write(b'\0' * padding)
+                data = data.tobytes()
+                f.write(data)
+                offset += padding + len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def open(cls, path: str) -> Optional['GradeColumns']:
+        """Снимок из файла через mmap (None, если файла нет или формат другой)"""
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < len(MAGIC) + 8:
+                    return None
+                # Отображение остается действительным после закрытия файла
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        start = len(MAGIC) + 8
+        header_size = int.from_bytes(mapped[len(MAGIC):start], 'little')
+        try:
+            header = jsoncodec.loads(mapped[start:start + header_size])
+        except jsoncodec.JSONDecodeError:
+            return None
+        if not isinstance(header, dict) or header.get('format') != COLUMNS_FORMAT:
+            return None
+        count = header['count']
+        offset = start + header_size
+        arrays = {}
+        for name, dtype in list(COLUMN_TYPES.items()) + [('time_order', np.int32)]:
+            offset += -offset % ALIGNMENT
+            end = offset + count * np.dtype(dtype).itemsize
+            if end > size:
+                return None
+            arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+            offset = end
+        order = arrays.pop('time_order')
+        columns = cls(header['dictionaries'], arrays, header['revision'], header['last_id'], header['position'],
+                      order)
+        columns._mmap = mapped
+        return columns
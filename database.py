@@ -1,59 +1,128 @@
-import json
 import os
-import hashlib
-from typing import List, Optional
-from models import User, Grade, Schedule
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import metrics
+from models import User, Grade, Schedule, Subject
+from passwords import PasswordHasher
+from periods import PERIODS, period_end, period_start, period_title, periods_between
+from search import UserSearchIndex
+from sessions import SessionTokens
+from stats import GradeStats, GradeStatsIndex
+from storage import Storage, JsonStorage, SqliteStorage, migrate_json_to_sqlite
+from timetable import Timetable, parse_time_slot, format_time_slot
 
+if TYPE_CHECKING:
+    # columnar тянет numpy: модуль загружается при первом обращении к снимку
+    from columnar import GradeColumns
+
+class BulkImportError(ValueError):
+    """Ошибки проверки при массовом импорте (импорт отменяется целиком)"""
+    
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors[:10]) + (f" ... и еще {len(errors) - 10}" if len(errors) > 10 else ""))
+        self.errors = errors
+
+def _chunks(records: Iterable[dict], chunk_size: int) -> Iterator[Tuple[int, List[dict]]]:
+    """Разбиение потока записей на пачки: (номер первой строки, пачка)"""
+    iterator = iter(records)
+    row_number = 1
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield row_number, chunk
+        row_number += len(chunk)
+
+@metrics.instrument('database')
 class Database:
-    """Класс для работы с данными в JSON файлах"""
+    """Класс для работы с данными (JSON файлы или SQLite)"""
+    
+    REHASH_FLUSH_SECONDS = 5.0
+    # Оценок в дельте колоночного снимка, после которых он перезаписывается
+    COLUMNS_MIN_DELTA = 10_000
+    # Демо аккаунты (python bulk.py demo)
+    DEMO_STUDENT_EMAIL = "student@university.edu"
+    DEMO_TEACHER_EMAIL = "teacher@university.edu"
+    DEMO_PASSWORD = "password"
     
-    def __init__(self):
-        self.data_dir = "data"
-        self.users_file = os.path.join(self.data_dir, "users.json")
-        self.grades_file = os.path.join(self.data_dir, "grades.json")
-        self.schedule_file = os.path.join(self.data_dir, "schedule.json")
+    def __init__(self, data_dir: Optional[str] = None, backend: Optional[str] = None):
+        # Каталог и бэкенд выбираются параметрами или переменными окружения
+        # ARISTOTEL_DATA_DIR и ARISTOTEL_STORAGE
+        self.data_dir = data_dir or os.environ.get("ARISTOTEL_DATA_DIR", "data")
+        self.backend = backend or os.environ.get("ARISTOTEL_STORAGE", "json")
         
+        # Индекс расписания и ревизия хранилища, по которой он построен
+        self._timetable: Optional[Timetable] = None
+        self._timetable_revision = None
+        # Поисковый индекс студентов и ревизия пользователей, по которой он построен
+        self._student_index: Optional[UserSearchIndex] = None
+        self._student_index_revision = None
+        # Материализованные агрегаты оценок и ревизия их последней контрольной точки
+        self._grade_stats: Optional[GradeStatsIndex] = None
+        self._grade_stats_saved_revision = 0
+        # Колоночный снимок оценок (отображенный в память файл плюс дельта)
+        self._grade_columns: Optional['GradeColumns'] = None
+        # Хеши, пересчитанные при входе по старому формату, пишутся пачкой
+        self._pending_rehash: Dict[str, str] = {}
+        self._last_rehash_flush = 0.0
+        self._lock = threading.RLock()
+        
+        self.hasher = PasswordHasher.from_env()
         self._ensure_data_directory()
-        self._initialize_demo_data()
+        self.sessions = SessionTokens.from_key_file(os.path.join(self.data_dir, ".session_key"),
+                                                    revoked_file=os.path.join(self.data_dir, ".revoked_sessions"))
+        self.storage = self._create_storage()
+    
+    @property
+    def version(self) -> int:
+        """Версия данных, общая для всех процессов: меняется при каждой записи
+        (в том числе в другом процессе), по ней сбрасываются кэши"""
+        return self.storage.data_version()
     
     def _ensure_data_directory(self):
         """Создание директории для данных если она не существует"""
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
     
+    def _create_storage(self) -> Storage:
+        """Создание хранилища выбранного типа"""
+        if self.backend == "json":
+            return JsonStorage(self.data_dir)
+        if self.backend == "sqlite":
+            db_path = os.path.join(self.data_dir, "aristotel.db")
+            if not os.path.exists(db_path) and not JsonStorage(self.data_dir).is_empty():
+                # Однократная миграция существующих data/*.json
+                return migrate_json_to_sqlite(self.data_dir, db_path)
+            return SqliteStorage(db_path)
+        raise ValueError(f"Неизвестный тип хранилища: {self.backend}")
+    
     def _hash_password(self, password: str) -> str:
-        """Хеширование пароля"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Хеширование пароля (scrypt/PBKDF2 с солью в пуле потоков)"""
+        return self.hasher.hash(password)
     
-    def _load_json(self, filename: str) -> list:
-        """Загрузка данных из JSON файла"""
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
-    
-    def _save_json(self, filename: str, data: list):
-        """Сохранение данных в JSON файл"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    def _initialize_demo_data(self):
-        """Инициализация демо данных"""
-        # Проверяем, есть ли уже пользователи
-        users_data = self._load_json(self.users_file)
-        if not users_data:
+    def seed_demo_data(self) -> bool:
+        """Заполнение пустого хранилища демо данными (python bulk.py demo).
+
+        Возвращает False, если пользователи уже есть. Вызывается явно, а не
+        при создании Database: иначе каждый старт читал бы users.json только
+        ради проверки на пустоту.
+        """
+        # Проверка под блокировкой, чтобы одновременные вызовы не создали демо данные дважды
+        with self.storage.write_lock():
+            if not self.storage.is_empty():
+                return False
             # Создаем демо пользователей
             demo_users = [
-                User("student@university.edu", "Иван Петров", "student", self._hash_password("password")),
-                User("teacher@university.edu", "Мария Иванова", "teacher", self._hash_password("password")),
-                User("student2@university.edu", "Анна Сидорова", "student", self._hash_password("password"))
+                User(self.DEMO_STUDENT_EMAIL, "Иван Петров", "student", self._hash_password(self.DEMO_PASSWORD)),
+                User(self.DEMO_TEACHER_EMAIL, "Мария Иванова", "teacher", self._hash_password(self.DEMO_PASSWORD)),
+                User("student2@university.edu", "Анна Сидорова", "student", self._hash_password(self.DEMO_PASSWORD))
             ]
-            
-            users_data = [user.to_dict() for user in demo_users]
-            self._save_json(self.users_file, users_data)
+            for user in demo_users:
+                self.storage.add_user(user)
             
             # Создаем демо оценки
             demo_grades = [
@@ -63,9 +132,8 @@ class Database:
                 Grade(demo_users[2].id, "Математика", 4, demo_users[1].id),
                 Grade(demo_users[2].id, "Физика", 3, demo_users[1].id)
             ]
-            
-            grades_data = [grade.to_dict() for grade in demo_grades]
-            self._save_json(self.grades_file, grades_data)
+            for grade in demo_grades:
+                self.storage.add_grade(grade)
             
             # Создаем демо расписание
             demo_schedule = [
@@ -75,95 +143,575 @@ class Database:
                 Schedule("Математика", "Среда", "10:00-11:30", "101", demo_users[1].id),
                 Schedule("Физика", "Четверг", "14:00-15:30", "102", demo_users[1].id)
             ]
-            
-            schedule_data = [item.to_dict() for item in demo_schedule]
-            self._save_json(self.schedule_file, schedule_data)
+            for item in demo_schedule:
+                self.storage.add_schedule(item)
+            return True
+    
+    def has_demo_accounts(self) -> bool:
+        """Демо аккаунты студента и преподавателя есть в хранилище"""
+        return all(self.get_user_by_email(email) for email in (self.DEMO_STUDENT_EMAIL, self.DEMO_TEACHER_EMAIL))
     
     # Методы для работы с пользователями
     def get_all_users(self) -> List[User]:
         """Получение всех пользователей"""
-        users_data = self._load_json(self.users_file)
-        return [User.from_dict(data) for data in users_data]
+        return self.storage.get_all_users()
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Поиск пользователя по email"""
-        users = self.get_all_users()
-        for user in users:
-            if user.email == email:
-                return user
-        return None
+        return self.storage.get_user_by_email(email)
     
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Поиск пользователя по ID"""
-        users = self.get_all_users()
-        for user in users:
-            if user.id == user_id:
-                return user
-        return None
+        return self.storage.get_user_by_id(user_id)
+    
+    def get_users_by_ids(self, user_ids) -> Dict[str, User]:
+        """Пакетный поиск пользователей по списку ID"""
+        return self.storage.get_users_by_ids(user_ids)
+    
+    def _user_names(self, user_ids) -> Dict[str, str]:
+        """Имена пользователей по ID одним запросом"""
+        return {user_id: user.name for user_id, user in self.get_users_by_ids(user_ids).items()}
     
     def get_students(self) -> List[User]:
         """Получение всех студентов"""
-        users = self.get_all_users()
-        return [user for user in users if user.role == 'student']
+        return self.storage.get_users_by_role('student')
     
     def get_teachers(self) -> List[User]:
         """Получение всех преподавателей"""
-        users = self.get_all_users()
-        return [user for user in users if user.role == 'teacher']
+        return self.storage.get_users_by_role('teacher')
+    
+    def _get_student_index(self) -> UserSearchIndex:
+        """Поисковый индекс студентов, дополняется при добавлении пользователей"""
+        with self._lock:
+            revision = self.storage.users_revision()
+            index = self._student_index
+            if index is None or revision != self._student_index_revision:
+                students = self.get_students()
+                if index is not None and len(students) >= len(index) and (
+                        not len(index) or students[len(index) - 1].id == index.users[-1].id):
+                    # Пользователи только добавляются: индексируются лишь новые студенты
+                    index.add(students[len(index):])
+                else:
+                    index = self._student_index = UserSearchIndex(students)
+                self._student_index_revision = revision
+            return index
+    
+    def search_students(self, query: str, limit: int = 20) -> List[User]:
+        """Студенты, у которых с каждого слова запроса начинается слово имени или email (не больше limit)"""
+        return self._get_student_index().search(query, limit)
     
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Аутентификация пользователя"""
         user = self.get_user_by_email(email)
-        if user and user.password_hash == self._hash_password(password):
-            return user
-        return None
+        if user is None or not self.hasher.verify(password, user.password_hash):
+            return None
+        if self.hasher.needs_rehash(user.password_hash):
+            # Старый SHA-256 или другая стоимость: пароль известен, пересчитываем хеш
+            self._queue_rehash(user.id, self._hash_password(password))
+        return user
+    
+    def _queue_rehash(self, user_id: str, password_hash: str):
+        """Отложенная запись нового хеша: не чаще раза в REHASH_FLUSH_SECONDS,
+        чтобы волна входов не переписывала файл пользователей на каждый вход"""
+        with self._lock:
+            self._pending_rehash[user_id] = password_hash
+            if time.monotonic() - self._last_rehash_flush >= self.REHASH_FLUSH_SECONDS:
+                self.flush_password_upgrades()
+    
+    def flush_password_upgrades(self) -> int:
+        """Запись накопленных новых хешей паролей"""
+        with self._lock:
+            pending, self._pending_rehash = self._pending_rehash, {}
+            self._last_rehash_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                return self.storage.update_password_hashes(pending)
+            except Exception:
+                # Не записанные хеши пересчитаются при следующем входе
+                return 0
+    
+    # Токены сессий
+    def create_session(self, user: User) -> str:
+        """Подписанный токен для восстановления входа без пароля"""
+        return self.sessions.issue(user.id)
+    
+    def resume_session(self, token: str) -> Optional[User]:
+        """Пользователь по действующему токену сессии"""
+        user_id = self.sessions.verify(token)
+        return self.get_user_by_id(user_id) if user_id else None
+    
+    def end_session(self, token: str):
+        """Отзыв токена при выходе (во всех процессах)"""
+        self.sessions.revoke(token)
     
     def register_user(self, email: str, name: str, role: str, password: str) -> bool:
         """Регистрация нового пользователя"""
         if self.get_user_by_email(email):
             return False  # Пользователь уже существует
         
-        users_data = self._load_json(self.users_file)
         new_user = User(email, name, role, self._hash_password(password))
-        users_data.append(new_user.to_dict())
-        self._save_json(self.users_file, users_data)
-        return True
+        return self.storage.add_user(new_user)
+    
+    # Справочник предметов
+    def get_subjects(self) -> List[Subject]:
+        """Все предметы, по которым есть оценки или занятия"""
+        return self.storage.get_subjects()
     
     # Методы для работы с оценками
     def get_all_grades(self) -> List[Grade]:
         """Получение всех оценок"""
-        grades_data = self._load_json(self.grades_file)
-        return [Grade.from_dict(data) for data in grades_data]
+        return self.storage.get_all_grades()
     
     def get_student_grades(self, student_id: str) -> List[Grade]:
         """Получение оценок конкретного студента"""
-        grades = self.get_all_grades()
-        return [grade for grade in grades if grade.student_id == student_id]
+        return self.storage.get_student_grades(student_id)
+    
+    def iter_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                    teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                    date_to: Optional[date] = None) -> Iterator[Grade]:
+        """Потоковый обход оценок по фильтрам: в память попадают только подходящие"""
+        yield from self.storage.iter_grades(student_id, subject, teacher_id, date_from, date_to)
+    
+    def _grade_rows(self, grades: List[Grade]) -> List[dict]:
+        """Оценки вместе с именами студента и преподавателя, готовые к отображению"""
+        ids = {grade.student_id for grade in grades} | {grade.teacher_id for grade in grades}
+        names = self._user_names(ids)
+        return [{
+            'student_name': names.get(grade.student_id, "Неизвестно"),
+            'subject': grade.subject,
+            'grade': grade.grade,
+            'teacher_name': names.get(grade.teacher_id, "Неизвестно"),
+            'created_at': grade.created_at
+        } for grade in grades]
+    
+    def get_grades_with_names(self, student_id: Optional[str] = None) -> List[dict]:
+        """Оценки вместе с именами студента и преподавателя, готовые к отображению"""
+        grades = self.get_student_grades(student_id) if student_id else self.get_all_grades()
+        return self._grade_rows(grades)
+    
+    def query_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                     teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                     date_to: Optional[date] = None, sort_by: str = 'created_at',
+                     descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[List[dict], int]:
+        """Страница оценок с именами по фильтрам и общее число подходящих оценок"""
+        grades, total = self.storage.query_grades(student_id, subject, teacher_id, date_from, date_to,
+                                                  sort_by, descending, limit, offset)
+        return self._grade_rows(grades), total
     
     def add_grade(self, student_id: str, subject: str, grade: int, teacher_id: str) -> bool:
         """Добавление новой оценки"""
         try:
-            grades_data = self._load_json(self.grades_file)
-            new_grade = Grade(student_id, subject, grade, teacher_id)
-            grades_data.append(new_grade.to_dict())
-            self._save_json(self.grades_file, grades_data)
+            self.storage.add_grade(Grade(student_id, subject, grade, teacher_id))
+            with self._lock:
+                # Агрегаты дополняются только новой оценкой (и записями других процессов)
+                if self._grade_stats is not None:
+                    self._get_grade_stats()
             return True
         except Exception:
             return False
     
+    # Материализованные агрегаты оценок
+    @property
+    def _grade_stats_file(self) -> str:
+        return os.path.join(self.data_dir, "grade_stats.json")
+    
+    def _load_grade_stats(self) -> GradeStatsIndex:
+        """Контрольная точка агрегатов, если она соответствует хранилищу, иначе пустой индекс"""
+        stats = GradeStatsIndex.load(self._grade_stats_file)
+        if stats is None or stats.revision == 0:
+            return GradeStatsIndex()
+        # Оценка на ревизии точки должна совпасть с сохраненной (данные не заменялись)
+        for revision, grade in self.storage.iter_grades_since(stats.revision - 1):
+            if revision == stats.revision and grade.id == stats.last_id:
+                self._grade_stats_saved_revision = stats.revision
+                return stats
+            break
+        return GradeStatsIndex()
+    
+    def _get_grade_stats(self) -> GradeStatsIndex:
+        """Агрегаты, дополненные оценками, добавленными после их ревизии"""
+        with self._lock:
+            stats = self._grade_stats
+            if stats is None:
+                stats = self._grade_stats = self._load_grade_stats()
+            for revision, grade in self.storage.iter_grades_since(stats.revision):
+                stats.add(grade, revision)
+            # Точка сохраняется не чаще, чем раз в max(1000, число ключей) оценок -
+            # амортизированно O(1) на оценку
+            if stats.revision - self._grade_stats_saved_revision >= max(1000, len(stats)):
+                stats.save(self._grade_stats_file)
+                self._grade_stats_saved_revision = stats.revision
+            return stats
+    
+    def rebuild_grade_stats(self):
+        """Пересчет агрегатов по всем оценкам и запись новой контрольной точки"""
+        with self._lock:
+            stats = GradeStatsIndex()
+            for revision, grade in self.storage.iter_grades_since(0):
+                stats.add(grade, revision)
+            stats.save(self._grade_stats_file)
+            self._grade_stats = stats
+            self._grade_stats_saved_revision = stats.revision
+    
+    @property
+    def _grade_columns_file(self) -> str:
+        return os.path.join(self.data_dir, "grades.columns")
+    
+    def _load_grade_columns(self) -> 'GradeColumns':
+        """Колоночный снимок, если он соответствует хранилищу, иначе пустой"""
+        from columnar import GradeColumns
+        columns = GradeColumns.open(self._grade_columns_file)
+        if columns is None or columns.revision == 0:
+            return GradeColumns()
+        if not self.storage.check_grade(columns.revision, columns.last_id, columns.position):
+            return GradeColumns()
+        return columns
+    
+    def get_grade_snapshot(self) -> 'GradeColumns':
+        """Все оценки в колоночном виде: снимок grades.columns и оценки, добавленные после него"""
+        with self._lock:
+            columns = self._grade_columns
+            if columns is None:
+                columns = self._grade_columns = self._load_grade_columns()
+            columns.extend(self.storage.iter_grades_since(columns.revision, columns.position))
+            position = self.storage.grades_position()
+            # Снимок перезаписывается, когда дельта стала заметной частью данных или
+            # у хранилища новая опорная точка (после нее дельта читается дешевле)
+            if (columns.delta_count and not columns.base_count
+                    or columns.delta_count >= max(self.COLUMNS_MIN_DELTA, columns.base_count // 10)
+                    or position is not None and position != columns.position):
+                columns = self._write_grade_columns(columns, position)
+            return columns
+    
+    def write_grade_snapshot(self) -> int:
+        """Запись колоночного снимка со всеми текущими оценками, возвращает их число"""
+        with self._lock:
+            columns = self.get_grade_snapshot()
+            if columns.delta_count:
+                columns = self._write_grade_columns(columns, self.storage.grades_position())
+            return len(columns)
+    
+    def _write_grade_columns(self, columns: 'GradeColumns', position: Optional[list]) -> 'GradeColumns':
+        if position is not None:
+            columns.position = position
+        columns.save(self._grade_columns_file)
+        # Открытый заново файл заменяет дельту в памяти общими страницами
+        self._grade_columns = type(columns).open(self._grade_columns_file) or columns
+        return self._grade_columns
+    
+    def get_student_summary(self, student_id: str) -> dict:
+        """Статистика оценок студента за O(1): count, mean, excellent, excellent_share, subjects"""
+        stats = self._get_grade_stats().by_student.get(student_id)
+        return stats.summary() if stats else GradeStats().summary()
+    
+    def get_teacher_summary(self, teacher_id: str) -> dict:
+        """Статистика выставленных преподавателем оценок"""
+        stats = self._get_grade_stats().by_teacher.get(teacher_id)
+        return stats.summary() if stats else GradeStats().summary()
+    
+    def get_student_stats(self) -> Dict[str, Tuple[int, float]]:
+        """Количество оценок и средний балл по всем студентам: ID -> (count, mean)"""
+        return {student_id: (stats.count, stats.mean)
+                for student_id, stats in self._get_grade_stats().by_student.items()}
+    
+    def get_grade_periods(self, period: str = 'month', date_from: Optional[date] = None,
+                          date_to: Optional[date] = None, student_id: Optional[str] = None,
+                          subject: Optional[str] = None, teacher_id: Optional[str] = None) -> List[dict]:
+        """Статистика оценок по периодам (day, week, month, semester, year) в порядке времени.
+        
+        Оценки за даты выбираются двоичным поиском по колоночному снимку, без
+        обхода всей истории. Период: start, end (последний день), title, count,
+        mean, excellent, excellent_share, distribution.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Недопустимый период: {period}")
+        from columnar import day_timestamp
+        columns = self.get_grade_snapshot()
+        rows = columns.time_range(day_timestamp(date_from) if date_from else None,
+                                  day_timestamp(date_to + timedelta(days=1)) if date_to else None)
+        for name, value in (('student', student_id), ('subject', subject), ('teacher', teacher_id)):
+            if value:
+                code = columns.lookup(name, value)
+                if code is None:
+                    return []
+                rows = rows[columns.column(name)[rows] == code]
+        totals: Dict[date, List[int]] = {}
+        for day, counts in columns.daily_counts(rows):
+            distribution = totals.setdefault(period_start(day, period), [0] * 5)
+            for index, count in enumerate(counts):
+                distribution[index] += count
+        result = []
+        for start, distribution in totals.items():
+            count = sum(distribution)
+            result.append({
+                'start': start,
+                'end': period_end(start, period),
+                'title': period_title(start, period),
+                'count': count,
+                'mean': sum(value * number for value, number in enumerate(distribution, 1)) / count,
+                'excellent': distribution[4],
+                'excellent_share': distribution[4] / count,
+                'distribution': dict(enumerate(distribution, 1))
+            })
+        return result
+    
+    def get_semesters(self) -> List[Tuple[date, date]]:
+        """Семестры от первой до последней оценки, последний первым: [(первый день, последний день)]"""
+        from columnar import timestamp_day
+        bounds = self.get_grade_snapshot().time_bounds()
+        if bounds is None:
+            return []
+        first, last = (timestamp_day(value) for value in bounds)
+        return periods_between(first, last, 'semester')[::-1]
+    
     # Методы для работы с расписанием
     def get_all_schedule(self) -> List[Schedule]:
         """Получение всего расписания"""
-        schedule_data = self._load_json(self.schedule_file)
-        return [Schedule.from_dict(data) for data in schedule_data]
+        return self.storage.get_all_schedule()
+    
+    def get_teacher_schedule(self, teacher_id: str) -> List[Schedule]:
+        """Получение занятий конкретного преподавателя"""
+        return self.storage.get_teacher_schedule(teacher_id)
+    
+    def get_schedule_by_day(self, day_of_week: str) -> List[Schedule]:
+        """Получение занятий на конкретный день недели"""
+        return self.storage.get_schedule_by_day(day_of_week)
+    
+    def get_schedule_with_names(self) -> List[dict]:
+        """Расписание вместе с именами преподавателей, готовое к отображению"""
+        schedule = self.get_all_schedule()
+        names = self._user_names({item.teacher_id for item in schedule})
+        return [{
+            'day_of_week': item.day_of_week,
+            'time_slot': item.time_slot,
+            'subject': item.subject,
+            'room': item.room,
+            'teacher_name': names.get(item.teacher_id, "Неизвестно")
+        } for item in schedule]
+    
+    def _get_timetable(self) -> Timetable:
+        """Индекс расписания, перестраивается только при изменении данных"""
+        with self._lock:
+            revision = self.storage.schedule_revision()
+            if self._timetable is None or revision != self._timetable_revision:
+                self._timetable = Timetable(self.storage.get_all_schedule())
+                self._timetable_revision = revision
+            return self._timetable
+    
+    def get_week_schedule(self) -> Dict[str, List[Schedule]]:
+        """Расписание на неделю: день -> занятия в порядке начала"""
+        return self._get_timetable().week()
+    
+    def get_week_schedule_with_names(self) -> Dict[str, List[dict]]:
+        """Расписание на неделю с именами преподавателей"""
+        week = self.get_week_schedule()
+        names = self._user_names({item.teacher_id for items in week.values() for item in items})
+        return {day: [{
+            'time_slot': item.time_slot,
+            'subject': item.subject,
+            'room': item.room,
+            'teacher_name': names.get(item.teacher_id, "Неизвестно")
+        } for item in items] for day, items in week.items()}
+    
+    def find_schedule_conflicts(self, day_of_week: str, time_slot: str, room: str,
+                                teacher_id: str) -> Dict[str, List[Schedule]]:
+        """Пересечения нового занятия по аудитории и преподавателю.
+        
+        Бросает ValueError, если время указано не в формате ЧЧ:ММ-ЧЧ:ММ.
+        """
+        start, end = parse_time_slot(time_slot)
+        return self._get_timetable().conflicts(day_of_week, start, end, room.strip(), teacher_id)
     
     def add_schedule(self, subject: str, day_of_week: str, time_slot: str, room: str, teacher_id: str) -> bool:
-        """Добавление нового занятия в расписание"""
+        """Добавление нового занятия в расписание (False при ошибке или пересечении)"""
         try:
-            schedule_data = self._load_json(self.schedule_file)
-            new_schedule = Schedule(subject, day_of_week, time_slot, room, teacher_id)
-            schedule_data.append(new_schedule.to_dict())
-            self._save_json(self.schedule_file, schedule_data)
+            start, end = parse_time_slot(time_slot)
+            room = room.strip()
+            # Проверка и запись под межпроцессной блокировкой: иначе два процесса
+            # могут одновременно добавить пересекающиеся занятия
+            with self._lock, self.storage.write_lock():
+                timetable = self._get_timetable()
+                if timetable.conflicts(day_of_week, start, end, room, teacher_id):
+                    return False
+                new_schedule = Schedule(subject, day_of_week, format_time_slot(start, end), room, teacher_id)
+                self.storage.add_schedule(new_schedule)
+                # Если других записей не было, дополняем индекс без перестроения
+                revision = self.storage.schedule_revision()
+                if revision == self._timetable_revision + 1:
+                    timetable.add(new_schedule)
+                    self._timetable_revision = revision
             return True
         except Exception:
-            return False
\ No newline at end of file
+            return False
+    
+    # Массовый импорт и экспорт
+    def _validated_batches(self, records: Iterable[dict], chunk_size: int, convert,
+                           unique: Sequence[tuple] = ()) -> Iterator[list]:
+        """Проверка записей пачками; первая пачка с ошибками прерывает импорт.
+        
+        unique - проверки (название, поле записи, функция "какие значения уже есть
+        в хранилище"): значения не должны повторяться в файле и в хранилище.
+        """
+        seen = {name: {} for name, _, _ in unique}
+        for first_row, chunk in _chunks(records, chunk_size):
+            batch, errors = [], []
+            for row_number, record in enumerate(chunk, first_row):
+                try:
+                    batch.append(convert(record))
+                except (KeyError, ValueError, TypeError) as e:
+                    errors.append(f"строка {row_number}: {e}")
+            if not errors:
+                for name, field, existing in unique:
+                    errors.extend(self._unique_errors(chunk, first_row, name, field, existing, seen[name]))
+            if errors:
+                raise BulkImportError(errors)
+            yield batch
+    
+    @staticmethod
+    def _unique_errors(chunk: List[dict], first_row: int, name: str, field: str, existing,
+                       seen: Dict[str, int]) -> List[str]:
+        """Ошибки повтора значения поля в файле (seen: значение -> строка) и в хранилище"""
+        rows = [(row_number, record[field]) for row_number, record in enumerate(chunk, first_row)
+                if record.get(field)]
+        taken = existing([value for _, value in rows]) if rows else set()
+        errors = []
+        for row_number, value in rows:
+            if value in taken:
+                errors.append(f"строка {row_number}: {name} {value} уже есть в хранилище")
+            elif value in seen:
+                errors.append(f"строка {row_number}: {name} {value} повторяет строку {seen[value]}")
+            else:
+                seen[value] = row_number
+        return errors
+    
+    def _resolve_user(self, record: dict, prefix: str, role: str, cache: Dict[tuple, Optional[User]]) -> str:
+        """ID пользователя по полю <prefix>_id или <prefix>_email с проверкой роли"""
+        if record.get(f"{prefix}_id"):
+            key = ('id', record[f"{prefix}_id"])
+        elif record.get(f"{prefix}_email"):
+            key = ('email', record[f"{prefix}_email"])
+        else:
+            raise KeyError(f"нужно поле {prefix}_id или {prefix}_email")
+        # Каждый пользователь ищется в хранилище один раз за импорт
+        if key not in cache:
+            cache[key] = self.get_user_by_id(key[1]) if key[0] == 'id' else self.get_user_by_email(key[1])
+        user = cache[key]
+        if user is None or user.role != role:
+            raise ValueError(f"{prefix}: пользователь не найден")
+        return user.id
+    
+    def _record_created_at(self, record: dict, default: str) -> str:
+        """Дата записи из импорта (ISO) или время начала импорта"""
+        value = record.get('created_at')
+        if not value:
+            return default
+        return datetime.fromisoformat(str(value)).isoformat()
+    
+    def import_users(self, records: Iterable[dict], chunk_size: int = 10000) -> int:
+        """Импорт пользователей: email, name, role, password или password_hash"""
+        imported_at = datetime.now().isoformat()
+        
+        def convert(record: dict) -> Tuple[User, Optional[str]]:
+            if record['role'] not in ('student', 'teacher'):
+                raise ValueError(f"неизвестная роль {record['role']}")
+            if not record['email'] or not record['name']:
+                raise ValueError("email и name обязательны")
+            # Пароль без готового хеша хешируется потом, вместе со всей пачкой
+            password = None if record.get('password_hash') else record['password']
+            user = User(record['email'], record['name'], record['role'], record.get('password_hash') or "",
+                        record.get('id') or None)
+            user.created_at = self._record_created_at(record, imported_at)
+            return user, password
+        
+        unique = [
+            ('email', 'email', lambda emails: {email for email in emails if self.storage.get_user_by_email(email)}),
+            ('ID', 'id', lambda ids: set(self.storage.get_users_by_ids(ids))),
+        ]
+        users = []
+        # Повторный импорт того же файла отклоняется: проверка и запись под одной блокировкой
+        with self._lock, self.storage.write_lock():
+            for batch in self._validated_batches(records, chunk_size, convert, unique):
+                pending = [(user, password) for user, password in batch if password is not None]
+                hashes = self.hasher.hash_many([password for _, password in pending])
+                for (user, _), password_hash in zip(pending, hashes):
+                    user.password_hash = password_hash
+                users.extend(user for user, _ in batch)
+            count = self.storage.add_users(users)
+        return count
+    
+    def import_grades(self, records: Iterable[dict], chunk_size: int = 10000) -> int:
+        """Потоковый импорт оценок одной транзакцией.
+        
+        Поля: student_id или student_email, teacher_id или teacher_email,
+        subject, grade (1-5), необязательные id и created_at.
+        """
+        user_cache = {}
+        imported_at = datetime.now().isoformat()
+        
+        def convert(record: dict) -> Grade:
+            value = int(record['grade'])
+            if not 1 <= value <= 5:
+                raise ValueError(f"оценка вне диапазона 1-5: {value}")
+            subject = str(record['subject']).strip()
+            if not subject:
+                raise ValueError("пустой предмет")
+            return Grade.from_dict({
+                'id': record.get('id') or str(uuid.uuid4()),
+                'student_id': self._resolve_user(record, 'student', 'student', user_cache),
+                'subject': subject,
+                'grade': value,
+                'teacher_id': self._resolve_user(record, 'teacher', 'teacher', user_cache),
+                'created_at': self._record_created_at(record, imported_at)
+            })
+        
+        # Явные ID не должны повторяться: повторный импорт файла с ID отклоняется
+        unique = [('ID', 'id', lambda ids: self.storage.existing_ids('grades', ids))]
+        with self._lock, self.storage.write_lock():
+            count = self.storage.add_grades(self._validated_batches(records, chunk_size, convert, unique))
+        return count
+    
+    def import_schedule(self, records: Iterable[dict], chunk_size: int = 10000) -> int:
+        """Импорт занятий с проверкой пересечений (в том числе внутри файла).
+        
+        Поля: subject, day_of_week, time_slot, room, teacher_id или teacher_email.
+        """
+        user_cache = {}
+        
+        def convert(record: dict) -> Schedule:
+            start, end = parse_time_slot(record['time_slot'])
+            teacher_id = self._resolve_user(record, 'teacher', 'teacher', user_cache)
+            room = str(record['room']).strip()
+            if timetable.conflicts(record['day_of_week'], start, end, room, teacher_id):
+                raise ValueError("пересечение с другим занятием по аудитории или преподавателю")
+            item = Schedule(record['subject'], record['day_of_week'], format_time_slot(start, end), room,
+                            teacher_id, record.get('id') or None)
+            timetable.add(item)
+            return item
+        
+        # Другие процессы не добавляют занятия, пока идут проверка и запись
+        with self._lock, self.storage.write_lock():
+            # Проверяем на копии индекса, чтобы ошибка не испортила основной
+            timetable = Timetable(self.storage.get_all_schedule())
+            unique = [('ID', 'id', lambda ids: self.storage.existing_ids('schedule', ids))]
+            items = [item for batch in self._validated_batches(records, chunk_size, convert, unique)
+                     for item in batch]
+            count = self.storage.add_schedule_items(items)
+        return count
+    
+    def iter_grade_report(self) -> Iterator[dict]:
+        """Потоковый отчет по оценкам с именами и email, без загрузки всех строк в список"""
+        users = {user.id: user for user in self.get_all_users()}
+        for grade in self.storage.iter_grades():
+            student = users.get(grade.student_id)
+            teacher = users.get(grade.teacher_id)
+            yield {
+                'id': grade.id,
+                'student_name': student.name if student else "Неизвестно",
+                'student_email': student.email if student else "",
+                'subject': grade.subject,
+                'grade': grade.grade,
+                'teacher_name': teacher.name if teacher else "Неизвестно",
+                'teacher_email': teacher.email if teacher else "",
+                'created_at': grade.created_at_iso()
+            }
@@ -0,0 +1,263 @@
+import os
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from locking import file_lock
+import jsoncodec
+import metrics
+
+# Журнал сжимается в снимок, когда в нем записей больше, чем в снимке
+# (но не меньше этого порога) - амортизированно O(1) на запись
+MIN_COMPACTION_RECORDS = 1000
+
+class JournaledTable:
+    """Таблица из JSON снимка и журнала добавлений в формате JSON Lines"""
+
+    def __init__(self, snapshot_file: str, lock_file: str,
+                 load: Callable[[str], list], save: Callable[[str, list], None],
+                 on_commit: Optional[Callable[[], None]] = None):
+        self.snapshot_file = snapshot_file
+        self.log_file = os.path.splitext(snapshot_file)[0] + ".log.jsonl"
+        # Метка сжатия: есть, пока снимок заменяется и журнал обнуляется
+        self.marker_file = os.path.splitext(snapshot_file)[0] + ".compacting"
+        self.lock_file = lock_file
+        self._load = load
+        self._save = save
+        # Вызывается под эксклюзивной блокировкой после каждой успешной дозаписи
+        self._on_commit = on_commit
+
+        # Прочитанное состояние: подпись снимка и позиция в журнале
+        self._snapshot_signature = None
+        self._offset = 0
+        self._loaded = False
+        self.snapshot_count = 0
+        self.log_count = 0
+
+    def _signature(self, filename: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _log_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_file)
+        except OSError:
+            return 0
+
+    @contextmanager
+    def _read_lock(self):
+        """Общая блокировка для чтения; сжатие, прерванное сбоем, сначала завершается"""
+        while True:
+            with file_lock(self.lock_file, shared=True):
+                if not os.path.exists(self.marker_file):
+                    yield
+                    return
+            with file_lock(self.lock_file):
+                self._recover()
+
+    def _recover(self):
+        """Завершение сжатия после сбоя (под эксклюзивной блокировкой).
+
+        Метка остается, если процесс упал между заменой снимка и обнулением
+        журнала. Пока метка есть, журнал не дополняется, поэтому в новом
+        снимке есть либо все записи журнала, либо ни одной - достаточно
+        проверить последнюю.
+        """
+        if not os.path.exists(self.marker_file):
+            return
+        log_records, _ = self._read_log(0)
+        if log_records:
+            last_id = log_records[-1]['id']
+            if any(record['id'] == last_id for record in self._load(self.snapshot_file)):
+                # Снимок уже заменен: записи журнала в нем есть
+                with open(self.log_file, 'wb'):
+                    pass
+        os.remove(self.marker_file)
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        """Таблица уже прочитана в память (дальше подгружаются только изменения)"""
+        return self._loaded
+
+    def position(self) -> Optional[list]:
+        """Опорная точка прочитанного снимка: [inode, mtime, размер, число записей]"""
+        if not self._loaded or self._snapshot_signature is None:
+            return None
+        return list(self._snapshot_signature) + [self.snapshot_count]
+
+    def snapshot_matches(self, position: list) -> bool:
+        """Файл снимка тот же, что в опорной точке position"""
+        signature = self._signature(self.snapshot_file)
+        return signature is not None and list(signature) == position[:3]
+
+    def read_log_since(self, position: list, start: int) -> Optional[List[dict]]:
+        """Записи с номера start без чтения снимка.
+
+        Возвращает None, если снимок заменен после position (сжатие журнала)
+        или запись start находится в снимке, а не в журнале.
+        """
+        with self._read_lock():
+            if not self.snapshot_matches(position) or start < position[3]:
+                return None
+            skip = start - position[3]
+            records = []
+            try:
+                with open(self.log_file, 'rb') as f:
+                    index = 0
+                    for line in f:
+                        if not line.endswith(b'\n') or not line.strip():
+                            continue
+                        if index >= skip:
+                            records.append(jsoncodec.loads(line))
+                        index += 1
+                    metrics.add_bytes(f.tell())
+            except FileNotFoundError:
+                pass
+        metrics.add_rows(len(records))
+        return records
+
+    def is_fresh(self) -> bool:
+        """Проверка без чтения данных: снимок не менялся, журнал не рос"""
+        return (self._loaded
+                and self._snapshot_signature == self._signature(self.snapshot_file)
+                and self._offset == self._log_size())
+
+    def _read_log(self, offset: int) -> Tuple[List[dict], int]:
+        """Чтение полных строк журнала начиная с позиции offset"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], 0
+        # Недописанная последняя строка будет прочитана в следующий раз
+        end = chunk.rfind(b'\n') + 1
+        records = [jsoncodec.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+        metrics.add_bytes(end)
+        metrics.add_rows(len(records))
+        return records, offset + end
+
+    def read_changes(self) -> Tuple[bool, List[dict]]:
+        """Новые записи с момента прошлого чтения.
+
+        Возвращает (True, все записи), если нужна полная перезагрузка
+        (первое чтение или сжатие журнала), иначе (False, добавленные записи).
+        """
+        if self.is_fresh():
+            return False, []
+        with self._read_lock():
+            signature = self._signature(self.snapshot_file)
+            if (not self._loaded or signature != self._snapshot_signature
+                    or self._log_size() < self._offset):
+                snapshot = self._load(self.snapshot_file)
+                log_records, self._offset = self._read_log(0)
+                self._snapshot_signature = signature
+                self._loaded = True
+                self.snapshot_count = len(snapshot)
+                self.log_count = len(log_records)
+                return True, snapshot + log_records
+            log_records, self._offset = self._read_log(self._offset)
+            self.log_count += len(log_records)
+            return False, log_records
+
+    def iter_records(self, needles: Sequence[bytes] = ()) -> Iterator[dict]:
+        """Потоковое чтение снимка и журнала с диска, без загрузки таблицы в память.
+
+        Если заданы needles, записи, в тексте которых нет ни одного из них,
+        пропускаются без разбора. Под общей
+        блокировкой открывается снимок и читается журнал (в памяти остаются
+        только подходящие записи), затем снимок читается без блокировки:
+        сжатие заменяет файл снимка, а открытый дескриптор видит прежний.
+        """
+        with self._read_lock():
+            try:
+                snapshot = open(self.snapshot_file, 'rb')
+            except FileNotFoundError:
+                snapshot = None
+            log_records = []
+            try:
+                with open(self.log_file, 'rb') as f:
+                    for line in f:
+                        # Недописанная последняя строка не видна, как и в _read_log
+                        if not line.endswith(b'\n') or (needles and not any(needle in line for needle in needles)):
+                            continue
+                        if line.strip():
+                            log_records.append(jsoncodec.loads(line))
+                    metrics.add_bytes(f.tell())
+            except FileNotFoundError:
+                pass
+        metrics.add_rows(len(log_records))
+        if snapshot is not None:
+            parsed = 0
+            with snapshot:
+                try:
+                    for record in jsoncodec.iter_array(snapshot, needles):
+                        parsed += 1
+                        yield record
+                except jsoncodec.JSONDecodeError:
+                    # Чтение останавливается на поврежденном месте снимка
+                    pass
+                metrics.add_bytes(snapshot.tell())
+            metrics.add_rows(parsed)
+        yield from log_records
+
+    def append(self, records: List[dict]):
+        """Дозапись в журнал с fsync под эксклюзивной блокировкой"""
+        self.append_batches([records])
+
+    def append_batches(self, batches: Iterable[List[dict]]) -> int:
+        """Дозапись нескольких пачек одной транзакцией.
+
+        Если при получении очередной пачки возникает ошибка, журнал обрезается
+        до исходного размера и записанные пачки не становятся видны читателям.
+        """
+        count = 0
+        with file_lock(self.lock_file):
+            self._recover()
+            with open(self.log_file, 'ab') as f:
+                start = f.seek(0, os.SEEK_END)
+                try:
+                    for records in batches:
+                        f.write(b''.join(jsoncodec.dumps(record) + b'\n' for record in records))
+                        count += len(records)
+                    f.flush()
+                    os.fsync(f.fileno())
+                except BaseException:
+                    f.truncate(start)
+                    raise
+            if self._on_commit is not None:
+                self._on_commit()
+        return count
+
+    def needs_compaction(self) -> bool:
+        return self.log_count >= max(MIN_COMPACTION_RECORDS, self.snapshot_count)
+
+    def compact(self, force: bool = False):
+        """Сжатие журнала в снимок (force - перезапись снимка и при пустом журнале)"""
+        with file_lock(self.lock_file):
+            self._recover()
+            snapshot = self._load(self.snapshot_file)
+            log_records, _ = self._read_log(0)
+            if not log_records and not (force and snapshot):
+                return
+            up_to_date = (self._loaded and self._snapshot_signature == self._signature(self.snapshot_file)
+                          and self._offset == self._log_size())
+            # Снимок заменяется атомарно, затем журнал обнуляется. Метка на это
+            # время не дает после сбоя прочитать записи журнала дважды
+            with open(self.marker_file, 'wb') as f:
+                os.fsync(f.fileno())
+            self._save(self.snapshot_file, snapshot + log_records)
+            with open(self.log_file, 'wb'):
+                pass
+            os.remove(self.marker_file)
+            if up_to_date:
+                # Данные в памяти уже совпадают с новым снимком
+                self._snapshot_signature = self._signature(self.snapshot_file)
+                self._offset = 0
+                self.snapshot_count += self.log_count
+                self.log_count = 0
+            else:
+                # Следующее чтение перезагрузит таблицу целиком
+                self._loaded = False
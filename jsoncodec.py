@@ -0,0 +1,151 @@
+import json
+from typing import BinaryIO, Callable, Iterable, Iterator, Sequence, Tuple
+
+# orjson (если установлен) в разы быстрее стандартного json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError
+
+# Размер блока при поиске записей в файле
+SEARCH_BLOCK_SIZE = 1 << 18
+
+def loads(data: bytes):
+    """Разбор JSON из байтов"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj, indent: bool = False) -> bytes:
+    """Сериализация в UTF-8 JSON (с отступом в 2 пробела, если indent)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    text = json.dumps(obj, ensure_ascii=False, indent=2 if indent else None,
+                      separators=None if indent else (',', ':'))
+    return text.encode('utf-8')
+
+def string_forms(value: str) -> Tuple[bytes, ...]:
+    """Варианты записи строки в JSON: в UTF-8 и с экранированием \\uXXXX (ensure_ascii)"""
+    forms = (json.dumps(value, ensure_ascii=False).encode('utf-8'), json.dumps(value).encode('ascii'))
+    return forms[:1] if value.isascii() else forms
+
+def write_array(f: BinaryIO, records: Iterable) -> int:
+    """Запись JSON массива по одному объекту на строку (формат, удобный для iter_array)"""
+    count = 0
+    f.write(b'[')
+    for record in records:
+        f.write(b',\n' if count else b'\n')
+        f.write(dumps(record))
+        count += 1
+    f.write(b'\n]\n')
+    return count
+
+def _record(text: bytes) -> Iterator:
+    """Разбор текста записи массива без запятой и скобок по краям"""
+    if text.endswith(b']'):
+        # Конец массива (в одной строке с последним объектом)
+        text = text[:-1].rstrip()
+    if text.endswith(b','):
+        text = text[:-1]
+    if not text:
+        return
+    try:
+        record = loads(text)
+    except JSONDecodeError:
+        # Несколько объектов в одной строке (компактный JSON)
+        yield from loads(b'[' + text + b']')
+        return
+    yield record
+
+def _finder(needles: Sequence[bytes]) -> Callable[[bytes, int], int]:
+    """Поиск первого вхождения любого из needles: (данные, начало) -> позиция или -1.
+
+    Каждый needle ищется через bytes.find, а найденные позиции запоминаются
+    до конца блока: needle, которого в блоке нет, просматривает его один раз.
+    """
+    if len(needles) == 1:
+        needle = needles[0]
+        return lambda data, start: data.find(needle, start)
+    state = {'data': None, 'positions': [-1] * len(needles)}
+
+    def find(data: bytes, start: int) -> int:
+        positions = state['positions']
+        if state['data'] is not data:
+            state['data'] = data
+            positions[:] = [data.find(needle, start) for needle in needles]
+        for index, position in enumerate(positions):
+            if 0 <= position < start:
+                positions[index] = data.find(needles[index], start)
+        found = [position for position in positions if position >= 0]
+        return min(found) if found else -1
+    return find
+
+def _search_lines(f: BinaryIO, needles: Sequence[bytes]) -> Iterator:
+    """Объекты из строк, содержащих любой из needles, для формата "объект на строку".
+
+    Файл читается блоками, а строки находятся поиском по блоку,
+    поэтому на пропущенные строки не тратится работа интерпретатора.
+    """
+    find = _finder(needles)
+    tail = b''
+    while True:
+        block = f.read(SEARCH_BLOCK_SIZE)
+        data = tail + block
+        # Последняя неполная строка переносится в следующий блок
+        end = data.rfind(b'\n') + 1 if block else len(data)
+        lines, tail = data[:end], data[end:]
+        position = find(lines, 0)
+        while position >= 0:
+            start = lines.rfind(b'\n', 0, position) + 1
+            stop = lines.find(b'\n', position)
+            if stop < 0:
+                stop = len(lines)
+            text = lines[start:stop].strip()
+            if text.startswith(b'['):
+                text = text[1:].lstrip()
+            if not text.startswith(b'{'):
+                raise JSONDecodeError("Ожидается объект в начале строки", text.decode('utf-8', 'replace'), 0)
+            yield from _record(text)
+            position = find(lines, stop)
+        if not block:
+            return
+
+def iter_array(f: BinaryIO, needles: Sequence[bytes] = ()) -> Iterator:
+    """Потоковый разбор JSON массива плоских объектов из файла в двоичном режиме.
+
+    Объект может занимать одну строку или несколько строк с отступами, в
+    памяти держится только текущий объект. Если заданы needles, объекты,
+    в тексте которых нет ни одного из них, пропускаются без разбора
+    (предварительный фильтр по байтам).
+    """
+    pending = b''
+    started = False
+    for line in f:
+        if not started:
+            line = line.lstrip()
+            if not line:
+                continue
+            if not line.startswith(b'['):
+                raise JSONDecodeError("Ожидается JSON массив", line.decode('utf-8', 'replace'), 0)
+            started = True
+            line = line[1:]
+            if needles and not line.strip():
+                # Формат write_array (объект на строку) - быстрый поиск по блокам
+                position = f.tell()
+                first = f.readline()
+                f.seek(position)
+                if first.startswith(b'{'):
+                    yield from _search_lines(f, needles)
+                    return
+        pending += line
+        text = pending.strip()
+        # Строки JSON не содержат переводов строк, поэтому "}" в конце строки
+        # закрывает объект, а не стоит внутри значения
+        closed = text.rstrip(b',]')
+        if closed and not closed.endswith(b'}'):
+            continue
+        pending = b''
+        if not needles or any(needle in text for needle in needles):
+            yield from _record(text)
@@ -0,0 +1,86 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса
+    fcntl = None
+
+_process_lock = threading.RLock()
+# Блокировки, уже взятые текущим потоком: путь -> (shared, глубина вложенности)
+_held = threading.local()
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """Межпроцессная блокировка через flock на отдельном файле.
+
+    Повторный вход в том же потоке не блокируется: под эксклюзивной
+    блокировкой можно вызывать код, который берет общую или эксклюзивную.
+    """
+    held: Dict[str, list] = getattr(_held, 'locks', None)
+    if held is None:
+        held = _held.locks = {}
+    state = held.get(path)
+    if state is not None:
+        if state[0] and not shared:
+            raise RuntimeError(f"Нельзя повысить общую блокировку до эксклюзивной: {path}")
+        state[1] += 1
+        try:
+            yield
+        finally:
+            state[1] -= 1
+        return
+    if fcntl is None:
+        with _process_lock:
+            held[path] = [shared, 1]
+            try:
+                yield
+            finally:
+                del held[path]
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[path] = [shared, 1]
+        try:
+            yield
+        finally:
+            del held[path]
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class VersionFile:
+    """Счетчики изменений таблиц в маленьком файле, общем для всех процессов.
+
+    Писатель увеличивает счетчик своей таблицы под эксклюзивной блокировкой
+    данных, сразу после записи. Читатель по счетчикам узнает, что данные
+    изменились в другом процессе, не читая сами данные.
+    """
+
+    def __init__(self, path: str, tables: Sequence[str]):
+        self.path = path
+        self.tables = tuple(tables)
+
+    def read(self) -> Tuple[int, ...]:
+        try:
+            with open(self.path, 'rb') as f:
+                values = [int(part) for part in f.read().split()]
+        except (FileNotFoundError, ValueError):
+            values = []
+        if len(values) > len(self.tables):
+            values = []
+        # Файл от версии с меньшим числом таблиц: у новых таблиц счетчик 0
+        return tuple(values + [0] * (len(self.tables) - len(values)))
+
+    def get(self, table: str) -> int:
+        return self.read()[self.tables.index(table)]
+
+    def bump(self, table: str):
+        """Увеличение счетчика таблицы (вызывается под эксклюзивной блокировкой)"""
+        values = list(self.read())
+        values[self.tables.index(table)] += 1
+        # Файл заменяется атомарно: читатели без блокировки не видят половину записи
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(" ".join(str(value) for value in values).encode())
+        os.replace(tmp_file, self.path)
@@ -0,0 +1,199 @@
+"""Метрики процесса: число вызовов, гистограммы задержек, прочитанные байты и строки.
+
+Замеры ведутся по областям (scope) вида (вид, имя), например ('database', 'get_students')
+или ('page', 'teacher_dashboard'). Байты и строки, прочитанные хранилищем, относятся
+ко всем областям, открытым в текущем потоке, поэтому страница видит суммарный объем
+чтения всех вызванных ею методов.
+
+Пример:
+    with metrics.track('page', 'login_page'):
+        ...
+    metrics.write_prometheus("data/metrics.prom")
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Верхние границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class _ScopeStats:
+    """Накопленные показатели одной области"""
+
+    __slots__ = ('calls', 'errors', 'seconds', 'buckets', 'bytes_read', 'rows_parsed')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes_read = 0
+        self.rows_parsed = 0
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _ScopeStats] = {}
+        self._local = threading.local()
+        self.started_at = time.time()
+
+    def _stack(self) -> List[_ScopeStats]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _scope(self, kind: str, name: str) -> _ScopeStats:
+        key = (kind, name)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, _ScopeStats())
+        return stats
+
+    @contextmanager
+    def track(self, kind: str, name: str):
+        stats = self._scope(kind, name)
+        stack = self._stack()
+        stack.append(stats)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                stats.calls += 1
+                stats.errors += failed
+                stats.seconds += elapsed
+                stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def add(self, bytes_read: int = 0, rows_parsed: int = 0):
+        stack = self._stack()
+        if not stack:
+            return
+        with self._lock:
+            # Одна и та же область может быть открыта несколько раз (рекурсия) - считаем один раз
+            for stats in set(stack):
+                stats.bytes_read += bytes_read
+                stats.rows_parsed += rows_parsed
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            items = sorted(self._stats.items())
+            return [{
+                'kind': kind,
+                'name': name,
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'seconds': stats.seconds,
+                'buckets': list(stats.buckets),
+                'bytes_read': stats.bytes_read,
+                'rows_parsed': stats.rows_parsed,
+            } for (kind, name), stats in items]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+_registry = _Registry()
+
+def track(kind: str, name: str):
+    """Контекстный менеджер замера области: время, вызовы, ошибки"""
+    return _registry.track(kind, name)
+
+def add_bytes(count: int):
+    """Учет прочитанных байт в открытых областях текущего потока"""
+    _registry.add(bytes_read=count)
+
+def add_rows(count: int):
+    """Учет разобранных записей в открытых областях текущего потока"""
+    _registry.add(rows_parsed=count)
+
+def timed(kind: str, name: str = None):
+    """Декоратор замера функции"""
+    def decorator(func):
+        scope_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _registry.track(kind, scope_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrument(kind: str):
+    """Декоратор класса: замер всех публичных методов.
+
+    Генераторы пропускаются: их тело выполняется уже после возврата из
+    вызова, по мере чтения потребителем.
+    """
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('_') or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+                continue
+            setattr(cls, attr, timed(kind, attr)(value))
+        return cls
+    return decorator
+
+def snapshot() -> List[dict]:
+    """Текущие показатели всех областей"""
+    return _registry.snapshot()
+
+def reset():
+    """Сброс всех показателей"""
+    _registry.reset()
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus() -> str:
+    """Показатели в текстовом формате Prometheus"""
+    stats = snapshot()
+    lines = [
+        "# HELP aristotel_calls_total Number of calls per scope.",
+        "# TYPE aristotel_calls_total counter",
+    ]
+    labels = [f'kind="{_escape(item["kind"])}",name="{_escape(item["name"])}"' for item in stats]
+    lines += [f"aristotel_calls_total{{{label}}} {item['calls']}" for label, item in zip(labels, stats)]
+    lines += ["# HELP aristotel_errors_total Number of calls that raised an exception.",
+              "# TYPE aristotel_errors_total counter"]
+    lines += [f"aristotel_errors_total{{{label}}} {item['errors']}" for label, item in zip(labels, stats)]
+    lines += ["# HELP aristotel_bytes_read_total Bytes read from storage files within the scope.",
+              "# TYPE aristotel_bytes_read_total counter"]
+    lines += [f"aristotel_bytes_read_total{{{label}}} {item['bytes_read']}" for label, item in zip(labels, stats)]
+    lines += ["# HELP aristotel_rows_parsed_total Records parsed from storage within the scope.",
+              "# TYPE aristotel_rows_parsed_total counter"]
+    lines += [f"aristotel_rows_parsed_total{{{label}}} {item['rows_parsed']}" for label, item in zip(labels, stats)]
+    lines += ["# HELP aristotel_latency_seconds Call latency per scope.",
+              "# TYPE aristotel_latency_seconds histogram"]
+    for label, item in zip(labels, stats):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), item['buckets']):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(f'aristotel_latency_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f"aristotel_latency_seconds_sum{{{label}}} {item['seconds']:.6f}")
+        lines.append(f"aristotel_latency_seconds_count{{{label}}} {item['calls']}")
+    lines += ["# HELP aristotel_process_start_time_seconds Start of the measurement period.",
+              "# TYPE aristotel_process_start_time_seconds gauge",
+              f"aristotel_process_start_time_seconds {_registry.started_at:.3f}"]
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: str):
+    """Атомарная запись показателей в файл (для node_exporter textfile collector)"""
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_file, path)
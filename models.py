@@ -1,10 +1,35 @@
 from datetime import datetime
-from typing import Optional
+from sys import intern
+from typing import Optional, Union
 import uuid
 
-class User:
+class LazyCreatedAt:
+    """Поле created_at, которое разбирается из ISO строки только при обращении"""
+
+    __slots__ = ('_created_at',)
+
+    @property
+    def created_at(self) -> datetime:
+        value = self._created_at
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            self._created_at = value
+        return value
+
+    @created_at.setter
+    def created_at(self, value: Union[datetime, str]):
+        self._created_at = value
+
+    def created_at_iso(self) -> str:
+        """ISO строка без лишнего разбора и форматирования"""
+        value = self._created_at
+        return value if isinstance(value, str) else value.isoformat()
+
+class User(LazyCreatedAt):
     """Модель пользователя (студент или преподаватель)"""
-    
+
+    __slots__ = ('id', 'email', 'name', 'role', 'password_hash')
+
     def __init__(self, email: str, name: str, role: str, password_hash: str, user_id: str = None):
         self.id = user_id or str(uuid.uuid4())
         self.email = email
@@ -12,7 +37,7 @@ class User:
         self.role = role  # 'student' или 'teacher'
         self.password_hash = password_hash
         self.created_at = datetime.now()
-    
+
     def to_dict(self) -> dict:
         """Преобразование объекта в словарь для JSON"""
         return {
@@ -21,25 +46,26 @@ class User:
             'name': self.name,
             'role': self.role,
             'password_hash': self.password_hash,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at_iso()
         }
-    
+
     @classmethod
     def from_dict(cls, data: dict) -> 'User':
-        """Создание объекта из словаря"""
-        user = cls(
-            email=data['email'],
-            name=data['name'],
-            role=data['role'],
-            password_hash=data['password_hash'],
-            user_id=data['id']
-        )
-        user.created_at = datetime.fromisoformat(data['created_at'])
+        """Создание объекта из словаря (без генерации UUID и текущего времени)"""
+        user = cls.__new__(cls)
+        user.id = data['id']
+        user.email = data['email']
+        user.name = data['name']
+        user.role = data['role']
+        user.password_hash = data['password_hash']
+        user._created_at = data['created_at']
         return user
 
-class Grade:
+class Grade(LazyCreatedAt):
     """Модель оценки"""
-    
+
+    __slots__ = ('id', 'student_id', 'subject', 'grade', 'teacher_id')
+
     def __init__(self, student_id: str, subject: str, grade: int, teacher_id: str, grade_id: str = None):
         self.id = grade_id or str(uuid.uuid4())
         self.student_id = student_id
@@ -47,7 +73,7 @@ class Grade:
         self.grade = grade
         self.teacher_id = teacher_id
         self.created_at = datetime.now()
-    
+
     def to_dict(self) -> dict:
         """Преобразование объекта в словарь для JSON"""
         return {
@@ -56,25 +82,58 @@ class Grade:
             'subject': self.subject,
             'grade': self.grade,
             'teacher_id': self.teacher_id,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at_iso()
         }
-    
+
     @classmethod
     def from_dict(cls, data: dict) -> 'Grade':
-        """Создание объекта из словаря"""
-        grade = cls(
-            student_id=data['student_id'],
-            subject=data['subject'],
-            grade=data['grade'],
-            teacher_id=data['teacher_id'],
-            grade_id=data['id']
-        )
-        grade.created_at = datetime.fromisoformat(data['created_at'])
+        """Создание объекта из словаря (без генерации UUID и текущего времени)"""
+        grade = cls.__new__(cls)
+        grade.id = data['id']
+        # Повторяющиеся строки хранятся в одном экземпляре
+        grade.student_id = intern(data['student_id'])
+        grade.subject = intern(data['subject'])
+        grade.grade = data['grade']
+        grade.teacher_id = intern(data['teacher_id'])
+        grade._created_at = data['created_at']
         return grade
 
-class Schedule:
+    @classmethod
+    def from_fields(cls, grade_id: str, student_id: str, subject: str, value: int, teacher_id: str,
+                    created_at: str) -> 'Grade':
+        """Создание объекта из разобранных полей (строки уже общие - из справочников хранилища)"""
+        grade = cls.__new__(cls)
+        grade.id = grade_id
+        grade.student_id = student_id
+        grade.subject = subject
+        grade.grade = value
+        grade.teacher_id = teacher_id
+        grade._created_at = created_at
+        return grade
+
+class Subject:
+    """Модель предмета: целочисленный ключ и название"""
+
+    __slots__ = ('id', 'name')
+
+    def __init__(self, name: str, subject_id: int):
+        self.id = subject_id
+        self.name = name
+
+    def to_dict(self) -> dict:
+        """Преобразование объекта в словарь для JSON"""
+        return {'id': self.id, 'name': self.name}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Subject':
+        """Создание объекта из словаря"""
+        return cls(intern(data['name']), data['id'])
+
+class Schedule(LazyCreatedAt):
     """Модель расписания"""
-    
+
+    __slots__ = ('id', 'subject', 'day_of_week', 'time_slot', 'room', 'teacher_id')
+
     def __init__(self, subject: str, day_of_week: str, time_slot: str, room: str, teacher_id: str, schedule_id: str = None):
         self.id = schedule_id or str(uuid.uuid4())
         self.subject = subject
@@ -83,7 +142,7 @@ class Schedule:
         self.room = room
         self.teacher_id = teacher_id
         self.created_at = datetime.now()
-    
+
     def to_dict(self) -> dict:
         """Преобразование объекта в словарь для JSON"""
         return {
@@ -93,19 +152,18 @@ class Schedule:
             'time_slot': self.time_slot,
             'room': self.room,
             'teacher_id': self.teacher_id,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at_iso()
         }
-    
+
     @classmethod
     def from_dict(cls, data: dict) -> 'Schedule':
-        """Создание объекта из словаря"""
-        schedule = cls(
-            subject=data['subject'],
-            day_of_week=data['day_of_week'],
-            time_slot=data['time_slot'],
-            room=data['room'],
-            teacher_id=data['teacher_id'],
-            schedule_id=data['id']
-        )
-        schedule.created_at = datetime.fromisoformat(data['created_at'])
-        return schedule
\ No newline at end of file
+        """Создание объекта из словаря (без генерации UUID и текущего времени)"""
+        schedule = cls.__new__(cls)
+        schedule.id = data['id']
+        schedule.subject = intern(data['subject'])
+        schedule.day_of_week = intern(data['day_of_week'])
+        schedule.time_slot = intern(data['time_slot'])
+        schedule.room = intern(data['room'])
+        schedule.teacher_id = intern(data['teacher_id'])
+        schedule._created_at = data['created_at']
+        return schedule
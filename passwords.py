@@ -0,0 +1,130 @@
+"""Хеширование паролей: scrypt или PBKDF2 с солью, проверка старых SHA-256 хешей.
+
+Форматы хранимых хешей:
+    scrypt$<n>$<r>$<p>$<соль>$<хеш>           (соль и хеш в base64)
+    pbkdf2_sha256$<итерации>$<соль>$<хеш>
+    <64 шестнадцатеричных символа>             (старый SHA-256 без соли)
+
+Вычисления выполняются в общем пуле потоков: hashlib отпускает GIL, поэтому
+хеширование идет параллельно, а размер пула ограничивает долю процессора,
+которую может занять волна входов, и остальные сессии продолжают работать.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+ALGORITHMS = ('scrypt', 'pbkdf2')
+DEFAULT_SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+DEFAULT_PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _pool(workers: int) -> ThreadPoolExecutor:
+    """Общий для процесса пул хеширования (создается при первом обращении)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        return _executor
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data.encode('ascii'))
+
+def _is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and '$' not in stored
+
+class PasswordHasher:
+    """Хеширование с настраиваемой стоимостью.
+
+    Параметры по умолчанию берутся из переменных окружения:
+    ARISTOTEL_PASSWORD_ALGORITHM (scrypt|pbkdf2), ARISTOTEL_SCRYPT_N,
+    ARISTOTEL_PBKDF2_ITERATIONS, ARISTOTEL_HASH_WORKERS.
+    """
+
+    def __init__(self, algorithm: str = 'scrypt', scrypt_n: int = DEFAULT_SCRYPT_N,
+                 pbkdf2_iterations: int = DEFAULT_PBKDF2_ITERATIONS, workers: Optional[int] = None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Неизвестный алгоритм хеширования: {algorithm}")
+        if algorithm == 'scrypt' and not hasattr(hashlib, 'scrypt'):
+            # Python без OpenSSL 1.1+: scrypt недоступен
+            algorithm = 'pbkdf2'
+        if scrypt_n < 2 or scrypt_n & (scrypt_n - 1):
+            raise ValueError(f"ARISTOTEL_SCRYPT_N должно быть степенью двойки: {scrypt_n}")
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+
+    @classmethod
+    def from_env(cls) -> 'PasswordHasher':
+        workers = os.environ.get("ARISTOTEL_HASH_WORKERS")
+        return cls(os.environ.get("ARISTOTEL_PASSWORD_ALGORITHM", 'scrypt'),
+                   int(os.environ.get("ARISTOTEL_SCRYPT_N", DEFAULT_SCRYPT_N)),
+                   int(os.environ.get("ARISTOTEL_PBKDF2_ITERATIONS", DEFAULT_PBKDF2_ITERATIONS)),
+                   int(workers) if workers else None)
+
+    def _run(self, func, *args):
+        return _pool(self.workers).submit(func, *args).result()
+
+    def _hash_now(self, password: str) -> str:
+        salt = os.urandom(SALT_BYTES)
+        if self.algorithm == 'scrypt':
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=self.scrypt_n, r=SCRYPT_R, p=SCRYPT_P,
+                                    maxmem=256 * self.scrypt_n * SCRYPT_R, dklen=HASH_BYTES)
+            return f"scrypt${self.scrypt_n}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.pbkdf2_iterations, HASH_BYTES)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @staticmethod
+    def _verify_now(password: str, stored: str) -> bool:
+        if _is_legacy(stored):
+            expected = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(expected, stored)
+        parts = stored.split('$')
+        try:
+            if parts[0] == 'scrypt':
+                n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+                salt, digest = _b64decode(parts[4]), _b64decode(parts[5])
+                actual = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                        maxmem=256 * n * r * p, dklen=len(digest))
+            elif parts[0] == 'pbkdf2_sha256':
+                salt, digest = _b64decode(parts[2]), _b64decode(parts[3])
+                actual = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, int(parts[1]), len(digest))
+            else:
+                return False
+        except (IndexError, ValueError):
+            return False
+        return hmac.compare_digest(actual, digest)
+
+    def hash(self, password: str) -> str:
+        """Новый хеш пароля со случайной солью"""
+        return self._run(self._hash_now, password)
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Хеши пачки паролей: задачи отдаются пулу все сразу и считаются параллельно"""
+        return list(_pool(self.workers).map(self._hash_now, passwords))
+
+    def verify(self, password: str, stored: str) -> bool:
+        """Проверка пароля по хешу любого поддерживаемого формата"""
+        if _is_legacy(stored):
+            # Один SHA-256 дешевле передачи задачи в пул
+            return self._verify_now(password, stored)
+        return self._run(self._verify_now, password, stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Хеш старого формата или с другими параметрами стоимости"""
+        if self.algorithm == 'scrypt':
+            return not stored.startswith(f"scrypt${self.scrypt_n}${SCRYPT_R}${SCRYPT_P}$")
+        return not stored.startswith(f"pbkdf2_sha256${self.pbkdf2_iterations}$")
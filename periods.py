@@ -0,0 +1,82 @@
+"""Календарные периоды для отчетов по оценкам: день, неделя, месяц, семестр, год.
+
+Учебный год делится на осенний семестр (1 сентября - 31 января) и весенний
+(1 февраля - 31 августа). Начало периода - его первый день, конец -
+последний день включительно, как в фильтрах по дате.
+"""
+from datetime import date, timedelta
+from typing import List, Tuple
+
+PERIODS = ('day', 'week', 'month', 'semester', 'year')
+
+# Первые месяцы семестров: осеннего и весеннего
+AUTUMN_START_MONTH = 9
+SPRING_START_MONTH = 2
+
+MONTHS = ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь", "Июль", "Август",
+          "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
+
+def _check_period(period: str):
+    if period not in PERIODS:
+        raise ValueError(f"Недопустимый период: {period}")
+
+def period_start(day: date, period: str) -> date:
+    """Первый день периода, в который попадает day"""
+    _check_period(period)
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'year':
+        return date(day.year, 1, 1)
+    if day.month >= AUTUMN_START_MONTH:
+        return date(day.year, AUTUMN_START_MONTH, 1)
+    if day.month < SPRING_START_MONTH:
+        return date(day.year - 1, AUTUMN_START_MONTH, 1)
+    return date(day.year, SPRING_START_MONTH, 1)
+
+def next_period(start: date, period: str) -> date:
+    """Первый день следующего периода (start - начало периода)"""
+    _check_period(period)
+    if period == 'day':
+        return start + timedelta(days=1)
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    if period == 'year':
+        return date(start.year + 1, 1, 1)
+    if start.month == AUTUMN_START_MONTH:
+        return date(start.year + 1, SPRING_START_MONTH, 1)
+    return date(start.year, AUTUMN_START_MONTH, 1)
+
+def period_end(start: date, period: str) -> date:
+    """Последний день периода включительно"""
+    return next_period(start, period) - timedelta(days=1)
+
+def period_title(start: date, period: str) -> str:
+    """Название периода для интерфейса: "Сентябрь 2024", "Осенний семестр 2024/2025\""""
+    _check_period(period)
+    if period == 'day':
+        return start.strftime("%d.%m.%Y")
+    if period == 'week':
+        return f"{start.strftime('%d.%m')}–{period_end(start, period).strftime('%d.%m.%Y')}"
+    if period == 'month':
+        return f"{MONTHS[start.month - 1]} {start.year}"
+    if period == 'year':
+        return str(start.year)
+    if start.month == AUTUMN_START_MONTH:
+        return f"Осенний семестр {start.year}/{start.year + 1}"
+    return f"Весенний семестр {start.year - 1}/{start.year}"
+
+def periods_between(first: date, last: date, period: str) -> List[Tuple[date, date]]:
+    """Периоды от содержащего first до содержащего last: [(первый день, последний день)]"""
+    result = []
+    start = period_start(first, period)
+    while start <= last:
+        following = next_period(start, period)
+        result.append((start, following - timedelta(days=1)))
+        start = following
+    return result
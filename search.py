@@ -0,0 +1,98 @@
+"""Поиск пользователей по началу слов имени и email.
+
+Слова - части имени и email между пробелами и знаками препинания
+("Иван Петров", "ivan.petrov@university.edu" -> иван, петров, ivan,
+petrov, university, edu). Сравнение без учета регистра, ё и е не
+различаются. Запрос тоже разбивается на слова: пользователь подходит,
+если с каждого слова запроса начинается какое-нибудь его слово.
+"""
+import re
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, List, Tuple
+from models import User
+
+_WORD = re.compile(r"[^\W_]+")
+
+def normalize(text: str) -> str:
+    """Приведение к виду для сравнения: нижний регистр, ё -> е"""
+    return text.casefold().replace('ё', 'е')
+
+def words(text: str) -> List[str]:
+    """Слова текста в нормализованном виде"""
+    return _WORD.findall(normalize(text))
+
+class UserSearchIndex:
+    """Отсортированный словарь слов со списками пользователей.
+
+    Слова с заданным началом занимают непрерывный участок словаря, и он
+    находится двоичным поиском. Участок обходится по алфавиту (точное
+    совпадение слова - первым) до limit пользователей, поэтому короткий
+    запрос не перебирает всех подходящих.
+    """
+
+    def __init__(self, users: List[User] = ()):
+        self.users: List[User] = []
+        self._user_words: List[Tuple[str, ...]] = []
+        # Слово -> номера пользователей; те же списки лежат в _postings по порядку слов
+        self._index: Dict[str, List[int]] = {}
+        self._words: List[str] = []
+        self._postings: List[List[int]] = []
+        self._totals: List[int] = [0]
+        self.add(users)
+
+    def add(self, users: List[User]):
+        """Добавление пользователей; словарь пересортировывается, только если появились новые слова"""
+        index = self._index
+        new_words = False
+        for user in users:
+            number = len(self.users)
+            self.users.append(user)
+            # Одна нормализация на пользователя: имя и email через пробел
+            user_words = tuple(words(f"{user.name} {user.email}"))
+            self._user_words.append(user_words)
+            for word in user_words:
+                numbers = index.get(word)
+                if numbers is None:
+                    index[word] = [number]
+                    new_words = True
+                elif numbers[-1] != number:
+                    # Повтор слова у того же пользователя не добавляется
+                    numbers.append(number)
+        if new_words:
+            self._words = sorted(index)
+            self._postings = [index[word] for word in self._words]
+        # Накопленное число записей в списках: размер участка словаря за O(1)
+        self._totals = [0, *accumulate(map(len, self._postings))]
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def _word_range(self, prefix: str) -> Tuple[int, int]:
+        """Участок словаря со словами, начинающимися с prefix"""
+        # Символ U+10FFFF больше любого, которым может продолжаться слово
+        return bisect_left(self._words, prefix), bisect_left(self._words, prefix + '\U0010ffff')
+
+    def search(self, query: str, limit: int = 20) -> List[User]:
+        """Пользователи, у которых с каждого слова запроса начинается какое-нибудь слово"""
+        prefixes = list(dict.fromkeys(words(query)))
+        if not prefixes or limit <= 0:
+            return []
+        ranges = {prefix: self._word_range(prefix) for prefix in prefixes}
+        # Кандидаты берутся по самому узкому участку, остальные слова проверяются у кандидата
+        main = min(prefixes, key=lambda prefix: self._totals[ranges[prefix][1]] - self._totals[ranges[prefix][0]])
+        others = [prefix for prefix in prefixes if prefix != main]
+        found: List[int] = []
+        seen = set()
+        low, high = ranges[main]
+        for position in range(low, high):
+            for number in self._postings[position]:
+                if number in seen:
+                    continue
+                seen.add(number)
+                user_words = self._user_words[number]
+                if all(any(word.startswith(prefix) for word in user_words) for prefix in others):
+                    found.append(number)
+                    if len(found) == limit:
+                        return [self.users[number] for number in found]
+        return [self.users[number] for number in found]
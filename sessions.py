@@ -0,0 +1,167 @@
+"""Подписанные токены сессий.
+
+Токен - "<ID пользователя>.<срок действия>.<HMAC-SHA256>". Он позволяет
+восстановить вход (например, после перезагрузки страницы) без повторного
+хеширования пароля. Проверенные токены кэшируются в процессе, поэтому
+повторная проверка - один поиск в словаре. Отозванные токены дописываются
+в общий файл: отзыв действует во всех процессах и после перезапуска.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from locking import file_lock
+
+DEFAULT_TTL = 12 * 3600
+MAX_CACHED_TOKENS = 100_000
+# Файл отзывов переписывается без просроченных записей, когда вырастает больше этого
+MAX_REVOKED_FILE_SIZE = 1 << 20
+
+class SessionTokens:
+    """Выдача и проверка токенов сессий"""
+
+    def __init__(self, secret: bytes, ttl: int = DEFAULT_TTL, revoked_file: Optional[str] = None):
+        self._secret = secret
+        self.ttl = ttl
+        self.revoked_file = revoked_file
+        self._lock = threading.Lock()
+        # Токен -> (ID пользователя, срок действия)
+        self._cache: Dict[str, Tuple[str, float]] = {}
+        # Подписи отозванных токенов -> срок действия (после него запись не нужна)
+        self._revoked: Dict[str, float] = {}
+        # Прочитанная часть файла отзывов: inode и позиция
+        self._revoked_inode = None
+        self._revoked_offset = 0
+
+    @classmethod
+    def from_key_file(cls, path: str, ttl: int = DEFAULT_TTL,
+                      revoked_file: Optional[str] = None) -> 'SessionTokens':
+        """Ключ из ARISTOTEL_SECRET_KEY или из файла (создается при первом запуске).
+
+        Общий ключ нужен, чтобы токен одного процесса принимали остальные.
+        """
+        secret = os.environ.get("ARISTOTEL_SECRET_KEY")
+        if secret:
+            return cls(secret.encode(), ttl, revoked_file)
+        try:
+            # O_EXCL: из нескольких одновременно стартующих процессов ключ создаст один
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(base64.b64encode(os.urandom(32)))
+        with open(path, 'rb') as f:
+            key = f.read().strip()
+        if not key:
+            raise ValueError(f"Пустой ключ сессий: {path}")
+        return cls(key, ttl, revoked_file)
+
+    def _signature(self, payload: str) -> str:
+        return hmac.new(self._secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, user_id: str) -> str:
+        """Новый токен для пользователя"""
+        expires = int(time.time()) + self.ttl
+        payload = f"{user_id}.{expires}"
+        token = f"{payload}.{self._signature(payload)}"
+        with self._lock:
+            self._remember(token, user_id, expires)
+        return token
+
+    def _remember(self, token: str, user_id: str, expires: float):
+        if len(self._cache) >= MAX_CACHED_TOKENS:
+            # Просроченные токены удаляются, только когда кэш заполнен
+            now = time.time()
+            self._cache = {key: value for key, value in self._cache.items() if value[1] > now}
+            if len(self._cache) >= MAX_CACHED_TOKENS:
+                self._cache.clear()
+        self._cache[token] = (user_id, expires)
+
+    def _refresh_revoked(self):
+        """Подгрузка отзывов, дописанных в файл с прошлого чтения (под self._lock)"""
+        if self.revoked_file is None:
+            return
+        try:
+            stat = os.stat(self.revoked_file)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._revoked_inode or stat.st_size < self._revoked_offset:
+            # Файл переписан без просроченных записей: читается сначала
+            self._revoked_inode = stat.st_ino
+            self._revoked_offset = 0
+        if stat.st_size == self._revoked_offset:
+            return
+        with open(self.revoked_file, 'rb') as f:
+            f.seek(self._revoked_offset)
+            chunk = f.read()
+        # Недописанная последняя строка будет прочитана в следующий раз
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].split():
+            expires, _, signature = line.partition(b':')
+            self._revoked[signature.decode()] = float(expires)
+        self._revoked_offset += end
+
+    def verify(self, token: str) -> Optional[str]:
+        """ID пользователя по действующему токену, иначе None"""
+        now = time.time()
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            self._refresh_revoked()
+            if signature in self._revoked:
+                return None
+            cached = self._cache.get(token)
+        if cached is not None:
+            return cached[0] if cached[1] > now else None
+        try:
+            user_id, expires, signature = token.rsplit('.', 2)
+            expires = int(expires)
+        except ValueError:
+            return None
+        if expires <= now or not hmac.compare_digest(signature, self._signature(f"{user_id}.{expires}")):
+            return None
+        with self._lock:
+            self._remember(token, user_id, expires)
+        return user_id
+
+    def revoke(self, token: str):
+        """Отзыв токена при выходе: в этом процессе и в файле отзывов для остальных"""
+        try:
+            _, expires, signature = token.rsplit('.', 2)
+            expires = int(expires)
+        except ValueError:
+            return
+        with self._lock:
+            self._cache.pop(token, None)
+            if len(self._revoked) >= MAX_CACHED_TOKENS:
+                now = time.time()
+                self._revoked = {key: value for key, value in self._revoked.items() if value > now}
+            self._revoked[signature] = expires
+        if self.revoked_file is None or expires <= time.time():
+            return
+        with file_lock(self.revoked_file + ".lock"):
+            self._compact_revoked()
+            with open(self.revoked_file, 'ab') as f:
+                f.write(f"{expires}:{signature}\n".encode())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _compact_revoked(self):
+        """Перезапись большого файла отзывов без просроченных записей (под блокировкой файла)"""
+        try:
+            if os.path.getsize(self.revoked_file) < MAX_REVOKED_FILE_SIZE:
+                return
+        except FileNotFoundError:
+            return
+        now = time.time()
+        with open(self.revoked_file, 'rb') as f:
+            lines = [line for line in f.read().split() if float(line.partition(b':')[0]) > now]
+        tmp_file = self.revoked_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(b''.join(line + b'\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.revoked_file)
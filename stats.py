@@ -0,0 +1,118 @@
+"""Материализованные агрегаты оценок по студентам и преподавателям.
+
+Агрегаты обновляются по одной оценке при записи и сохраняются контрольной
+точкой (grade_stats.json). Точка привязана к ревизии хранилища - позиции
+последней учтенной оценки - и ID этой оценки, поэтому после перезапуска
+достаточно дочитать оценки, добавленные после нее.
+"""
+import os
+from typing import Dict, Optional
+from models import Grade
+import jsoncodec
+
+STATS_FORMAT = 1
+
+class GradeStats:
+    """Счетчики оценок одного студента или преподавателя"""
+
+    __slots__ = ('count', 'total', 'excellent', 'subjects')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.excellent = 0
+        # Предмет -> [количество, сумма]
+        self.subjects: Dict[str, list] = {}
+
+    def add(self, subject: str, value: int):
+        self.count += 1
+        self.total += value
+        if value == 5:
+            self.excellent += 1
+        sums = self.subjects.get(subject)
+        if sums is None:
+            self.subjects[subject] = [1, value]
+        else:
+            sums[0] += 1
+            sums[1] += value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict:
+        """Количество, средний балл, число и доля пятерок, средние по предметам"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'excellent': self.excellent,
+            'excellent_share': self.excellent / self.count if self.count else 0.0,
+            'subjects': {subject: {'count': count, 'mean': total / count}
+                         for subject, (count, total) in self.subjects.items()}
+        }
+
+    def to_list(self) -> list:
+        return [self.count, self.total, self.excellent, self.subjects]
+
+    @classmethod
+    def from_list(cls, data: list) -> 'GradeStats':
+        stats = cls.__new__(cls)
+        stats.count, stats.total, stats.excellent, stats.subjects = data
+        return stats
+
+class GradeStatsIndex:
+    """Агрегаты по всем студентам и преподавателям на ревизию хранилища"""
+
+    def __init__(self):
+        self.by_student: Dict[str, GradeStats] = {}
+        self.by_teacher: Dict[str, GradeStats] = {}
+        # Ревизия хранилища и ID оценки, на которой она закончилась
+        self.revision = 0
+        self.last_id: Optional[str] = None
+
+    def add(self, grade: Grade, revision: int):
+        self.revision = revision
+        self.last_id = grade.id
+        # Оценки вне шкалы 1-5 в статистику не попадают
+        if not 1 <= grade.grade <= 5:
+            return
+        for index, key in ((self.by_student, grade.student_id), (self.by_teacher, grade.teacher_id)):
+            stats = index.get(key)
+            if stats is None:
+                stats = index[key] = GradeStats()
+            stats.add(grade.subject, grade.grade)
+
+    def __len__(self) -> int:
+        return len(self.by_student) + len(self.by_teacher)
+
+    def save(self, path: str):
+        """Атомарная запись контрольной точки"""
+        data = {
+            'format': STATS_FORMAT,
+            'revision': self.revision,
+            'last_id': self.last_id,
+            'students': {key: stats.to_list() for key, stats in self.by_student.items()},
+            'teachers': {key: stats.to_list() for key, stats in self.by_teacher.items()},
+        }
+        # Имя временного файла с PID: точку могут писать несколько процессов
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(jsoncodec.dumps(data))
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['GradeStatsIndex']:
+        """Чтение контрольной точки (None, если ее нет или формат другой)"""
+        try:
+            with open(path, 'rb') as f:
+                data = jsoncodec.loads(f.read())
+        except (OSError, jsoncodec.JSONDecodeError):
+            return None
+        if not isinstance(data, dict) or data.get('format') != STATS_FORMAT:
+            return None
+        index = cls()
+        index.revision = data['revision']
+        index.last_id = data['last_id']
+        index.by_student = {key: GradeStats.from_list(value) for key, value in data['students'].items()}
+        index.by_teacher = {key: GradeStats.from_list(value) for key, value in data['teachers'].items()}
+        return index
@@ -0,0 +1,1376 @@
+import gc
+from abc import ABC, abstractmethod
+import heapq
+from bisect import bisect_left, bisect_right
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from sys import intern
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from models import User, Grade, Schedule, Subject
+import jsoncodec
+import metrics
+from journal import JournaledTable
+from locking import VersionFile, file_lock
+
+@contextmanager
+def gc_paused():
+    """Отключение циклического GC на время массового создания объектов"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# Поля, по которым можно сортировать оценки в query_grades
+GRADE_SORT_FIELDS = ('created_at', 'grade', 'subject')
+
+def date_bounds(date_from: Optional[date], date_to: Optional[date]) -> Tuple[Optional[str], Optional[str]]:
+    """Границы периода в виде ISO строк: [начало date_from, начало дня после date_to)"""
+    start = date_from.isoformat() if date_from else None
+    end = (date_to + timedelta(days=1)).isoformat() if date_to else None
+    return start, end
+
+
+def grade_filter(student_id: Optional[str], subject: Optional[str], teacher_id: Optional[str],
+                 date_from: Optional[date], date_to: Optional[date]) -> Callable[[str, str, str, str], bool]:
+    """Проверка (student_id, subject, teacher_id, created_at в ISO) по фильтрам оценок"""
+    start, end = date_bounds(date_from, date_to)
+
+    def matches(grade_student_id: str, grade_subject: str, grade_teacher_id: str, created_at: str) -> bool:
+        return ((not student_id or grade_student_id == student_id)
+                and (not subject or grade_subject == subject)
+                and (not teacher_id or grade_teacher_id == teacher_id)
+                and (not start or created_at >= start)
+                and (not end or created_at < end))
+    return matches
+
+
+def grade_record(grade_id: str, student_key: int, teacher_key: int, subject_id: int, value: int,
+                 created_at: str) -> dict:
+    """Запись оценки в grades.json: ключи пользователей и предмета вместо UUID и названий.
+
+    Короткие имена полей: s и t - ключи студента и преподавателя из users.json,
+    c - ID предмета из subjects.json, g - оценка, at - время в ISO.
+    """
+    return {'id': grade_id, 's': student_key, 't': teacher_key, 'c': subject_id, 'g': value, 'at': created_at}
+
+def schedule_record(schedule_id: str, subject_id: int, day_of_week: str, time_slot: str, room: str,
+                    teacher_key: int, created_at: str) -> dict:
+    """Запись занятия в schedule.json: ID предмета и ключ преподавателя из users.json"""
+    return {'id': schedule_id, 'subject_id': subject_id, 'day_of_week': day_of_week, 'time_slot': time_slot,
+            'room': room, 'teacher_key': teacher_key, 'created_at': created_at}
+
+
+class Storage(ABC):
+    """Базовый интерфейс хранилища данных"""
+
+    @abstractmethod
+    def is_empty(self) -> bool:
+        """Проверка, что в хранилище нет пользователей"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def data_version(self) -> int:
+        """Номер версии данных, общий для всех процессов: меняется при любой записи"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_lock(self):
+        """Межпроцессная блокировка для последовательностей "проверить и записать"."""
+        raise NotImplementedError
+
+    def compact(self):
+        """Перезапись данных в текущем формате хранения"""
+
+    @abstractmethod
+    def existing_ids(self, table: str, ids: Iterable[str]) -> Set[str]:
+        """Какие из ids уже есть в таблице grades или schedule"""
+        raise NotImplementedError
+
+    # Пользователи
+    @abstractmethod
+    def get_all_users(self) -> List[User]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_by_id(self, user_id: str) -> Optional[User]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_users_by_role(self, role: str) -> List[User]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_users_by_ids(self, user_ids) -> Dict[str, User]:
+        """Пакетная загрузка пользователей: ID -> User (ненайденные пропускаются)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def users_revision(self) -> int:
+        """Номер ревизии пользователей: растет с каждым добавленным пользователем"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_user(self, user: User) -> bool:
+        """Добавление пользователя, False если email уже занят"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_password_hashes(self, hashes: Dict[str, str]) -> int:
+        """Замена хешей паролей: ID пользователя -> новый хеш (неизвестные ID пропускаются)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_users(self, users: List[User]) -> int:
+        """Добавление пачки пользователей одной транзакцией (ValueError при занятом email)"""
+        raise NotImplementedError
+
+    # Предметы
+    @abstractmethod
+    def get_subjects(self) -> List[Subject]:
+        """Справочник предметов в порядке добавления"""
+        raise NotImplementedError
+
+    # Оценки
+    @abstractmethod
+    def get_all_grades(self) -> List[Grade]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_student_grades(self, student_id: str) -> List[Grade]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                     teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                     date_to: Optional[date] = None, sort_by: str = 'created_at',
+                     descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[List[Grade], int]:
+        """Страница оценок по фильтрам и общее число подходящих оценок"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                    teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                    date_to: Optional[date] = None) -> Iterator[Grade]:
+        """Последовательный обход оценок по фильтрам в порядке добавления"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_grades_since(self, revision: int, position: Optional[list] = None) -> Iterator[Tuple[int, Grade]]:
+        """Оценки, добавленные после ревизии revision: пары (ревизия после оценки, оценка).
+
+        Ревизия растет с каждой добавленной оценкой (оценки не удаляются),
+        0 - пустое хранилище. position - опорная точка из grades_position(),
+        сохраненная вместе с revision: с ней хранилище может не читать
+        данные, которые не менялись с того момента.
+        """
+        raise NotImplementedError
+
+    def grades_position(self) -> Optional[list]:
+        """Опорная точка для iter_grades_since (None - хранилищу она не нужна)"""
+        return None
+
+    def check_grade(self, revision: int, grade_id: str, position: Optional[list] = None) -> bool:
+        """Проверка, что на ревизии revision записана оценка grade_id (данные не заменялись)"""
+        for current, grade in self.iter_grades_since(revision - 1, position):
+            return current == revision and grade.id == grade_id
+        return False
+
+    @abstractmethod
+    def add_grade(self, grade: Grade):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_grades(self, batches: Iterable[List[Grade]]) -> int:
+        """Добавление пачек оценок одной транзакцией: ошибка в любой пачке отменяет все"""
+        raise NotImplementedError
+
+    # Расписание
+    @abstractmethod
+    def get_all_schedule(self) -> List[Schedule]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_teacher_schedule(self, teacher_id: str) -> List[Schedule]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_schedule_by_day(self, day_of_week: str) -> List[Schedule]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def schedule_revision(self) -> int:
+        """Номер ревизии расписания: растет на 1 с каждым добавленным занятием"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_schedule(self, item: Schedule):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_schedule_items(self, items: List[Schedule]) -> int:
+        """Добавление пачки занятий одной транзакцией"""
+        raise NotImplementedError
+
+
+class JsonStorage(Storage):
+    """Хранилище в JSON файлах с кэшем и индексами в памяти.
+
+    Оценки и расписание хранятся как снимок (*.json) плюс журнал
+    добавлений (*.log.jsonl), поэтому запись не переписывает весь файл.
+    Записи оценок и расписания ссылаются на целочисленные ключи: у
+    пользователя - поле key в users.json, у предмета - ID в subjects.json.
+    Справочник записывается раньше записей, которые на него ссылаются.
+    Записи прежнего формата (UUID и названия) читаются как есть и
+    переводятся на ключи при сжатии журнала.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.users_file = os.path.join(data_dir, "users.json")
+        self.grades_file = os.path.join(data_dir, "grades.json")
+        self.schedule_file = os.path.join(data_dir, "schedule.json")
+        self.subjects_file = os.path.join(data_dir, "subjects.json")
+        self.lock_file = os.path.join(data_dir, ".lock")
+        # Счетчики изменений: по ним процессы узнают о чужих записях
+        self._changes = VersionFile(os.path.join(data_dir, ".version"), ('users', 'grades', 'schedule', 'subjects'))
+        self._grades_table = JournaledTable(self.grades_file, self.lock_file, self._load_json, self._save_grades,
+                                            lambda: self._changes.bump('grades'))
+        self._schedule_table = JournaledTable(self.schedule_file, self.lock_file, self._load_json, self._save_schedule,
+                                              lambda: self._changes.bump('schedule'))
+        # Один экземпляр обслуживает несколько потоков Streamlit
+        self._lock = threading.RLock()
+
+        # Кэш данных в памяти: подпись файла (mtime, размер) и хеш-индексы
+        self._signatures = {}
+        self._users: List[User] = []
+        self._users_by_id: Dict[str, User] = {}
+        self._users_by_email: Dict[str, User] = {}
+        # Справочники ключей: UUID пользователя <-> ключ, название предмета <-> ID
+        self._user_keys: Dict[str, int] = {}
+        self._user_ids: Dict[int, str] = {}
+        self._user_keys_saved = True
+        self._subjects: List[Subject] = []
+        self._subject_ids: Dict[str, int] = {}
+        self._subject_names: Dict[int, str] = {}
+        self._grades: List[Grade] = []
+        self._grades_by_student: Dict[str, List[Grade]] = {}
+        # Индекс по времени: оценки в порядке created_at, их времена для двоичного
+        # поиска и позиции в _grades. Строится при первом запросе за период (None - еще не построен)
+        self._grades_by_time: Optional[List[Grade]] = None
+        self._grade_times: List[str] = []
+        self._grade_ranks: List[int] = []
+        self._schedule: List[Schedule] = []
+        self._schedule_by_teacher: Dict[str, List[Schedule]] = {}
+        self._schedule_by_day: Dict[str, List[Schedule]] = {}
+
+    def _load_json(self, filename: str) -> list:
+        """Загрузка данных из JSON файла"""
+        if os.path.exists(filename):
+            try:
+                with open(filename, 'rb') as f:
+                    content = f.read()
+                data = jsoncodec.loads(content)
+                metrics.add_bytes(len(content))
+                metrics.add_rows(len(data))
+                return data
+            except (jsoncodec.JSONDecodeError, FileNotFoundError):
+                return []
+        return []
+
+    def _save_json(self, filename: str, data: list):
+        """Атомарное сохранение данных в JSON файл (запись на строку для потокового чтения)"""
+        tmp_file = filename + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            jsoncodec.write_array(f, data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, filename)
+
+    def _file_signature(self, filename: str) -> Optional[tuple]:
+        """Подпись users.json или subjects.json: (счетчик изменений, inode, mtime, размер).
+
+        Счетчик ловит перезапись файла другим процессом в тот же тик часов
+        с тем же размером, которую по mtime и размеру не отличить.
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        table = 'subjects' if filename == self.subjects_file else 'users'
+        return (self._changes.get(table), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _is_fresh(self, filename: str) -> bool:
+        """Проверка, что кэш соответствует текущему состоянию файла"""
+        return (filename in self._signatures
+                and self._signatures[filename] == self._file_signature(filename))
+
+    def _remember_signature(self, filename: str):
+        """Запоминание подписи файла после загрузки или записи"""
+        self._signatures[filename] = self._file_signature(filename)
+
+    def _index_users(self, users: List[User], keys: List[int]):
+        """Построение индексов пользователей и справочника ключей"""
+        self._users = users
+        self._users_by_id = {user.id: user for user in users}
+        self._users_by_email = {user.email: user for user in users}
+        self._user_keys = {user.id: key for user, key in zip(users, keys)}
+        # Тот же объект строки, что и в User: оценки не хранят свои копии UUID
+        self._user_ids = {key: user.id for user, key in zip(users, keys)}
+
+    def _index_subjects(self, subjects: List[Subject]):
+        """Построение справочника предметов"""
+        self._subjects = subjects
+        self._subject_ids = {subject.name: subject.id for subject in subjects}
+        self._subject_names = {subject.id: subject.name for subject in subjects}
+
+    def _index_grades(self, grades: List[Grade]):
+        """Построение индексов оценок"""
+        self._grades = []
+        self._grades_by_student = {}
+        self._grades_by_time = None
+        self._grade_times = []
+        self._grade_ranks = []
+        for grade in grades:
+            self._add_grade_to_index(grade)
+
+    def _add_grade_to_index(self, grade: Grade):
+        """Добавление оценки в индексы"""
+        self._grades.append(grade)
+        self._grades_by_student.setdefault(grade.student_id, []).append(grade)
+        if self._grades_by_time is not None:
+            created_at = grade.created_at_iso()
+            rank = len(self._grades) - 1
+            if not self._grade_times or created_at >= self._grade_times[-1]:
+                # Обычный случай: новая оценка позже всех
+                self._grade_times.append(created_at)
+                self._grades_by_time.append(grade)
+                self._grade_ranks.append(rank)
+            else:
+                # Импорт задним числом: после оценок с тем же временем
+                position = bisect_right(self._grade_times, created_at)
+                self._grade_times.insert(position, created_at)
+                self._grades_by_time.insert(position, grade)
+                self._grade_ranks.insert(position, rank)
+
+    def _period_slice(self, date_from: Optional[date], date_to: Optional[date]) -> slice:
+        """Границы периода в индексе времени (вызывается под self._lock)"""
+        if self._grades_by_time is None:
+            # Устойчивая сортировка: при равном времени порядок добавления
+            times = [grade.created_at_iso() for grade in self._grades]
+            self._grade_ranks = sorted(range(len(times)), key=times.__getitem__)
+            self._grades_by_time = [self._grades[rank] for rank in self._grade_ranks]
+            self._grade_times = [times[rank] for rank in self._grade_ranks]
+        start, end = date_bounds(date_from, date_to)
+        low = bisect_left(self._grade_times, start) if start else 0
+        high = bisect_left(self._grade_times, end) if end else len(self._grade_times)
+        return slice(low, high)
+
+    def _grades_in_period(self, date_from: Optional[date], date_to: Optional[date]) -> List[Grade]:
+        """Оценки за период в порядке created_at (при равном времени - в порядке добавления)"""
+        with self._lock:
+            period = self._period_slice(date_from, date_to)
+            return self._grades_by_time[period]
+
+    def _grades_in_period_by_rank(self, date_from: Optional[date], date_to: Optional[date]) -> List[Grade]:
+        """Оценки за период в порядке добавления"""
+        with self._lock:
+            ranks = sorted(self._grade_ranks[self._period_slice(date_from, date_to)])
+            return list(map(self._grades.__getitem__, ranks))
+
+    def _index_schedule(self, schedule: List[Schedule]):
+        """Построение индексов расписания"""
+        self._schedule = []
+        self._schedule_by_teacher = {}
+        self._schedule_by_day = {}
+        for item in schedule:
+            self._add_schedule_to_index(item)
+
+    def _add_schedule_to_index(self, item: Schedule):
+        """Добавление занятия в индексы"""
+        self._schedule.append(item)
+        self._schedule_by_teacher.setdefault(item.teacher_id, []).append(item)
+        self._schedule_by_day.setdefault(item.day_of_week, []).append(item)
+
+    def _refresh_users(self):
+        """Перезагрузка пользователей, только если файл изменился"""
+        with self._lock, gc_paused():
+            if not self._is_fresh(self.users_file):
+                self._remember_signature(self.users_file)
+                users_data = self._load_json(self.users_file)
+                # В файле без ключей (прежний формат) ключ - номер записи с единицы
+                keys = [data.get('key') or number for number, data in enumerate(users_data, 1)]
+                self._user_keys_saved = all('key' in data for data in users_data)
+                self._index_users([User.from_dict(data) for data in users_data], keys)
+
+    def _refresh_subjects(self):
+        """Перезагрузка справочника предметов, только если файл изменился"""
+        with self._lock:
+            if not self._is_fresh(self.subjects_file):
+                self._remember_signature(self.subjects_file)
+                self._index_subjects([Subject.from_dict(data) for data in self._load_json(self.subjects_file)])
+
+    def _refresh_references(self):
+        """Перезагрузка справочников ключей (пользователи и предметы)"""
+        self._refresh_users()
+        self._refresh_subjects()
+
+    def _save_users(self, users: List[User]):
+        """Запись users.json с ключами (новые пользователи получают следующие номера)"""
+        keys = [self._user_keys.get(user.id) for user in users]
+        next_key = max(self._user_ids, default=0) + 1
+        for index, key in enumerate(keys):
+            if key is None:
+                keys[index] = next_key
+                next_key += 1
+        self._save_json(self.users_file, [{'key': key, **user.to_dict()} for user, key in zip(users, keys)])
+        self._changes.bump('users')
+        self._remember_signature(self.users_file)
+        self._user_keys_saved = True
+        self._index_users(users, keys)
+
+    def _save_user_keys(self):
+        """Запись ключей в users.json прежнего формата до первой записи, которая на них ссылается"""
+        if self.users_file not in self._signatures:
+            self._refresh_users()
+        if not self._user_keys_saved:
+            with self._lock, file_lock(self.lock_file):
+                self._refresh_users()
+                if not self._user_keys_saved:
+                    self._save_users(self._users)
+
+    def _user_key(self, user_id: str) -> int:
+        key = self._user_keys.get(user_id)
+        if key is None:
+            # Пользователь мог быть добавлен другим процессом
+            self._refresh_users()
+            key = self._user_keys.get(user_id)
+            if key is None:
+                raise ValueError(f"Неизвестный пользователь: {user_id}")
+        return key
+
+    def _subject_id(self, name: str) -> int:
+        """ID предмета по названию; новый предмет сразу записывается в subjects.json"""
+        subject_id = self._subject_ids.get(name)
+        if subject_id is not None:
+            return subject_id
+        with self._lock, file_lock(self.lock_file):
+            # Под блокировкой перечитываем справочник: предмет мог добавить другой процесс
+            self._refresh_subjects()
+            subject_id = self._subject_ids.get(name)
+            if subject_id is None:
+                subject = Subject(intern(name), max(self._subject_names, default=0) + 1)
+                subjects = self._subjects + [subject]
+                self._save_json(self.subjects_file, [item.to_dict() for item in subjects])
+                self._changes.bump('subjects')
+                self._remember_signature(self.subjects_file)
+                self._index_subjects(subjects)
+                subject_id = subject.id
+        return subject_id
+
+    def _grade_record(self, grade: Grade) -> dict:
+        """Оценка -> запись в grades.json"""
+        return grade_record(grade.id, self._user_key(grade.student_id), self._user_key(grade.teacher_id),
+                            self._subject_id(grade.subject), grade.grade, grade.created_at_iso())
+
+    def _grade_from_record(self, data: dict) -> Grade:
+        """Запись grades.json -> Grade (запись прежнего формата - с UUID и названием)"""
+        if 's' not in data:
+            return Grade.from_dict(data)
+        try:
+            user_ids = self._user_ids
+            return Grade.from_fields(data['id'], user_ids[data['s']], self._subject_names[data['c']], data['g'],
+                                     user_ids[data['t']], data['at'])
+        except KeyError:
+            # Пользователь или предмет добавлен другим процессом после загрузки справочников
+            self._refresh_references()
+            user_ids = self._user_ids
+            try:
+                return Grade.from_fields(data['id'], user_ids[data['s']], self._subject_names[data['c']],
+                                         data['g'], user_ids[data['t']], data['at'])
+            except KeyError:
+                raise ValueError(f"Оценка {data['id']} ссылается на неизвестного пользователя или предмет") from None
+
+    def _schedule_record(self, item: Schedule) -> dict:
+        """Занятие -> запись в schedule.json: ID предмета и ключ преподавателя"""
+        return schedule_record(item.id, self._subject_id(item.subject), item.day_of_week, item.time_slot,
+                               item.room, self._user_key(item.teacher_id), item.created_at_iso())
+
+    def _schedule_from_record(self, data: dict) -> Schedule:
+        """Запись schedule.json -> Schedule (запись прежнего формата - с названием предмета и UUID)"""
+        subject_id = data.get('subject_id')
+        if subject_id is not None:
+            if subject_id not in self._subject_names:
+                self._refresh_subjects()
+            data = dict(data, subject=self._subject_names[subject_id])
+        teacher_key = data.get('teacher_key')
+        if teacher_key is not None:
+            if teacher_key not in self._user_ids:
+                # Преподаватель добавлен другим процессом после загрузки справочника
+                self._refresh_users()
+                if teacher_key not in self._user_ids:
+                    raise ValueError(f"Занятие {data['id']} ссылается на неизвестного преподавателя")
+            data = dict(data, teacher_id=self._user_ids[teacher_key])
+        return Schedule.from_dict(data)
+
+    def _save_grades(self, filename: str, records: List[dict]):
+        """Сохранение снимка оценок: записи прежнего формата переводятся на ключи.
+
+        Оценки пользователей, которых нет в users.json, остаются как были.
+        """
+        self._refresh_references()
+        self._save_user_keys()
+        user_keys = self._user_keys
+        self._save_json(filename, [
+            data if 's' in data or data['student_id'] not in user_keys or data['teacher_id'] not in user_keys
+            else grade_record(data['id'], user_keys[data['student_id']], user_keys[data['teacher_id']],
+                              self._subject_id(data['subject']), data['grade'], data['created_at'])
+            for data in records
+        ])
+
+    def _save_schedule(self, filename: str, records: List[dict]):
+        """Сохранение снимка расписания: записи прежнего формата переводятся на ключи.
+
+        Занятия преподавателей, которых нет в users.json, сохраняют UUID.
+        """
+        self._refresh_references()
+        self._save_user_keys()
+        user_keys = self._user_keys
+        converted = []
+        for data in records:
+            if 'subject_id' not in data:
+                data = {'id': data['id'], 'subject_id': self._subject_id(data['subject']),
+                        **{key: value for key, value in data.items() if key not in ('id', 'subject')}}
+            if 'teacher_key' not in data and data['teacher_id'] in user_keys:
+                data = schedule_record(data['id'], data['subject_id'], data['day_of_week'], data['time_slot'],
+                                       data['room'], user_keys[data['teacher_id']], data['created_at'])
+            converted.append(data)
+        self._save_json(filename, converted)
+
+    def _refresh_grades(self):
+        """Подгрузка оценок: целиком после сжатия журнала, иначе только новые записи"""
+        with self._lock, gc_paused():
+            reset, records = self._grades_table.read_changes()
+            decode = self._grade_from_record
+            if reset:
+                self._index_grades([decode(data) for data in records])
+            else:
+                for data in records:
+                    self._add_grade_to_index(decode(data))
+
+    def _refresh_schedule(self):
+        """Подгрузка расписания: целиком после сжатия журнала, иначе только новые записи"""
+        with self._lock, gc_paused():
+            reset, records = self._schedule_table.read_changes()
+            decode = self._schedule_from_record
+            if reset:
+                self._index_schedule([decode(data) for data in records])
+            else:
+                for data in records:
+                    self._add_schedule_to_index(decode(data))
+
+    def _append(self, table: JournaledTable, batches: Iterable[List[dict]], refresh) -> int:
+        """Дозапись в журнал таблицы и подгрузка новых записей в индексы"""
+        with self._lock:
+            count = table.append_batches(batches)
+            refresh()
+            if table.needs_compaction():
+                table.compact()
+                refresh()
+        return count
+
+    def is_empty(self) -> bool:
+        self._refresh_users()
+        return not self._users
+
+    def data_version(self) -> int:
+        return sum(self._changes.read())
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        # Порядок как в остальных методах: сначала блокировка потоков, затем файла
+        with self._lock, file_lock(self.lock_file):
+            yield
+
+    def compact(self):
+        # Журналы сжимаются, записи прежнего формата переводятся на ключи
+        with self._lock:
+            for table in (self._grades_table, self._schedule_table):
+                table.compact(force=True)
+
+    def existing_ids(self, table: str, ids: Iterable[str]) -> Set[str]:
+        ids = set(ids)
+        if not ids:
+            return set()
+        if table == 'grades':
+            self._refresh_grades()
+            items = self._grades
+        elif table == 'schedule':
+            self._refresh_schedule()
+            items = self._schedule
+        else:
+            raise ValueError(f"Неизвестная таблица: {table}")
+        return {item.id for item in items if item.id in ids}
+
+    # Пользователи
+    def get_all_users(self) -> List[User]:
+        self._refresh_users()
+        return list(self._users)
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        self._refresh_users()
+        return self._users_by_email.get(email)
+
+    def get_user_by_id(self, user_id: str) -> Optional[User]:
+        self._refresh_users()
+        return self._users_by_id.get(user_id)
+
+    def get_users_by_role(self, role: str) -> List[User]:
+        self._refresh_users()
+        return [user for user in self._users if user.role == role]
+
+    def users_revision(self) -> int:
+        # Пользователи только добавляются, поэтому их число - это ревизия
+        self._refresh_users()
+        return len(self._users)
+
+    def get_users_by_ids(self, user_ids) -> Dict[str, User]:
+        self._refresh_users()
+        users = {}
+        for user_id in user_ids:
+            user = self._users_by_id.get(user_id)
+            if user is not None:
+                users[user_id] = user
+        return users
+
+    def add_user(self, user: User) -> bool:
+        with self._lock, file_lock(self.lock_file):
+            # Под блокировкой перечитываем файл, чтобы не потерять чужую запись
+            self._refresh_users()
+            if user.email in self._users_by_email:
+                return False
+            self._save_users(self._users + [user])
+        return True
+
+    def add_users(self, users: List[User]) -> int:
+        with self._lock, file_lock(self.lock_file):
+            self._refresh_users()
+            taken = [user.email for user in users if user.email in self._users_by_email]
+            if taken:
+                raise ValueError(f"Email уже зарегистрирован: {', '.join(taken[:10])}")
+            self._save_users(self._users + users)
+        return len(users)
+
+    def update_password_hashes(self, hashes: Dict[str, str]) -> int:
+        with self._lock, file_lock(self.lock_file):
+            self._refresh_users()
+            users, updated = [], 0
+            for user in self._users:
+                if user.id in hashes:
+                    # Новый объект: старый может быть в кэше или состоянии сессии
+                    user = User.from_dict({**user.to_dict(), 'password_hash': hashes[user.id]})
+                    updated += 1
+                users.append(user)
+            if updated:
+                self._save_users(users)
+        return updated
+
+    # Предметы
+    def get_subjects(self) -> List[Subject]:
+        self._refresh_subjects()
+        return list(self._subjects)
+
+    # Оценки
+    def get_all_grades(self) -> List[Grade]:
+        self._refresh_grades()
+        return list(self._grades)
+
+    def get_student_grades(self, student_id: str) -> List[Grade]:
+        if not self._grades_table.loaded:
+            # Без загрузки всех оценок ради одного студента
+            return list(self.iter_grades(student_id=student_id))
+        self._refresh_grades()
+        return list(self._grades_by_student.get(student_id, []))
+
+    def query_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                     teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                     date_to: Optional[date] = None, sort_by: str = 'created_at',
+                     descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[List[Grade], int]:
+        if sort_by not in GRADE_SORT_FIELDS:
+            raise ValueError(f"Недопустимое поле сортировки: {sort_by}")
+        self._refresh_grades()
+        # Без студента период и сортировка по дате - по индексу времени: срез уже упорядочен
+        by_time = not student_id and (date_from or date_to or sort_by == 'created_at')
+        if by_time:
+            # Для сортировки не по дате срез нужен в порядке добавления: он второй ключ
+            if sort_by == 'created_at':
+                grades = self._grades_in_period(date_from, date_to)
+            else:
+                grades = self._grades_in_period_by_rank(date_from, date_to)
+            date_from = date_to = None
+        else:
+            grades = self._grades_by_student.get(student_id, []) if student_id else self._grades
+        if subject or teacher_id or date_from or date_to:
+            matches = grade_filter(None, subject, teacher_id, date_from, date_to)
+            grades = [g for g in grades if matches(g.student_id, g.subject, g.teacher_id, g.created_at_iso())]
+        if by_time and sort_by == 'created_at':
+            # Страница - срез с нужного конца; при равном времени новые записи первыми, как в SQLite
+            if not descending:
+                return grades[offset:offset + limit], len(grades)
+            end = max(0, len(grades) - offset)
+            return grades[max(0, end - limit):end][::-1], len(grades)
+        if sort_by == 'created_at':
+            key = Grade.created_at_iso
+        else:
+            key = lambda g: getattr(g, sort_by)
+        # Частичная сортировка: O(N log k) для страницы из k = offset + limit строк.
+        # nlargest и nsmallest устойчивы, поэтому при равных значениях порядок добавления
+        # идет в том же направлении, что и сортировка (как g.rowid в SQLite): по убыванию
+        # список обходится с конца
+        if descending:
+            page = heapq.nlargest(offset + limit, reversed(grades), key=key)[offset:]
+        else:
+            page = heapq.nsmallest(offset + limit, grades, key=key)[offset:]
+        return page, len(grades)
+
+    def iter_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                    teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                    date_to: Optional[date] = None) -> Iterator[Grade]:
+        matches = grade_filter(student_id, subject, teacher_id, date_from, date_to)
+        if self._grades_table.loaded:
+            # Оценки уже в памяти: обход индекса дешевле чтения файла
+            self._refresh_grades()
+            if not student_id and (date_from or date_to):
+                # Срез индекса по времени - копия, ее не меняют вставки задним числом
+                grades = self._grades_in_period(date_from, date_to)
+            else:
+                # Списки только дополняются, а при перезагрузке заменяются новыми
+                grades = self._grades_by_student.get(student_id, []) if student_id else self._grades
+            for index in range(len(grades)):
+                grade = grades[index]
+                if matches(grade.student_id, grade.subject, grade.teacher_id, grade.created_at_iso()):
+                    yield grade
+            return
+        # Кэш не загружен: фильтр применяется при чтении файла, и в памяти
+        # оказываются только подходящие оценки
+        for data in self._grades_table.iter_records(self._grade_needles(student_id, subject, teacher_id)):
+            grade = self._grade_from_record(data)
+            if matches(grade.student_id, grade.subject, grade.teacher_id, grade.created_at_iso()):
+                yield grade
+
+    def _grade_needles(self, student_id: Optional[str], subject: Optional[str],
+                       teacher_id: Optional[str]) -> Tuple[bytes, ...]:
+        """Байтовый предфильтр записей оценок по первому заданному фильтру.
+
+        Ищется поле с ключом ("s":12,) и само значение - для записей
+        прежнего формата с UUID и названиями.
+        """
+        self._refresh_references()
+        for field, value, keys in ((b's', student_id, self._user_keys), (b't', teacher_id, self._user_keys),
+                                   (b'c', subject, self._subject_ids)):
+            if not value:
+                continue
+            needles = jsoncodec.string_forms(value)
+            key = keys.get(value)
+            if key is not None:
+                needles += (b'"%s":%d,' % (field, key),)
+            return needles
+        return ()
+
+    def iter_grades_since(self, revision: int, position: Optional[list] = None) -> Iterator[Tuple[int, Grade]]:
+        if position is not None and not self._grades_table.loaded:
+            # Снимок не менялся с опорной точки: новые оценки только в журнале,
+            # и загружать всю таблицу не нужно
+            records = self._grades_table.read_log_since(position, revision)
+            if records is not None:
+                for index, data in enumerate(records, revision + 1):
+                    yield index, self._grade_from_record(data)
+                return
+        # Ревизия - позиция в списке: сжатие журнала сохраняет порядок оценок
+        self._refresh_grades()
+        grades = self._grades
+        for index in range(revision, len(grades)):
+            yield index + 1, grades[index]
+
+    def grades_position(self) -> Optional[list]:
+        # Снимок оценок, прочитанный в память: [inode, mtime, размер, число оценок]
+        return self._grades_table.position()
+
+    def check_grade(self, revision: int, grade_id: str, position: Optional[list] = None) -> bool:
+        if position is not None and revision == position[3] and self._grades_table.snapshot_matches(position):
+            # Ревизия - последняя оценка того же файла снимка
+            return True
+        return super().check_grade(revision, grade_id, position)
+
+    def add_grade(self, grade: Grade):
+        with self._lock:
+            self._save_user_keys()
+            self._append(self._grades_table, [[self._grade_record(grade)]], self._refresh_grades)
+
+    def add_grades(self, batches: Iterable[List[Grade]]) -> int:
+        # Индексы в памяти не обновляются: новые записи подтянутся при следующем
+        # чтении. Сжатие выполняется, только если журнал уже прочитан и вырос
+        records = ([self._grade_record(grade) for grade in batch] for batch in batches)
+        with self._lock:
+            self._save_user_keys()
+            count = self._grades_table.append_batches(records)
+            if self._grades_table.needs_compaction():
+                self._refresh_grades()
+                self._grades_table.compact()
+                self._refresh_grades()
+        return count
+
+    # Расписание
+    def get_all_schedule(self) -> List[Schedule]:
+        self._refresh_schedule()
+        return list(self._schedule)
+
+    def get_teacher_schedule(self, teacher_id: str) -> List[Schedule]:
+        self._refresh_schedule()
+        return list(self._schedule_by_teacher.get(teacher_id, []))
+
+    def get_schedule_by_day(self, day_of_week: str) -> List[Schedule]:
+        self._refresh_schedule()
+        return list(self._schedule_by_day.get(day_of_week, []))
+
+    def schedule_revision(self) -> int:
+        # Расписание только дополняется, поэтому число записей - это ревизия
+        self._refresh_schedule()
+        return len(self._schedule)
+
+    def add_schedule(self, item: Schedule):
+        self.add_schedule_items([item])
+
+    def add_schedule_items(self, items: List[Schedule]) -> int:
+        with self._lock:
+            self._save_user_keys()
+            return self._append(self._schedule_table, [[self._schedule_record(item) for item in items]],
+                                self._refresh_schedule)
+
+
+class SqliteStorage(Storage):
+    """Хранилище в SQLite (WAL, индексы, транзакции).
+
+    Оценки и расписание ссылаются на пользователей и предметы целыми
+    ключами (users.key, subjects.id), наружу отдаются UUID и названия.
+    Ключи оценок переводятся в UUID и названия по справочникам в памяти:
+    пользователи и предметы только добавляются, поэтому справочник
+    перечитывается, только если в нем не нашлось ключа.
+    """
+
+    # PRAGMA user_version: 0 - новая база или первая версия со строковыми ссылками,
+    # 2 - занятия еще ссылаются на преподавателя по UUID
+    SCHEMA_VERSION = 3
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            key INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            email TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            role TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS subjects (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS grades (
+            id TEXT PRIMARY KEY,
+            student INTEGER NOT NULL REFERENCES users(key),
+            subject INTEGER NOT NULL REFERENCES subjects(id),
+            grade INTEGER NOT NULL,
+            teacher INTEGER NOT NULL REFERENCES users(key),
+            created_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS schedule (
+            id TEXT PRIMARY KEY,
+            subject INTEGER NOT NULL REFERENCES subjects(id),
+            day_of_week TEXT NOT NULL,
+            time_slot TEXT NOT NULL,
+            room TEXT NOT NULL,
+            teacher INTEGER NOT NULL REFERENCES users(key),
+            created_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+        CREATE INDEX IF NOT EXISTS idx_grades_student ON grades(student);
+        CREATE INDEX IF NOT EXISTS idx_grades_teacher ON grades(teacher);
+        CREATE INDEX IF NOT EXISTS idx_grades_created ON grades(created_at);
+        CREATE INDEX IF NOT EXISTS idx_schedule_teacher ON schedule(teacher);
+        CREATE INDEX IF NOT EXISTS idx_schedule_day ON schedule(day_of_week);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta VALUES ('version', 0);
+    """
+    LEGACY_INDEXES = ('idx_users_role', 'idx_grades_student', 'idx_grades_teacher', 'idx_grades_created',
+                      'idx_schedule_teacher', 'idx_schedule_day')
+    SCHEDULE_INDEXES = ('idx_schedule_teacher', 'idx_schedule_day')
+
+    # Поля оценки в порядке Grade.from_fields, ревизия - первым полем
+    GRADE_SELECT = "SELECT g.rowid, g.id, g.student, g.subject, g.grade, g.teacher, g.created_at FROM grades g"
+    # CROSS JOIN фиксирует порядок соединения: занятия - внешний цикл, предмет и
+    # преподаватель - по первичному ключу
+    SCHEDULE_SELECT = """
+        SELECT sc.id, subjects.name AS subject, sc.day_of_week, sc.time_slot, sc.room, users.id AS teacher_id,
+               sc.created_at
+        FROM schedule sc CROSS JOIN subjects ON subjects.id = sc.subject CROSS JOIN users ON users.key = sc.teacher
+    """
+    USER_INSERT = """
+        INSERT {conflict} INTO users (id, email, name, role, password_hash, created_at)
+        VALUES (:id, :email, :name, :role, :password_hash, :created_at)
+    """
+    # Строка не вставляется, если пользователя нет: число вставленных строк проверяется
+    GRADE_INSERT = """
+        INSERT {conflict} INTO grades (id, student, subject, grade, teacher, created_at)
+        SELECT :id, s.key, subjects.id, :grade, t.key, :created_at
+        FROM users s, users t, subjects
+        WHERE s.id = :student_id AND t.id = :teacher_id AND subjects.name = :subject
+    """
+    SCHEDULE_INSERT = """
+        INSERT {conflict} INTO schedule (id, subject, day_of_week, time_slot, room, teacher, created_at)
+        SELECT :id, subjects.id, :day_of_week, :time_slot, :room, users.key, :created_at
+        FROM subjects, users WHERE subjects.name = :subject AND users.id = :teacher_id
+    """
+    # Поле сортировки query_grades -> выражение SQL
+    SORT_COLUMNS = {'created_at': 'g.created_at', 'grade': 'g.grade', 'subject': 'subjects.name'}
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # Streamlit выполняет сессии в разных потоках: соединение на поток
+        self._local = threading.local()
+        # Справочники: ключ -> UUID пользователя, ID -> название предмета
+        self._user_ids: Dict[int, str] = {}
+        self._subject_names: Dict[int, str] = {}
+        self._upgrade_schema(self._connection())
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение с базой для текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Закрытие соединения текущего потока (WAL переносится в файл базы)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _upgrade_schema(self, conn: sqlite3.Connection):
+        """Создание схемы или перевод базы прежних версий на целые ключи"""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= self.SCHEMA_VERSION:
+            return
+        legacy = False
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Повторная проверка под блокировкой: схему мог обновить другой процесс
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < self.SCHEMA_VERSION:
+                legacy = 'student_id' in {row['name'] for row in conn.execute("PRAGMA table_info(grades)")}
+                if legacy:
+                    for table in ('users', 'grades', 'schedule'):
+                        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v1")
+                    for index in self.LEGACY_INDEXES:
+                        conn.execute(f"DROP INDEX IF EXISTS {index}")
+                elif version == 2:
+                    conn.execute("ALTER TABLE schedule RENAME TO schedule_v2")
+                    for index in self.SCHEDULE_INDEXES:
+                        conn.execute(f"DROP INDEX IF EXISTS {index}")
+                for statement in self.SCHEMA.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                if legacy:
+                    self._copy_legacy_tables(conn)
+                elif version == 2:
+                    self._copy_schedule_v2(conn)
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if legacy:
+            # Место старых таблиц возвращается системе
+            conn.execute("VACUUM")
+
+    @staticmethod
+    def _copy_legacy_tables(conn: sqlite3.Connection):
+        """Перенос данных из таблиц первой версии (*_v1) с сохранением rowid оценок и занятий"""
+        conn.execute("""
+            INSERT INTO users (id, email, name, role, password_hash, created_at)
+            SELECT id, email, name, role, password_hash, created_at FROM users_v1 ORDER BY rowid
+        """)
+        # ID предметов - в порядке первого появления
+        conn.execute("INSERT OR IGNORE INTO subjects (name) SELECT subject FROM grades_v1 ORDER BY rowid")
+        conn.execute("INSERT OR IGNORE INTO subjects (name) SELECT subject FROM schedule_v1 ORDER BY rowid")
+        orphans = conn.execute("""
+            SELECT COUNT(*) FROM grades_v1 g
+            WHERE NOT EXISTS (SELECT 1 FROM users WHERE id = g.student_id)
+               OR NOT EXISTS (SELECT 1 FROM users WHERE id = g.teacher_id)
+        """).fetchone()[0]
+        if orphans:
+            raise ValueError(f"Оценок с неизвестными пользователями: {orphans}, перевод базы на ключи невозможен")
+        # rowid - ревизия оценок и расписания: контрольные точки агрегатов остаются верными
+        conn.execute("""
+            INSERT INTO grades (rowid, id, student, subject, grade, teacher, created_at)
+            SELECT g.rowid, g.id, s.key, subjects.id, g.grade, t.key, g.created_at
+            FROM grades_v1 g JOIN users s ON s.id = g.student_id JOIN users t ON t.id = g.teacher_id
+                 JOIN subjects ON subjects.name = g.subject
+            ORDER BY g.rowid
+        """)
+        SqliteStorage._check_schedule_teachers(conn, 'schedule_v1')
+        conn.execute("""
+            INSERT INTO schedule (rowid, id, subject, day_of_week, time_slot, room, teacher, created_at)
+            SELECT sc.rowid, sc.id, subjects.id, sc.day_of_week, sc.time_slot, sc.room, users.key, sc.created_at
+            FROM schedule_v1 sc JOIN subjects ON subjects.name = sc.subject JOIN users ON users.id = sc.teacher_id
+            ORDER BY sc.rowid
+        """)
+        for table in ('users', 'grades', 'schedule'):
+            conn.execute(f"DROP TABLE {table}_v1")
+
+    @staticmethod
+    def _copy_schedule_v2(conn: sqlite3.Connection):
+        """Перенос занятий второй версии (schedule_v2): UUID преподавателя заменяется ключом"""
+        SqliteStorage._check_schedule_teachers(conn, 'schedule_v2')
+        conn.execute("""
+            INSERT INTO schedule (rowid, id, subject, day_of_week, time_slot, room, teacher, created_at)
+            SELECT sc.rowid, sc.id, sc.subject, sc.day_of_week, sc.time_slot, sc.room, users.key, sc.created_at
+            FROM schedule_v2 sc JOIN users ON users.id = sc.teacher_id
+            ORDER BY sc.rowid
+        """)
+        conn.execute("DROP TABLE schedule_v2")
+
+    @staticmethod
+    def _check_schedule_teachers(conn: sqlite3.Connection, table: str):
+        """Перевод на ключи невозможен, если у занятия нет преподавателя в users"""
+        orphans = conn.execute(f"""
+            SELECT COUNT(*) FROM {table} sc WHERE NOT EXISTS (SELECT 1 FROM users WHERE id = sc.teacher_id)
+        """).fetchone()[0]
+        if orphans:
+            raise ValueError(f"Занятий с неизвестными преподавателями: {orphans}, перевод базы на ключи невозможен")
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи: версия данных увеличивается в той же транзакции.
+
+        PRAGMA data_version не подходит: она не видит записи своего соединения,
+        а соединений по одному на поток несколько.
+        """
+        with self._connection() as conn:
+            yield conn
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        rows = self._connection().execute(sql, params).fetchall()
+        metrics.add_rows(len(rows))
+        return rows
+
+    def is_empty(self) -> bool:
+        return not self._query("SELECT 1 FROM users LIMIT 1")
+
+    def data_version(self) -> int:
+        return self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def write_lock(self):
+        # Отдельный файл блокировки рядом с базой: транзакция SQLite не охватывает
+        # проверку, выполняемую в Python между чтением и записью
+        return file_lock(self.db_path + ".lock")
+
+    def compact(self):
+        # Схема переводится на ключи при открытии базы, здесь только возврат свободного места
+        self._connection().execute("VACUUM")
+
+    def existing_ids(self, table: str, ids: Iterable[str]) -> Set[str]:
+        if table not in ('grades', 'schedule'):
+            raise ValueError(f"Неизвестная таблица: {table}")
+        found = set()
+        ids = list(set(ids))
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(row[0] for row in self._query(f"SELECT id FROM {table} WHERE id IN ({placeholders})",
+                                                       tuple(chunk)))
+        return found
+
+    # Пользователи
+    def get_all_users(self) -> List[User]:
+        rows = self._query("SELECT * FROM users ORDER BY key")
+        return [User.from_dict(row) for row in rows]
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        rows = self._query("SELECT * FROM users WHERE email = ?", (email,))
+        return User.from_dict(rows[0]) if rows else None
+
+    def get_user_by_id(self, user_id: str) -> Optional[User]:
+        rows = self._query("SELECT * FROM users WHERE id = ?", (user_id,))
+        return User.from_dict(rows[0]) if rows else None
+
+    def get_users_by_role(self, role: str) -> List[User]:
+        rows = self._query("SELECT * FROM users WHERE role = ? ORDER BY key", (role,))
+        return [User.from_dict(row) for row in rows]
+
+    def users_revision(self) -> int:
+        # Строки только добавляются, поэтому MAX(key) растет с каждым пользователем
+        return self._query("SELECT COALESCE(MAX(key), 0) FROM users")[0][0]
+
+    def get_users_by_ids(self, user_ids) -> Dict[str, User]:
+        users = {}
+        ids = list(set(user_ids))
+        # Ограничение SQLite на число параметров в одном запросе
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for row in self._query(f"SELECT * FROM users WHERE id IN ({placeholders})", tuple(chunk)):
+                users[row['id']] = User.from_dict(row)
+        return users
+
+    def add_user(self, user: User) -> bool:
+        try:
+            with self._write() as conn:
+                conn.execute(self.USER_INSERT.format(conflict=""), user.to_dict())
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def add_users(self, users: List[User]) -> int:
+        try:
+            with self._write() as conn:
+                conn.executemany(self.USER_INSERT.format(conflict=""), (user.to_dict() for user in users))
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Email или ID уже зарегистрирован: {e}") from e
+        return len(users)
+
+    def update_password_hashes(self, hashes: Dict[str, str]) -> int:
+        with self._write() as conn:
+            cursor = conn.executemany("UPDATE users SET password_hash = ? WHERE id = ?",
+                                      ((password_hash, user_id) for user_id, password_hash in hashes.items()))
+        return cursor.rowcount
+
+    # Предметы
+    def get_subjects(self) -> List[Subject]:
+        return [Subject.from_dict(row) for row in self._query("SELECT id, name FROM subjects ORDER BY id")]
+
+    @staticmethod
+    def _insert_subjects(conn: sqlite3.Connection, names: Iterable[str]):
+        """Добавление недостающих предметов (ID - в порядке первого появления)"""
+        conn.executemany("INSERT OR IGNORE INTO subjects (name) VALUES (?)",
+                         ((name,) for name in dict.fromkeys(names)))
+
+    def _load_references(self):
+        """Перечитывание справочников ключей"""
+        conn = self._connection()
+        self._user_ids = {key: intern(user_id) for key, user_id in conn.execute("SELECT key, id FROM users")}
+        self._subject_names = {subject_id: intern(name) for subject_id, name in conn.execute("SELECT id, name FROM subjects")}
+
+    def _grade_from_row(self, row: sqlite3.Row) -> Grade:
+        """Строка GRADE_SELECT -> Grade с UUID пользователей и названием предмета"""
+        try:
+            user_ids = self._user_ids
+            return Grade.from_fields(row[1], user_ids[row[2]], self._subject_names[row[3]], row[4],
+                                     user_ids[row[5]], row[6])
+        except KeyError:
+            # Пользователь или предмет добавлен после загрузки справочников
+            self._load_references()
+            user_ids = self._user_ids
+            return Grade.from_fields(row[1], user_ids[row[2]], self._subject_names[row[3]], row[4],
+                                     user_ids[row[5]], row[6])
+
+    # Оценки
+    def get_all_grades(self) -> List[Grade]:
+        rows = self._query(f"{self.GRADE_SELECT} ORDER BY g.rowid")
+        return [self._grade_from_row(row) for row in rows]
+
+    def get_student_grades(self, student_id: str) -> List[Grade]:
+        where, params = self._grade_conditions(student_id, None, None, None, None)
+        rows = self._query(f"{self.GRADE_SELECT} {where} ORDER BY g.rowid", params)
+        return [self._grade_from_row(row) for row in rows]
+
+    def query_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                     teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                     date_to: Optional[date] = None, sort_by: str = 'created_at',
+                     descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[List[Grade], int]:
+        if sort_by not in GRADE_SORT_FIELDS:
+            raise ValueError(f"Недопустимое поле сортировки: {sort_by}")
+        where, params = self._grade_conditions(student_id, subject, teacher_id, date_from, date_to)
+        total = self._query(f"SELECT COUNT(*) FROM grades g {where}", params)[0][0]
+        direction = "DESC" if descending else "ASC"
+        # Сортировка по названию предмета - через справочник, остальные поля есть в grades
+        sort_join = "CROSS JOIN subjects ON subjects.id = g.subject" if sort_by == 'subject' else ""
+        rows = self._query(f"{self.GRADE_SELECT} {sort_join} {where} ORDER BY {self.SORT_COLUMNS[sort_by]} {direction}, "
+                           f"g.rowid {direction} LIMIT ? OFFSET ?", params + (limit, offset))
+        return [self._grade_from_row(row) for row in rows], total
+
+    @staticmethod
+    def _grade_conditions(student_id: Optional[str], subject: Optional[str], teacher_id: Optional[str],
+                          date_from: Optional[date], date_to: Optional[date]) -> Tuple[str, tuple]:
+        """Условие WHERE по таблице grades g и параметры для фильтров оценок"""
+        start, end = date_bounds(date_from, date_to)
+        conditions, params = [], []
+        # UUID и название переводятся в ключ один раз, дальше работает индекс по ключу
+        for sql, value in (("g.student = (SELECT key FROM users WHERE id = ?)", student_id),
+                           ("g.subject = (SELECT id FROM subjects WHERE name = ?)", subject),
+                           ("g.teacher = (SELECT key FROM users WHERE id = ?)", teacher_id),
+                           ("g.created_at >= ?", start), ("g.created_at < ?", end)):
+            if value:
+                conditions.append(sql)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, tuple(params)
+
+    def _iter_rows(self, sql: str, params: tuple = ()) -> Iterator[sqlite3.Row]:
+        # Отдельное соединение: курсор читается постепенно и не мешает записи в этом потоке
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                metrics.add_rows(len(rows))
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_grades(self, student_id: Optional[str] = None, subject: Optional[str] = None,
+                    teacher_id: Optional[str] = None, date_from: Optional[date] = None,
+                    date_to: Optional[date] = None) -> Iterator[Grade]:
+        where, params = self._grade_conditions(student_id, subject, teacher_id, date_from, date_to)
+        for row in self._iter_rows(f"{self.GRADE_SELECT} {where} ORDER BY g.rowid", params):
+            yield self._grade_from_row(row)
+
+    def iter_grades_since(self, revision: int, position: Optional[list] = None) -> Iterator[Tuple[int, Grade]]:
+        # Ревизия - rowid: строки только добавляются, поэтому он растет
+        if self._query("SELECT COALESCE(MAX(rowid), 0) FROM grades")[0][0] <= revision:
+            # Частый случай - новых оценок нет: без отдельного соединения
+            return
+        for row in self._iter_rows(f"{self.GRADE_SELECT} WHERE g.rowid > ? ORDER BY g.rowid", (revision,)):
+            yield row[0], self._grade_from_row(row)
+
+    def _insert_grades(self, conn: sqlite3.Connection, grades: List[Grade], conflict: str = ""):
+        """Вставка оценок с ключами вместо UUID и названий (ValueError, если пользователя нет)"""
+        self._insert_subjects(conn, (grade.subject for grade in grades))
+        try:
+            cursor = conn.executemany(self.GRADE_INSERT.format(conflict=conflict),
+                                      (grade.to_dict() for grade in grades))
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"ID оценки уже есть: {e}") from e
+        if not conflict and cursor.rowcount != len(grades):
+            raise ValueError("Оценка ссылается на неизвестного пользователя")
+
+    def add_grade(self, grade: Grade):
+        with self._write() as conn:
+            self._insert_grades(conn, [grade])
+
+    def add_grades(self, batches: Iterable[List[Grade]]) -> int:
+        count = 0
+        with self._write() as conn:
+            for batch in batches:
+                self._insert_grades(conn, batch)
+                count += len(batch)
+        return count
+
+    # Расписание
+    def get_all_schedule(self) -> List[Schedule]:
+        rows = self._query(f"{self.SCHEDULE_SELECT} ORDER BY sc.rowid")
+        return [Schedule.from_dict(row) for row in rows]
+
+    def get_teacher_schedule(self, teacher_id: str) -> List[Schedule]:
+        rows = self._query(f"{self.SCHEDULE_SELECT} WHERE sc.teacher = (SELECT key FROM users WHERE id = ?) "
+                           "ORDER BY sc.rowid", (teacher_id,))
+        return [Schedule.from_dict(row) for row in rows]
+
+    def get_schedule_by_day(self, day_of_week: str) -> List[Schedule]:
+        rows = self._query(f"{self.SCHEDULE_SELECT} WHERE sc.day_of_week = ? ORDER BY sc.rowid", (day_of_week,))
+        return [Schedule.from_dict(row) for row in rows]
+
+    def schedule_revision(self) -> int:
+        # Строки только добавляются, поэтому MAX(rowid) растет на 1 с каждым занятием
+        return self._query("SELECT COALESCE(MAX(rowid), 0) FROM schedule")[0][0]
+
+    def _insert_schedule(self, conn: sqlite3.Connection, items: List[Schedule], conflict: str = ""):
+        """Вставка занятий с ключами вместо названия и UUID (ValueError, если преподавателя нет)"""
+        self._insert_subjects(conn, (item.subject for item in items))
+        cursor = conn.executemany(self.SCHEDULE_INSERT.format(conflict=conflict), (item.to_dict() for item in items))
+        if not conflict and cursor.rowcount != len(items):
+            raise ValueError("Занятие ссылается на неизвестного преподавателя")
+
+    def add_schedule(self, item: Schedule):
+        with self._write() as conn:
+            self._insert_schedule(conn, [item])
+
+    def add_schedule_items(self, items: List[Schedule]) -> int:
+        with self._write() as conn:
+            self._insert_schedule(conn, items)
+        return len(items)
+
+    # Миграция
+    def import_from(self, source: Storage):
+        """Перенос всех данных из другого хранилища одной транзакцией"""
+        grades = source.get_all_grades()
+        with self._write() as conn:
+            conn.executemany(self.USER_INSERT.format(conflict="OR IGNORE"),
+                             (user.to_dict() for user in source.get_all_users()))
+            known = {row[0] for row in conn.execute("SELECT id FROM users")}
+            orphans = sum(1 for grade in grades if grade.student_id not in known or grade.teacher_id not in known)
+            if orphans:
+                raise ValueError(f"Оценок с неизвестными пользователями: {orphans}")
+            schedule = source.get_all_schedule()
+            orphans = sum(1 for item in schedule if item.teacher_id not in known)
+            if orphans:
+                raise ValueError(f"Занятий с неизвестными преподавателями: {orphans}")
+            # OR IGNORE: повторный перенос пропускает уже перенесенные строки
+            self._insert_grades(conn, grades, "OR IGNORE")
+            self._insert_schedule(conn, schedule, "OR IGNORE")
+
+
+def migrate_json_to_sqlite(data_dir: str, db_path: str) -> SqliteStorage:
+    """Однократный перенос данных из data/*.json в SQLite.
+
+    Данные переносятся во временный файл рядом с базой, и он становится
+    базой только после успешного переноса: при ошибке на диске не остается
+    пустой базы, из-за которой следующий запуск пропустил бы миграцию.
+    """
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    try:
+        target = SqliteStorage(tmp_path)
+        try:
+            target.import_from(JsonStorage(data_dir))
+        finally:
+            target.close()
+        try:
+            # link, а не replace: если другой процесс уже перенес данные,
+            # его база (возможно, уже с новыми записями) не перезаписывается
+            os.link(tmp_path, db_path)
+        except FileExistsError:
+            pass
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp_path + suffix):
+                os.remove(tmp_path + suffix)
+    return SqliteStorage(db_path)
+
+
+if __name__ == "__main__":
+    # python storage.py [data_dir] [db_path]
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(data_dir, "aristotel.db")
+    migrate_json_to_sqlite(data_dir, db_path)
+    print(f"Данные из {data_dir} перенесены в {db_path}")
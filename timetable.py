@@ -0,0 +1,111 @@
+import re
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+from models import Schedule
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+
+_TIME_SLOT = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*[-–—]\s*(\d{1,2}):(\d{2})\s*$")
+
+def parse_time_slot(time_slot: str) -> Tuple[int, int]:
+    """Разбор "09:00-10:30" в минуты от начала дня: (540, 630)"""
+    match = _TIME_SLOT.match(time_slot)
+    if not match:
+        raise ValueError(f"Время должно быть в формате ЧЧ:ММ-ЧЧ:ММ: {time_slot}")
+    h1, m1, h2, m2 = (int(part) for part in match.groups())
+    if h1 > 23 or h2 > 23 or m1 > 59 or m2 > 59:
+        raise ValueError(f"Некорректное время: {time_slot}")
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    if start >= end:
+        raise ValueError(f"Начало занятия должно быть раньше конца: {time_slot}")
+    return start, end
+
+def format_time_slot(start: int, end: int) -> str:
+    """Обратное преобразование минут в "ЧЧ:ММ-ЧЧ:ММ\""""
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
+class IntervalIndex:
+    """Отсортированные по началу интервалы занятий одного ключа (аудитории или преподавателя).
+
+    Для каждой позиции хранится наибольший конец среди интервалов до нее
+    включительно: старые записи и импортированные данные могут пересекаться,
+    и занятие, начавшееся намного раньше, может закончиться позже соседних.
+    Проверка нового интервала - двоичный поиск плюс просмотр назад, пока
+    этот максимум больше начала: O(log n + k) для k пересечений.
+    """
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._intervals: List[Tuple[int, int, Schedule]] = []
+        self._max_ends: List[int] = []
+
+    def add(self, start: int, end: int, item: Schedule):
+        position = bisect_left(self._starts, start)
+        self._starts.insert(position, start)
+        self._intervals.insert(position, (start, end, item))
+        self._max_ends.insert(position, max(end, self._max_ends[position - 1]) if position else end)
+        # Дальше максимум меняется только там, где он был меньше нового конца
+        for index in range(position + 1, len(self._max_ends)):
+            if self._max_ends[index] >= end:
+                break
+            self._max_ends[index] = end
+
+    def overlapping(self, start: int, end: int) -> List[Schedule]:
+        """Занятия, пересекающиеся с интервалом [start, end)"""
+        position = bisect_left(self._starts, start)
+        result = []
+        # Занятия, начавшиеся раньше, могут еще не закончиться к началу нового
+        index = position - 1
+        while index >= 0 and self._max_ends[index] > start:
+            if self._intervals[index][1] > start:
+                result.append(self._intervals[index][2])
+            index -= 1
+        result.reverse()
+        while position < len(self._intervals) and self._intervals[position][0] < end:
+            result.append(self._intervals[position][2])
+            position += 1
+        return result
+
+class Timetable:
+    """Индексы расписания: интервалы по (день, аудитория) и (день, преподаватель),
+    занятия каждого дня в порядке начала"""
+
+    def __init__(self, schedule: List[Schedule] = ()):
+        self._by_room: Dict[Tuple[str, str], IntervalIndex] = {}
+        self._by_teacher: Dict[Tuple[str, str], IntervalIndex] = {}
+        self._by_day: Dict[str, List[Tuple[tuple, str, Schedule]]] = {}
+        for item in schedule:
+            self.add(item)
+
+    def add(self, item: Schedule):
+        try:
+            start, end = parse_time_slot(item.time_slot)
+        except ValueError:
+            # Старые записи в свободном формате показываются в конце дня
+            # и не участвуют в проверке пересечений
+            sort_key = (1, item.time_slot)
+        else:
+            sort_key = (0, start)
+            self._by_room.setdefault((item.day_of_week, item.room), IntervalIndex()).add(start, end, item)
+            self._by_teacher.setdefault((item.day_of_week, item.teacher_id), IntervalIndex()).add(start, end, item)
+        insort(self._by_day.setdefault(item.day_of_week, []), (sort_key, item.id, item))
+
+    def conflicts(self, day_of_week: str, start: int, end: int, room: str,
+                  teacher_id: str) -> Dict[str, List[Schedule]]:
+        """Занятия, с которыми пересекается новое: по аудитории и по преподавателю"""
+        result = {}
+        for kind, index in (('room', self._by_room.get((day_of_week, room))),
+                            ('teacher', self._by_teacher.get((day_of_week, teacher_id)))):
+            items = index.overlapping(start, end) if index else []
+            if items:
+                result[kind] = items
+        return result
+
+    def day(self, day_of_week: str) -> List[Schedule]:
+        """Занятия дня в порядке начала"""
+        return [item for _, _, item in self._by_day.get(day_of_week, [])]
+
+    def week(self) -> Dict[str, List[Schedule]]:
+        """Расписание на неделю: день -> занятия в порядке начала"""
+        days = DAYS + sorted(day for day in self._by_day if day not in DAYS)
+        return {day: self.day(day) for day in days if day in self._by_day}
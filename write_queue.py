@@ -0,0 +1,116 @@
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+class WriteQueue:
+    """Фоновая запись оценок и занятий.
+
+    Команды ставятся в очередь и сразу получают номер (ticket). Фоновый поток
+    собирает все команды, пришедшие за короткий интервал, и сохраняет оценки
+    одной пачкой, поэтому скрипт Streamlit не ждет записи на диск.
+    """
+
+    def __init__(self, db, max_batch: int = 1000, linger: float = 0.01, max_statuses: int = 10000):
+        self.db = db
+        self.max_batch = max_batch
+        self.linger = linger
+        self.max_statuses = max_statuses
+        self._queue: queue.Queue = queue.Queue()
+        self._statuses: OrderedDict = OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def _submit(self, kind: str, payload: dict) -> str:
+        ticket = str(uuid.uuid4())
+        with self._condition:
+            self._statuses[ticket] = (PENDING, None)
+            # Старые статусы вытесняются, чтобы словарь не рос бесконечно
+            while len(self._statuses) > self.max_statuses:
+                self._statuses.popitem(last=False)
+        self._queue.put((ticket, kind, payload))
+        return ticket
+
+    def submit_grade(self, student_id: str, subject: str, grade: int, teacher_id: str) -> str:
+        """Постановка оценки в очередь, возвращает номер операции"""
+        return self._submit('grade', {'student_id': student_id, 'subject': subject,
+                                      'grade': grade, 'teacher_id': teacher_id})
+
+    def submit_schedule(self, subject: str, day_of_week: str, time_slot: str, room: str, teacher_id: str) -> str:
+        """Постановка занятия в очередь, возвращает номер операции"""
+        return self._submit('schedule', {'subject': subject, 'day_of_week': day_of_week,
+                                         'time_slot': time_slot, 'room': room, 'teacher_id': teacher_id})
+
+    def status(self, ticket: str) -> tuple:
+        """Статус операции: (pending|done|failed, сообщение об ошибке)"""
+        with self._condition:
+            return self._statuses.get(ticket, (DONE, None))
+
+    def wait(self, ticket: str, timeout: Optional[float] = None) -> tuple:
+        """Ожидание завершения операции не дольше timeout секунд"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._statuses.get(ticket, (DONE,))[0] != PENDING, timeout)
+            return self._statuses.get(ticket, (DONE, None))
+
+    def pending_count(self) -> int:
+        """Число операций, ожидающих записи"""
+        return self._queue.qsize()
+
+    def _finish(self, results: dict):
+        with self._condition:
+            for ticket, result in results.items():
+                if ticket in self._statuses:
+                    self._statuses[ticket] = result
+            self._condition.notify_all()
+
+    def _collect_batch(self) -> list:
+        """Первая команда ждется без ограничения, остальные - не дольше linger"""
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=self.linger))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            results = {}
+            try:
+                grades = [(ticket, payload) for ticket, kind, payload in batch if kind == 'grade']
+                if grades:
+                    results.update(self._write_grades(grades))
+                for ticket, kind, payload in batch:
+                    if kind == 'schedule':
+                        # Занятия пишутся по одному: каждое проверяется на пересечения
+                        if self.db.add_schedule(**payload):
+                            results[ticket] = (DONE, None)
+                        else:
+                            results[ticket] = (FAILED, "Пересечение с другим занятием или ошибка записи")
+            except Exception as e:
+                # Поток записи не должен останавливаться из-за одной пачки
+                for ticket, _, _ in batch:
+                    results.setdefault(ticket, (FAILED, str(e)))
+            self._finish(results)
+
+    def _write_grades(self, grades: list) -> dict:
+        """Сохранение пачки оценок; при ошибке - по одной, чтобы отделить неверные"""
+        try:
+            self.db.import_grades([payload for _, payload in grades])
+            return {ticket: (DONE, None) for ticket, _ in grades}
+        except Exception:
+            results = {}
+            for ticket, payload in grades:
+                try:
+                    self.db.import_grades([payload])
+                    results[ticket] = (DONE, None)
+                except Exception as e:
+                    results[ticket] = (FAILED, f"Ошибка при выставлении оценки: {e}")
+            return results